@@ -6,11 +6,37 @@
 class APIService {
     constructor(baseURL) {
         this.baseURL = baseURL;
+        this.token = sessionStorage.getItem('accessToken');
+        this.onUnauthorized = null;
+    }
+
+    setToken(token) {
+        this.token = token;
+        if (token) {
+            sessionStorage.setItem('accessToken', token);
+        } else {
+            sessionStorage.removeItem('accessToken');
+        }
+    }
+
+    // แนบ access token ที่ได้จาก /login ไปกับทุก request
+    withAuth(options = {}) {
+        if (!this.token) return options;
+        return { ...options, headers: { ...options.headers, 'Authorization': `Bearer ${this.token}` } };
+    }
+
+    // token หมดอายุหรือถูกเพิกถอน ให้ออกจากระบบแล้ว login ใหม่
+    handleUnauthorized(response) {
+        if (response.status === 401 && this.token) {
+            this.setToken(null);
+            if (this.onUnauthorized) this.onUnauthorized();
+        }
     }
 
     async fetch(endpoint, options = {}) {
         try {
-            const response = await fetch(`${this.baseURL}/${endpoint}`, options);
+            const response = await fetch(`${this.baseURL}/${endpoint}`, this.withAuth(options));
+            this.handleUnauthorized(response);
             const data = await response.json();
             if (!response.ok) {
                 throw new Error(data.message || `API call to ${endpoint} failed`);
@@ -47,40 +73,68 @@ class APIService {
     }
 
     async uploadFile(file, type, userId) {
-        const formData = new FormData();
-        formData.append('file', file);
-        formData.append('type', type);
-        formData.append('user_id', userId);
-
-        const response = await fetch(`${this.baseURL}/upload`, {
-            method: 'POST',
-            body: formData
-        });
-
-        const data = await response.json();
-        if (!response.ok) {
-            throw new Error(data.message || 'Upload failed');
-        }
-        return data;
+        return this.uploadChunked(file, type, userId);
     }
 
     async uploadMultipleFiles(files, type, userId) {
-        const formData = new FormData();
+        const paths = [];
+        const thumbnailPaths = [];
         for (let i = 0; i < files.length; i++) {
-            formData.append('files[]', files[i]);
+            const data = await this.uploadChunked(files[i], type, userId);
+            paths.push(data.path);
+            thumbnailPaths.push(data.thumbnail_path);
         }
-        formData.append('type', type);
-        formData.append('user_id', userId);
+        return { message: 'Files uploaded successfully', paths, thumbnail_paths: thumbnailPaths };
+    }
 
-        const response = await fetch(`${this.baseURL}/upload-multiple`, {
-            method: 'POST',
-            body: formData
-        });
+    // อัปโหลดทีละ chunk ผ่าน /upload/chunked ถ้าเน็ตหลุดจะถาม offset ล่าสุดจาก server แล้วส่งต่อ
+    // upload_id ถูกเก็บไว้ใน sessionStorage จึงส่งต่อได้แม้ผู้ใช้เลือกไฟล์เดิมแล้วกดส่งอีกครั้ง
+    async uploadChunked(file, type, userId, maxRetries = 5) {
+        const resumeKey = `upload:${type}:${file.name}:${file.size}:${file.lastModified}`;
+        let upload = null;
+        const savedId = sessionStorage.getItem(resumeKey);
+        if (savedId) {
+            upload = await this.fetch(`upload/chunked/${savedId}`).catch(() => null);
+        }
+        if (!upload) {
+            upload = await this.post('upload/chunked', { filename: file.name, size: file.size, type, user_id: userId });
+            sessionStorage.setItem(resumeKey, upload.upload_id);
+        }
 
-        const data = await response.json();
-        if (!response.ok) {
-            throw new Error(data.message || 'Upload failed');
+        const chunkSize = upload.chunk_size || 512 * 1024;
+        let offset = upload.offset;
+        let retries = 0;
+        while (offset < file.size) {
+            try {
+                const response = await fetch(`${this.baseURL}/upload/chunked/${upload.upload_id}`, this.withAuth({
+                    method: 'PUT',
+                    headers: { 'Content-Type': 'application/octet-stream', 'Upload-Offset': String(offset) },
+                    body: file.slice(offset, offset + chunkSize)
+                }));
+                this.handleUnauthorized(response);
+                const data = await response.json();
+                if (response.status === 409) {
+                    offset = data.offset;
+                    continue;
+                }
+                if (!response.ok) {
+                    throw new Error(data.message || 'Upload failed');
+                }
+                offset = data.offset;
+                retries = 0;
+            } catch (error) {
+                if (!(error instanceof TypeError) || ++retries > maxRetries) {
+                    throw error;
+                }
+                // เน็ตหลุด: รอแล้วถาม server ว่าได้รับถึงไหนแล้ว
+                await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** (retries - 1)));
+                const status = await this.fetch(`upload/chunked/${upload.upload_id}`).catch(() => null);
+                if (status) offset = status.offset;
+            }
         }
+
+        const data = await this.post(`upload/chunked/${upload.upload_id}/complete`, {});
+        sessionStorage.removeItem(resumeKey);
         return data;
     }
 }
@@ -254,6 +308,7 @@ class AuthManager {
     async login(username, password) {
         try {
             const data = await this.api.post('login', { username, password });
+            this.api.setToken(data.token || null);
             this.currentUser = {
                 user_id: data.user_id,
                 name: data.name,
@@ -285,6 +340,10 @@ class AuthManager {
     }
 
     logout() {
+        if (this.api.token) {
+            // เพิกถอน token ฝั่ง server ไม่ต้องรอผล
+            this.api.post('logout', {}).catch(() => {}).finally(() => this.api.setToken(null));
+        }
         sessionStorage.removeItem('isLoggedIn');
         sessionStorage.removeItem('userData');
         this.currentUser = {
@@ -469,9 +528,12 @@ class RepairRequestManager {
         if (repair.image_paths && repair.image_paths !== '[]') {
             try {
                 const paths = JSON.parse(repair.image_paths);
+                // แสดง thumbnail ขนาดไม่กี่ KB คลิกแล้วเปิด preview (previews/ คู่กับ thumbs/)
+                const thumbnails = repair.thumbnail_paths ? JSON.parse(repair.thumbnail_paths) : [];
+                const preview = (thumbnail, path) => thumbnail ? thumbnail.replace(/^thumbs\//, 'previews/') : path;
                 if (paths.length > 0) {
-                    imageContainer.innerHTML = paths.map(path =>
-                        `<img src="http://localhost:5000/uploads/${path}" alt="${repair.title}" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; margin-right: 10px;">`
+                    imageContainer.innerHTML = paths.map((path, index) =>
+                        `<a href="http://localhost:5000/uploads/${preview(thumbnails[index], path)}" target="_blank"><img src="http://localhost:5000/uploads/${thumbnails[index] || path}" alt="${repair.title}" loading="lazy" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; margin-right: 10px;"></a>`
                     ).join('');
                 } else {
                     imageContainer.innerHTML = '<p style="color: #666;">ไม่มีรูปภาพประกอบ</p>';
@@ -673,8 +735,22 @@ class BookingManager {
         }
     }
 
+    async fetchAvailability(location, date) {
+        const params = new URLSearchParams({ location, date });
+        return this.api.get(`booking-requests/availability?${params}`);
+    }
+
     async create(formData) {
         try {
+            const availability = await this.fetchAvailability(formData.location, formData.date);
+            const fitsFreeSlot = availability.free_slots.some(slot =>
+                slot.start_time <= formData.start_time && formData.end_time <= slot.end_time
+            );
+            if (!fitsFreeSlot) {
+                const freeText = availability.free_slots.map(slot => `${slot.start_time}-${slot.end_time}`).join(', ');
+                throw new Error(`ช่วงเวลานี้ไม่ว่าง ช่วงเวลาที่ว่าง: ${freeText || 'ไม่มี'}`);
+            }
+
             const data = await this.api.post('booking-requests', {
                 user_id: this.auth.getCurrentUser().user_id,
                 location: formData.location,
@@ -1316,10 +1392,12 @@ class ProfileManager {
                 return;
             }
 
-            await this.api.put(`users/${currentUser.user_id}`, {
+            const result = await this.api.put(`users/${currentUser.user_id}`, {
                 password: formData.newPassword,
                 current_password: formData.currentPassword
             });
+            // token เดิมถูกเพิกถอนเมื่อเปลี่ยนรหัสผ่าน ใช้ token ใหม่ที่ได้กลับมาแทน
+            if (result.token) this.api.setToken(result.token);
             
             this.ui.showNotification('เปลี่ยนรหัสผ่านสำเร็จ', 'success');
             document.getElementById('changePasswordForm').reset();
@@ -1334,32 +1412,34 @@ class ProfileManager {
 // Class: DashboardManager - จัดการแดชบอร์ด
 // ============================================
 class DashboardManager {
-    constructor(repairManager, userManager, billManager) {
-        this.repairManager = repairManager;
-        this.userManager = userManager;
-        this.billManager = billManager;
+    constructor(apiService, uiManager) {
+        this.api = apiService;
+        this.ui = uiManager;
         this.chartInstance = null;
     }
 
-    loadStats() {
+    async loadStats() {
+        let stats;
+        try {
+            stats = await this.api.get('dashboard/stats');
+        } catch (error) {
+            this.ui.showNotification('ไม่สามารถโหลดข้อมูลสถิติได้', 'error');
+            return;
+        }
+
         const totalEl = document.getElementById('totalResidents');
         const pendingEl = document.getElementById('pendingRepairs');
         const completedEl = document.getElementById('completedRepairs');
         const unpaidEl = document.getElementById('unpaidBills');
 
-        if (totalEl && this.userManager.cache) {
-            totalEl.textContent = this.userManager.cache.filter(u => u.role === 'resident' && u.status === 'approved').length;
-        }
-        if (pendingEl && this.repairManager.cache) {
-            pendingEl.textContent = this.repairManager.cache.filter(r => r.status === 'pending').length;
-        }
-        if (completedEl && this.repairManager.cache) {
-            completedEl.textContent = this.repairManager.cache.filter(r => r.status === 'completed').length;
-        }
+        if (totalEl) totalEl.textContent = stats.approved_residents;
+        if (pendingEl) pendingEl.textContent = stats.pending_repairs;
+        if (completedEl) completedEl.textContent = stats.completed_repairs;
+        if (unpaidEl) unpaidEl.textContent = stats.unpaid_bills;
 
         const activitiesEl = document.getElementById('recentActivities');
-        if (activitiesEl && this.repairManager.cache) {
-            const recentRepairs = this.repairManager.cache.slice(0, 3);
+        if (activitiesEl) {
+            const recentRepairs = stats.recent_activities;
             if (recentRepairs.length === 0) {
                 activitiesEl.innerHTML = '<tr><td colspan="4" style="text-align: center; color: #666; padding: 20px;">ยังไม่มีกิจกรรม</td></tr>';
             } else {
@@ -1369,20 +1449,30 @@ class DashboardManager {
                         <td>${time}</td>
                         <td>${repair.title}</td>
                         <td>${repair.user_name || 'ผู้ใช้งาน'}</td>
-                        <td>${app.ui.getStatusHtml(repair.status)}</td>
+                        <td>${this.ui.getStatusHtml(repair.status)}</td>
                     </tr>`;
                 }).join('');
             }
         }
     }
 
-    renderMonthlyChart() {
+    async renderMonthlyChart() {
         const ctx = document.getElementById('monthlyChart');
         if (!ctx) {
             console.warn("Canvas element 'monthlyChart' not found.");
             return;
         }
 
+        let report;
+        try {
+            report = await this.api.get(`reports/monthly?year=${new Date().getFullYear()}`);
+        } catch (error) {
+            this.ui.showNotification('ไม่สามารถโหลดข้อมูลรายงานได้', 'error');
+            return;
+        }
+        const income = report.categories.income;
+        const hasData = income.some(v => v > 0);
+
         if (this.chartInstance) {
             this.chartInstance.destroy();
         }
@@ -1392,21 +1482,12 @@ class DashboardManager {
             datasets: [
                 {
                     label: 'รายรับ (บาท)',
-                    data: [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+                    data: income,
                     backgroundColor: 'rgba(102, 126, 234, 0.6)',
                     borderColor: 'rgba(102, 126, 234, 1)',
                     borderWidth: 1,
                     fill: true,
                     tension: 0.3
-                },
-                {
-                    label: 'รายจ่าย (บาท)',
-                    data: [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-                    backgroundColor: 'rgba(255, 99, 132, 0.6)',
-                    borderColor: 'rgba(255, 99, 132, 1)',
-                    borderWidth: 1,
-                    fill: true,
-                    tension: 0.3
                 }
             ]
         };
@@ -1420,7 +1501,7 @@ class DashboardManager {
                 plugins: {
                     title: {
                         display: true,
-                        text: 'สรุปรายรับ-รายจ่ายรายเดือน (ยังไม่มีข้อมูล)'
+                        text: hasData ? `สรุปรายรับรายเดือน ปี ${report.year}` : 'สรุปรายรับรายเดือน (ยังไม่มีข้อมูล)'
                     }
                 },
                 scales: {
@@ -1571,6 +1652,17 @@ class SocketManager {
             if (app.paymentManager) app.paymentManager.fetchAll();
         });
 
+        this.socket.on('bills_issued', (data) => {
+            this.ui.showNotification(`มีบิลใหม่: ${data.item_name}`, 'info');
+            if (app.billManager) app.billManager.fetchAll();
+            if (app.paymentManager) app.paymentManager.fetchAll();
+        });
+
+        this.socket.on('bill_batch_created', (data) => {
+            this.ui.showNotification(`ออกบิล "${data.item_name}" แล้ว ${data.count} รายการ`, 'success');
+            if (app.billManager) app.billManager.fetchAll();
+        });
+
         this.socket.on('bill_updated', (data) => {
             this.ui.showNotification(`บิล "${data.item_name}" ได้รับการแก้ไข`, 'info');
             if (app.billManager) app.billManager.fetchAll();
@@ -1593,6 +1685,7 @@ class Application {
         this.api = new APIService('http://localhost:5000');
         this.ui = new UIManager();
         this.auth = new AuthManager(this.api, this.ui);
+        this.api.onUnauthorized = () => this.logout();
         this.repairManager = new RepairRequestManager(this.api, this.ui, this.auth);
         this.paymentManager = new PaymentManager(this.api, this.ui, this.auth);
         this.bookingManager = new BookingManager(this.api, this.ui, this.auth);
@@ -1600,7 +1693,7 @@ class Application {
         this.billManager = new BillManager(this.api, this.ui, this.auth, this.userManager);
         this.announcementManager = new AnnouncementManager(this.api, this.ui, this.auth);
         this.profileManager = new ProfileManager(this.api, this.ui, this.auth);
-        this.dashboardManager = new DashboardManager(this.repairManager, this.userManager, this.billManager);
+        this.dashboardManager = new DashboardManager(this.api, this.ui);
         this.socketManager = new SocketManager(this.auth, this.ui);
         
         this.pageMap = {
@@ -1664,10 +1757,7 @@ class Application {
     }
 
     async loadDashboard() {
-        await this.userManager.fetchAll();
-        await this.repairManager.fetchAll();
-        await this.billManager.fetchAll();
-        this.dashboardManager.loadStats();
+        await this.dashboardManager.loadStats();
     }
 
     setupEventListeners() {
@@ -1,17 +1,51 @@
 import os
 import uuid
+import base64
+import hashlib
+import csv
+import io
+import mimetypes
+import re
+import bisect
+import functools
+import itertools
+import logging
+import queue
+import multiprocessing
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, date, timedelta
+from urllib.parse import quote as url_quote
 import json
 from abc import ABC, abstractmethod
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, g, has_request_context, current_app
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit, join_room, leave_room
-from werkzeug.security import generate_password_hash, check_password_hash
+import socketio as socketio_lib
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+from itsdangerous import URLSafeSerializer, BadSignature
 from werkzeug.utils import secure_filename
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, event, create_engine, text, select, literal, exists, func, inspect
+from sqlalchemy.orm import joinedload, aliased, Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+try:
+    import orjson
+except ImportError:  # encoder เร็วเป็น optional, ไม่มีก็ใช้ json ของ stdlib
+    orjson = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # ไม่มี Pillow ก็ไม่สร้าง thumbnail, /uploads ส่งไฟล์ต้นฉบับแทน
+    Image = ImageOps = None
 
 # ============================================
 # Configuration Class
@@ -22,68 +56,498 @@ class Config:
     DATABASE_NAME = os.environ.get('DATABASE_NAME', 'smart_village.db')
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(BASE_DIR, DATABASE_NAME)}'
     
+    # PRAGMA ที่ตั้งให้ทุก connection ของ SQLite (ตั้ง SQLITE_PROFILE_ENABLED=0 เพื่อใช้ค่า default ของ SQLite)
+    SQLITE_PROFILE_ENABLED = os.environ.get('SQLITE_PROFILE_ENABLED', '1') == '1'
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),  # ค่าลบ = หน่วย KiB
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # มิลลิวินาที
+        'foreign_keys': os.environ.get('SQLITE_FOREIGN_KEYS', 'ON'),
+    }
+    
+    # เขียนข้อมูลผ่าน writer connection เดียว (group commit) และอ่านผ่าน pool แบบ read-only
+    WRITE_QUEUE_ENABLED = os.environ.get('WRITE_QUEUE_ENABLED', '1') == '1'
+    WRITE_QUEUE_MAX_BATCH = int(os.environ.get('WRITE_QUEUE_MAX_BATCH', 64))
+    WRITE_QUEUE_TIMEOUT = float(os.environ.get('WRITE_QUEUE_TIMEOUT', 30))  # วินาที
+    READ_POOL_SIZE = int(os.environ.get('READ_POOL_SIZE', 8))
+    
+    # Server (production ใช้ wsgi.py ซึ่งเลือก async worker และ monkey patch ก่อน import แอป)
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')  # eventlet | gevent | threading
+    DEBUG = os.environ.get('FLASK_DEBUG', '0') == '1'
+    HOST = os.environ.get('HOST', '0.0.0.0')
+    PORT = int(os.environ.get('PORT', 5000))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 100))  # ใช้กับ threading mode บน gunicorn
+    
+    # Message queue สำหรับกระจาย event ของ Socket.IO ข้ามหลาย worker process
+    # เช่น redis://localhost:6379/0, amqp://..., file:///tmp/smart_village_socketio, local:// (ว่าง = process เดียว)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE', '')
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'smart-village')
+    
     UPLOAD_FOLDER = 'static/uploads'
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx'}
     STATIC_FOLDER = os.environ.get('STATIC_FOLDER', 'Frontend')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+    # อายุ cache ของไฟล์ที่อัปโหลด (path มาจาก hash ของเนื้อหาหรือ uuid จึงเป็น immutable)
+    UPLOAD_IMMUTABLE_MAX_AGE = int(os.environ.get('UPLOAD_IMMUTABLE_MAX_AGE', 365 * 24 * 60 * 60))  # วินาที
+    # อัปโหลดแบบแบ่ง chunk (/upload/chunked) เก็บไฟล์ที่ยังไม่ครบไว้นอก UPLOAD_FOLDER เพื่อไม่ให้ /uploads ส่งออกไป
+    CHUNKED_UPLOAD_FOLDER = os.environ.get('CHUNKED_UPLOAD_FOLDER', 'static/uploads_partial')
+    CHUNKED_UPLOAD_CHUNK_SIZE = int(os.environ.get('CHUNKED_UPLOAD_CHUNK_SIZE', 512 * 1024))  # ขนาดที่แนะนำให้ client
+    CHUNKED_UPLOAD_MAX_SIZE = int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', 64 * 1024 * 1024))  # ขนาดไฟล์สูงสุด
+    # ลบไฟล์ที่ไม่มีรายการใดอ้างถึงและเก่ากว่า UPLOAD_GC_GRACE ทุก UPLOAD_GC_INTERVAL วินาที (0 = ไม่รันเบื้องหลัง)
+    UPLOAD_GC_INTERVAL = int(os.environ.get('UPLOAD_GC_INTERVAL', 6 * 60 * 60))
+    UPLOAD_GC_GRACE = int(os.environ.get('UPLOAD_GC_GRACE', 24 * 60 * 60))
+    UPLOAD_GC_BATCH_SIZE = int(os.environ.get('UPLOAD_GC_BATCH_SIZE', 500))
+    # grace ต่ำสุดที่ /admin/uploads/gc ยอมรับ ไฟล์ที่ผู้ใช้เพิ่งอัปโหลดระหว่างกรอกฟอร์มจึงไม่ถูกลบ
+    UPLOAD_GC_MIN_GRACE = int(os.environ.get('UPLOAD_GC_MIN_GRACE', 60 * 60))
+    # จำนวน thread ที่บันทึกไฟล์ของ /upload-multiple พร้อมกัน (รวมทุก request) 1 = ทีละไฟล์
+    UPLOAD_SAVE_WORKERS = int(os.environ.get('UPLOAD_SAVE_WORKERS', 4))
+    # ให้ proxy ด้านหน้าส่งไฟล์แทน Python: prefix ของ internal location ของ nginx (X-Accel-Redirect) เช่น /_uploads/
+    # หรือ UPLOAD_X_SENDFILE=1 สำหรับ Apache/lighttpd (X-Sendfile)
+    UPLOAD_ACCEL_REDIRECT = os.environ.get('UPLOAD_ACCEL_REDIRECT', '')
+    UPLOAD_X_SENDFILE = os.environ.get('UPLOAD_X_SENDFILE', '0') == '1'
+    # thumbnail/preview ของรูปที่อัปโหลด (ด้านยาวสุดเป็น pixel) สร้างเบื้องหลังบน process pool
+    THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', 320))
+    PREVIEW_SIZE = int(os.environ.get('PREVIEW_SIZE', 1280))
+    IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY', 80))
+    # จำนวน process ที่ย่อรูป 0 = ครึ่งหนึ่งของจำนวน core (อีกครึ่งเหลือไว้ให้ request และ hash รหัสผ่าน)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 0))
+    
+    # Keyset pagination for list endpoints
+    DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 50))
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 200))
+    
+    # เวลาเปิด-ปิดพื้นที่ส่วนกลาง ใช้คำนวณช่วงเวลาว่างสำหรับการจอง
+    BOOKING_OPEN_TIME = os.environ.get('BOOKING_OPEN_TIME', '06:00')
+    BOOKING_CLOSE_TIME = os.environ.get('BOOKING_CLOSE_TIME', '22:00')
+    
+    # Read-through cache ของ get_by_id/get_all เปิดเป็นราย service (users, announcements, repair_requests,
+    # booking_requests, bills, payments คั่นด้วย comma, ว่าง = ปิดทั้งหมด)
+    ENTITY_CACHE_SERVICES = {name.strip() for name in os.environ.get('ENTITY_CACHE_SERVICES', 'users,announcements').split(',') if name.strip()}
+    ENTITY_CACHE_MAX_SIZE = int(os.environ.get('ENTITY_CACHE_MAX_SIZE', 1024))
+    ENTITY_CACHE_TTL = float(os.environ.get('ENTITY_CACHE_TTL', 60))  # วินาที
+    
+    # วิธี hash รหัสผ่านของ werkzeug เช่น scrypt:32768:8:1 หรือ pbkdf2:sha256:600000
+    # hash เดิมที่ method/cost ไม่ตรงกับค่านี้จะถูก hash ใหม่เมื่อ login สำเร็จ
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # จำนวน process ที่ใช้ hash/ตรวจรหัสผ่าน 0 = เท่าจำนวน core ของเครื่อง
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    # งานที่รอ pool ได้พร้อมกัน (0 = workers x 8) และเวลารอสูงสุดก่อนตอบ 503
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 0))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))  # วินาที
+    # access token ที่ /login ออกให้ (ลงลายเซ็นด้วย SECRET_KEY) ถ้ารันหลาย process ต้องตั้ง SECRET_KEY ให้ตรงกัน
+    SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32).hex()
+    ACCESS_TOKEN_MAX_AGE = int(os.environ.get('ACCESS_TOKEN_MAX_AGE', 12 * 60 * 60))  # วินาที
+    # 1 = ทุก endpoint ยกเว้น login/สมัคร ต้องส่ง Authorization: Bearer <token>
+    AUTH_REQUIRED = os.environ.get('AUTH_REQUIRED', '0') == '1'
+    
+    # จำนวนแถวสูงสุดต่อการนำเข้าผู้ใช้ (POST /users/import)
+    USER_IMPORT_MAX_ROWS = int(os.environ.get('USER_IMPORT_MAX_ROWS', 5000))
+    
+    # จำนวนผู้รับสูงสุดต่อการออกบิลแบบกลุ่ม (POST /bills/batch)
+    BILL_BATCH_MAX_SIZE = int(os.environ.get('BILL_BATCH_MAX_SIZE', 5000))
+    
+    # JSON encoder ของ response: auto (orjson ถ้าติดตั้ง) | orjson | stdlib
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+    # list แบบเต็มถูกส่งเป็น stream ทีละ chunk: service ใน ENTITY_CACHE_SERVICES ใช้รายการจาก cache ที่เหลืออ่านจากฐานข้อมูลทีละ chunk
+    JSON_STREAM_LISTS = os.environ.get('JSON_STREAM_LISTS', '1') == '1'
+    JSON_STREAM_CHUNK_SIZE = int(os.environ.get('JSON_STREAM_CHUNK_SIZE', 500))
+    
+    # จำนวนแถวต่อ chunk ของไฟล์ CSV ที่ export (/exports/*.csv)
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 1000))
+    
+    # ส่งจำนวน SQL ที่รันต่อ request กลับใน header X-Query-Count
+    QUERY_COUNTER_ENABLED = os.environ.get('QUERY_COUNTER_ENABLED', '1') == '1'
     
     @classmethod
     def init_app(cls, app):
         app.config['SQLALCHEMY_DATABASE_URI'] = cls.SQLALCHEMY_DATABASE_URI
         app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': cls.READ_POOL_SIZE}
         app.config['UPLOAD_FOLDER'] = cls.UPLOAD_FOLDER
         app.config['MAX_CONTENT_LENGTH'] = cls.MAX_CONTENT_LENGTH
+        app.config['USE_X_SENDFILE'] = cls.UPLOAD_X_SENDFILE
         
         if not os.path.exists(cls.UPLOAD_FOLDER):
             os.makedirs(cls.UPLOAD_FOLDER)
+        os.makedirs(cls.CHUNKED_UPLOAD_FOLDER, exist_ok=True)
 
 # ============================================
 # File Manager Class
 # ============================================
+class UploadNotFound(LookupError):
+    pass
+
+
+class UploadOffsetMismatch(ValueError):
+    def __init__(self, offset):
+        super().__init__(f'Upload is at offset {offset}')
+        self.offset = offset
+
+
 class FileManager:
-    def __init__(self, upload_folder, allowed_extensions):
+    """เก็บไฟล์ที่อัปโหลดตาม SHA-256 ของเนื้อหา (objects/ab/<sha256>.<ext>) ไฟล์ที่เหมือนกันจึงมีบนดิสก์ชุดเดียว
+    และ path ไม่เปลี่ยนตลอดอายุไฟล์ ส่งพร้อม cache header แบบ immutable ได้
+    จำนวนรายการที่อ้างถึงแต่ละไฟล์อยู่ในตาราง stored_files (ดู UploadReferences)
+    ยกเว้นประเภทใน OWNER_UPLOAD_TYPES ซึ่งไม่มีรายการใดอ้างถึง จึงเก็บตามเจ้าของ <type>/<user_id>/<uuid4>_<ชื่อไฟล์> แบบเดิม"""
+    COPY_BUFFER_SIZE = 64 * 1024
+    OBJECT_FOLDER = 'objects'
+    OWNER_UPLOAD_TYPES = {'profile'}
+    # ชื่อไฟล์แบบเดิมก่อนมี objects/ คือ <uuid4>_<ชื่อไฟล์> ซึ่งไม่ถูกเขียนทับเช่นกัน
+    UUID_NAME = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_')
+    
+    def __init__(self, upload_folder, allowed_extensions, image_pipeline=None,
+                 partial_folder=None, max_upload_size=None, save_workers=1):
         self.upload_folder = upload_folder
         self.allowed_extensions = allowed_extensions
+        self.image_pipeline = image_pipeline
+        self.partial_folder = partial_folder
+        self.max_upload_size = max_upload_size
+        self.save_workers = save_workers
+        self._save_executor = None
+        self._shard_folders = set()
+        self._object_lock = threading.Lock()  # การตรวจไฟล์ซ้ำใน _store_object กับการลบของ UploadCollector
+        self._upload_locks = {}
+        self._locks_guard = threading.Lock()
     
     def allowed_file(self, filename):
-        return '.' in filename and filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
+        return '.' in filename and self.extension(filename) in self.allowed_extensions
     
-    def create_upload_folder(self, upload_type, user_id=None):
-        if user_id:
-            folder_path = os.path.join(self.upload_folder, upload_type, user_id)
-        else:
-            folder_path = os.path.join(self.upload_folder, upload_type)
-        
-        if not os.path.exists(folder_path):
-            os.makedirs(folder_path)
-        
+    @staticmethod
+    def extension(filename):
+        # ใช้ชื่อไฟล์เดิมไม่ผ่าน secure_filename เพราะ secure_filename ตัดอักษรที่ไม่ใช่ ASCII ทิ้ง ('สลิป.jpg' -> 'jpg')
+        return filename.rsplit('.', 1)[1].lower()
+    
+    def _shard_folder(self, digest):
+        # objects/ แบ่งตาม 2 ตัวแรกของ hash จึงมีไม่เกิน 256 โฟลเดอร์ สร้างครั้งเดียวแล้วจำไว้
+        shard = digest[:2]
+        folder_path = os.path.join(self.upload_folder, self.OBJECT_FOLDER, shard)
+        if shard not in self._shard_folders:
+            os.makedirs(folder_path, exist_ok=True)
+            self._shard_folders.add(shard)
         return folder_path
     
+    @classmethod
+    def is_object_path(cls, path):
+        return path.startswith(f'{cls.OBJECT_FOLDER}/')
+    
+    @classmethod
+    def is_owner_path(cls, path):
+        return path.split('/', 1)[0] in cls.OWNER_UPLOAD_TYPES
+    
+    @classmethod
+    def is_immutable_path(cls, path):
+        return cls.is_object_path(path) or bool(cls.UUID_NAME.match(os.path.basename(path)))
+    
+    def _temp_path(self):
+        return os.path.join(self.partial_folder or self.upload_folder, f'.{uuid.uuid4().hex}.tmp')
+    
+    def _store_object(self, temp_path, digest, filename):
+        # ไฟล์ชั่วคราวอยู่บน filesystem เดียวกัน rename จึงเป็น atomic ถ้ามีไฟล์เนื้อหาเดียวกันอยู่แล้วก็ทิ้งไฟล์ใหม่
+        extension = self.extension(filename)
+        relative_path = f'{self.OBJECT_FOLDER}/{digest[:2]}/{digest}.{extension}'
+        file_path = os.path.join(self._shard_folder(digest), f'{digest}.{extension}')
+        with self._object_lock:
+            if os.path.exists(file_path):
+                os.remove(temp_path)
+                os.utime(file_path)  # นับ grace period ของ UploadCollector ใหม่ เพราะกำลังจะถูกผูกกับรายการอีกครั้ง
+            else:
+                try:
+                    os.replace(temp_path, file_path)
+                except FileNotFoundError:
+                    # โฟลเดอร์ shard ถูกลบไปหลังจากจำไว้ (เช่นลบด้วยมือ) สร้างใหม่แล้วลองอีกครั้ง
+                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                    os.replace(temp_path, file_path)
+        if self.image_pipeline:
+            self.image_pipeline.submit(relative_path)
+        return relative_path
+    
+    def _store_owned(self, temp_path, filename, upload_type, user_id):
+        # เอกสารที่ไม่ถูกผูกกับรายการใด เก็บในโฟลเดอร์ของเจ้าของเพื่อให้ค้นจาก user_id ได้ และ UploadCollector ไม่แตะ
+        name = f"{uuid.uuid4()}_{secure_filename(filename.rsplit('.', 1)[0]) or 'file'}.{self.extension(filename)}"
+        parts = [upload_type, secure_filename(str(user_id)) if user_id else '', name]
+        relative_path = '/'.join(part for part in parts if part)
+        file_path = os.path.join(self.upload_folder, *relative_path.split('/'))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.replace(temp_path, file_path)
+        if self.image_pipeline:
+            self.image_pipeline.submit(relative_path)
+        return relative_path
+    
+    def _store(self, temp_path, digest, filename, upload_type, user_id):
+        if upload_type in self.OWNER_UPLOAD_TYPES:
+            return self._store_owned(temp_path, filename, upload_type, user_id)
+        return self._store_object(temp_path, digest, filename)
+    
     def save_file(self, file, upload_type, user_id=None):
         if not file or not self.allowed_file(file.filename):
             raise ValueError('File type not allowed')
         
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        
-        folder_path = self.create_upload_folder(upload_type, user_id)
-        file_path = os.path.join(folder_path, unique_filename)
-        file.save(file_path)
-        
-        if user_id:
-            relative_path = os.path.join(upload_type, user_id, unique_filename)
-        else:
-            relative_path = os.path.join(upload_type, unique_filename)
+        temp_path = self._temp_path()
+        digest = hashlib.sha256()
+        try:
+            with open(temp_path, 'wb') as temp_file:
+                for block in iter(lambda: file.stream.read(self.COPY_BUFFER_SIZE), b''):
+                    digest.update(block)
+                    temp_file.write(block)
+            return self._store(temp_path, digest.hexdigest(), file.filename, upload_type, user_id)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)  # ไม่ถูกย้ายไป objects/ เพราะเกิดข้อผิดพลาด
+    
+    def remove_stale(self, path, cutoff, age_path=None, dry_run=False):
+        """ลบไฟล์ถ้า mtime ของ age_path (ค่าเริ่มต้นคือไฟล์นั้นเอง) ยังเก่ากว่า cutoff คืนขนาดไฟล์ที่ลบ หรือ None
+        ตรวจ mtime ใหม่ใต้ lock เดียวกับ _store_object ไฟล์ที่เพิ่งถูกอัปโหลดซ้ำระหว่างรอบ GC จึงไม่ถูกลบ"""
+        file_path = os.path.join(self.upload_folder, *path.split('/'))
+        with self._object_lock:
+            try:
+                try:
+                    modified = os.stat(os.path.join(self.upload_folder, *(age_path or path).split('/'))).st_mtime
+                except FileNotFoundError:
+                    modified = os.stat(file_path).st_mtime  # variant ที่ไม่มีไฟล์ต้นฉบับแล้ว
+                if modified >= cutoff:
+                    return None
+                size = os.path.getsize(file_path)
+                if not dry_run:
+                    os.remove(file_path)
+            except FileNotFoundError:
+                return None
+        return size
+    
+    # --- Chunked Uploads ---
+    # ไฟล์ <upload_id>.part ใน partial_folder คือข้อมูลที่ได้รับแล้ว ขนาดของไฟล์คือ offset ที่ client ส่งต่อได้
+    # และ <upload_id>.json เก็บชื่อไฟล์ ปลายทาง และขนาดที่ประกาศไว้ตอนเริ่ม จึง resume ได้แม้ server restart
+    def _partial_paths(self, upload_id):
+        try:
+            upload_id = uuid.UUID(upload_id).hex
+        except (TypeError, ValueError):
+            raise UploadNotFound(upload_id)
+        base = os.path.join(self.partial_folder, upload_id)
+        return f'{base}.part', f'{base}.json'
+    
+    def _upload_lock(self, upload_id):
+        part_path, _ = self._partial_paths(upload_id)
+        with self._locks_guard:
+            return self._upload_locks.setdefault(part_path, threading.Lock())
+    
+    def _release_lock(self, upload_id):
+        part_path, _ = self._partial_paths(upload_id)
+        with self._locks_guard:
+            self._upload_locks.pop(part_path, None)
+    
+    def _read_upload(self, upload_id):
+        part_path, meta_path = self._partial_paths(upload_id)
+        try:
+            with open(meta_path, encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+            meta['offset'] = os.path.getsize(part_path)
+        except FileNotFoundError:
+            raise UploadNotFound(upload_id)
+        return meta, part_path, meta_path
+    
+    def init_upload(self, filename, size, upload_type, user_id=None):
+        if not filename or not self.allowed_file(filename):
+            raise ValueError('File type not allowed')
+        if not isinstance(size, int) or size <= 0:
+            raise ValueError('File size is required')
+        if self.max_upload_size and size > self.max_upload_size:
+            raise ValueError('File is too large')
         
-        return relative_path.replace('\\', '/')
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = self._partial_paths(upload_id)
+        meta = {
+            'upload_id': upload_id, 'filename': filename, 'size': size,
+            'type': upload_type, 'user_id': user_id, 'created_at': time.time()
+        }
+        open(part_path, 'xb').close()
+        with open(meta_path, 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file)
+        return {**meta, 'offset': 0}
+    
+    def upload_status(self, upload_id):
+        meta, _, _ = self._read_upload(upload_id)
+        return meta
+    
+    def append_chunk(self, upload_id, offset, stream, length):
+        """เขียน chunk จาก stream ลงดิสก์ทีละ COPY_BUFFER_SIZE โดยไม่อ่านทั้ง chunk เข้าหน่วยความจำ
+        ถ้าการเชื่อมต่อหลุดกลาง chunk ข้อมูลที่เขียนไปแล้วยังอยู่ client ถาม offset แล้วส่งต่อจากตรงนั้น"""
+        with self._upload_lock(upload_id):
+            meta, part_path, _ = self._read_upload(upload_id)
+            if offset != meta['offset']:
+                raise UploadOffsetMismatch(meta['offset'])
+            if offset + length > meta['size']:
+                raise ValueError('Chunk exceeds declared file size')
+            
+            with open(part_path, 'ab') as part_file:
+                remaining = length
+                while remaining:
+                    block = stream.read(min(self.COPY_BUFFER_SIZE, remaining))
+                    if not block:
+                        break
+                    part_file.write(block)
+                    remaining -= len(block)
+                meta['offset'] = part_file.tell()
+        return meta
+    
+    def finalize_upload(self, upload_id):
+        with self._upload_lock(upload_id):
+            meta, part_path, meta_path = self._read_upload(upload_id)
+            if meta['offset'] != meta['size']:
+                raise UploadOffsetMismatch(meta['offset'])
+            digest = hashlib.sha256()
+            with open(part_path, 'rb') as part_file:
+                for block in iter(lambda: part_file.read(self.COPY_BUFFER_SIZE), b''):
+                    digest.update(block)
+            relative_path = self._store(part_path, digest.hexdigest(), meta['filename'], meta['type'], meta['user_id'])
+            os.remove(meta_path)
+        self._release_lock(upload_id)
+        return relative_path
+    
+    def abort_upload(self, upload_id):
+        with self._upload_lock(upload_id):
+            _, part_path, meta_path = self._read_upload(upload_id)
+            for path in (part_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        self._release_lock(upload_id)
+    
+    def _save_pool(self):
+        with self._locks_guard:
+            if self._save_executor is None:
+                self._save_executor = ThreadPoolExecutor(self.save_workers, thread_name_prefix='upload-save')
+            return self._save_executor
     
     def save_multiple_files(self, files, upload_type, user_id=None):
-        saved_paths = []
-        for file in files:
-            if file and self.allowed_file(file.filename):
-                path = self.save_file(file, upload_type, user_id)
-                saved_paths.append(path)
-        return saved_paths
+        # เขียนและ hash หลายไฟล์พร้อมกันบน thread pool ขนาดคงที่ (I/O และ sha256 ของ chunk ใหญ่ปล่อย GIL)
+        # ผลลัพธ์เรียงตามลำดับไฟล์ที่ส่งมา
+        files = [file for file in files if file and self.allowed_file(file.filename)]
+        save = functools.partial(self.save_file, upload_type=upload_type, user_id=user_id)
+        if self.save_workers < 2 or len(files) < 2:
+            return [save(file) for file in files]
+        return list(self._save_pool().map(save, files))
+
+def _render_image_variants(source, targets, quality):
+    # รันใน worker process: decode ครั้งเดียวแล้วย่อเป็นทุกขนาด เขียนไฟล์ชั่วคราวก่อน rename
+    # เพื่อไม่ให้ /uploads ส่งไฟล์ที่เขียนไม่เสร็จ
+    with Image.open(source) as image:
+        image.draft('RGB', (max(size for _, size in targets),) * 2)  # JPEG decode ที่ความละเอียดต่ำลงได้เลย
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        for target, size in sorted(targets, key=lambda item: -item[1]):
+            image.thumbnail((size, size), Image.LANCZOS)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            partial = f"{target}.{os.getpid()}.tmp"
+            image.save(partial, 'JPEG', quality=quality, optimize=True, progressive=True)
+            os.replace(partial, target)
+    return [target for target, _ in targets]
+
+
+class ImagePipeline:
+    """สร้าง thumbnail และ preview (JPEG ที่บีบอัดใหม่) ของรูปที่อัปโหลดบน process pool หลังตอบ request แล้ว
+
+    path ของ variant คำนวณได้จาก path ต้นฉบับ เช่น repair/u1/a.png -> thumbs/repair/u1/a.png.jpg
+    จึงบันทึกลงฐานข้อมูลได้ทันทีตอนสร้างรายการ ระหว่างที่ยังย่อไม่เสร็จ /uploads ส่งต้นฉบับแทน
+    """
+    IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    VARIANT_FOLDERS = {'thumb': 'thumbs', 'preview': 'previews'}
+    # จำนวน path ที่ย่อไม่สำเร็จที่จำไว้สูงสุด (ล้างทั้งหมดเมื่อเกิน)
+    MAX_FAILED = 10000
+    
+    def __init__(self, upload_folder, sizes, quality=80, workers=None, logger=None):
+        self.upload_folder = os.path.abspath(upload_folder)
+        self.sizes = sizes
+        self.quality = quality
+        self.workers = workers or max(1, (os.cpu_count() or 1) // 2)
+        self.enabled = Image is not None
+        self.logger = logger or logging.getLogger(__name__)
+        self._queued = set()
+        # path ใน objects/ ตั้งชื่อตามเนื้อหา รูปที่เสียจึงเสียตลอด ไม่ต้องส่งเข้าคิวซ้ำทุกครั้งที่มีคนขอ thumbnail
+        self._failed = set()
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def variant_path(cls, path, variant='thumb'):
+        if not path or '.' not in path or path.rsplit('.', 1)[1].lower() not in cls.IMAGE_EXTENSIONS:
+            return None
+        return f"{cls.VARIANT_FOLDERS[variant]}/{path}.jpg"
+    
+    @classmethod
+    def source_path(cls, variant_path):
+        folder, _, path = variant_path.partition('/')
+        if folder not in cls.VARIANT_FOLDERS.values() or not path.endswith('.jpg'):
+            return None
+        return path[:-len('.jpg')]
+    
+    @classmethod
+    def thumbnail_paths(cls, image_paths):
+        # image_paths ของ RepairRequest เป็น JSON list ในรูปข้อความ
+        try:
+            paths = json.loads(image_paths or '[]')
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(paths, list):
+            return None
+        return json.dumps([cls.variant_path(path) for path in paths])
+    
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_exit_with_parent, initargs=(os.getpid(),)
+                )
+            return self._executor
+    
+    def submit(self, path):
+        """ส่งรูปเข้าคิวย่อ คืน Future หรือ None ถ้าไม่ใช่รูป, ไม่มี Pillow หรืออยู่ในคิวแล้ว"""
+        if not self.enabled or self.variant_path(path) is None:
+            return None
+        source = os.path.join(self.upload_folder, path)
+        targets = [(os.path.join(self.upload_folder, self.variant_path(path, variant)), size)
+                   for variant, size in self.sizes.items()]
+        if all(os.path.exists(target) for target, _ in targets):
+            return None  # ไฟล์เนื้อหาเดียวกันเคยถูกย่อไว้แล้ว
+        with self._lock:
+            if path in self._queued or path in self._failed:
+                return None
+            self._queued.add(path)
+        try:
+            future = self._pool().submit(_render_image_variants, source, targets, self.quality)
+        except BrokenProcessPool:
+            self.shutdown()
+            future = self._pool().submit(_render_image_variants, source, targets, self.quality)
+        future.add_done_callback(functools.partial(self._done, path))
+        return future
+    
+    def _done(self, path, future):
+        error = future.exception()
+        with self._lock:
+            self._queued.discard(path)
+            # worker ตาย (BrokenProcessPool) ไม่ได้แปลว่ารูปเสีย ให้ลองใหม่ได้
+            if error is not None and not isinstance(error, BrokenProcessPool):
+                if len(self._failed) >= self.MAX_FAILED:
+                    self._failed.clear()
+                self._failed.add(path)
+        if isinstance(error, BrokenProcessPool):
+            self.shutdown()
+        if error is not None:
+            self.logger.warning('image variants failed for %s: %r', path, error)
+    
+    def pending(self):
+        with self._lock:
+            return len(self._queued)
+    
+    def shutdown(self, wait=False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
 
 # ============================================
 # Database Models (SQLite Compatible)
@@ -154,6 +618,7 @@ class RepairRequest(db.Model):
     submitted_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     status = db.Column(db.String(50), default='pending', index=True)
     image_paths = db.Column(db.Text)
+    thumbnail_paths = db.Column(db.Text)
 
     requester = db.relationship('User', backref='repair_requests_made')
 
@@ -167,7 +632,8 @@ class RepairRequest(db.Model):
             'description': self.description,
             'submitted_date': self.submitted_date.isoformat(),
             'status': self.status,
-            'image_paths': self.image_paths
+            'image_paths': self.image_paths,
+            'thumbnail_paths': self.thumbnail_paths
         }
 
 class BookingRequest(db.Model):
@@ -226,6 +692,24 @@ class Bill(db.Model):
             'status': self.status
         }
 
+class BillRecipient(db.Model):
+    # ผู้ที่มองเห็นบิลแต่ละใบพร้อมสถานะการชำระของแต่ละครัวเรือน (บิล 'all' มีหนึ่งแถวต่อผู้ใช้)
+    # issued_date ซ้ำกับ bills เพื่อให้รายการบิลของผู้ใช้อ่านจาก index (user_id, issued_date, bill_id) ได้ตรง ๆ
+    __tablename__ = 'bill_recipients'
+    bill_id = db.Column(db.String(36), db.ForeignKey('bills.bill_id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    issued_date = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(50), default='unpaid', nullable=False)
+
+    bill = db.relationship('Bill')
+
+    __table_args__ = (
+        db.Index('ix_bill_recipients_user_issued', 'user_id', 'issued_date', 'bill_id'),
+    )
+
+    def to_dict(self):
+        return {**self.bill.to_dict(), 'status': self.status}
+
 class Payment(db.Model):
     __tablename__ = 'payments'
     payment_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -236,6 +720,7 @@ class Payment(db.Model):
     payment_method = db.Column(db.String(50))
     status = db.Column(db.String(50), default='pending', index=True)
     slip_path = db.Column(db.String(255))
+    slip_thumbnail_path = db.Column(db.String(255))
 
     bill = db.relationship('Bill', backref='payments_for_bill')
     payer = db.relationship('User', backref='payments_made')
@@ -251,16 +736,988 @@ class Payment(db.Model):
             'payment_date': self.payment_date.isoformat(),
             'payment_method': self.payment_method,
             'status': self.status,
-            'slip_path': self.slip_path
+            'slip_path': self.slip_path,
+            'slip_thumbnail_path': self.slip_thumbnail_path
         }
 
+class StoredFile(db.Model):
+    # จำนวนรายการ (image_paths ของแจ้งซ่อม, slip_path ของการชำระเงิน) ที่อ้างถึงไฟล์แต่ละไฟล์
+    __tablename__ = 'stored_files'
+    path = db.Column(db.String(255), primary_key=True)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class DashboardCounter(db.Model):
+    __tablename__ = 'dashboard_counters'
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+
+class MonthlyFinancialRollup(db.Model):
+    __tablename__ = 'monthly_financial_rollups'
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(20), primary_key=True)
+    total_amount = db.Column(db.Float, default=0, nullable=False)
+    entry_count = db.Column(db.Integer, default=0, nullable=False)
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    duration_ms = db.Column(db.Float, nullable=False)
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'name': self.name,
+            'applied_at': self.applied_at.isoformat(),
+            'duration_ms': self.duration_ms
+        }
+
+# Composite index ตาม filter + ORDER BY ของ list query ในแต่ละ service
+# ฐานข้อมูลใหม่ได้จาก create_all ส่วนฐานข้อมูลเดิมได้จาก migration
+COMPOSITE_INDEXES = (
+    db.Index('ix_users_created', User.created_at, User.user_id),
+    db.Index('ix_announcements_published', Announcement.published_date, Announcement.announcement_id),
+    db.Index('ix_repair_requests_submitted', RepairRequest.submitted_date, RepairRequest.request_id),
+    db.Index('ix_repair_requests_user_submitted', RepairRequest.user_id, RepairRequest.submitted_date, RepairRequest.request_id),
+    db.Index('ix_booking_requests_date_start', BookingRequest.date.desc(), BookingRequest.start_time, BookingRequest.booking_id),
+    db.Index('ix_booking_requests_user_date', BookingRequest.user_id, BookingRequest.date.desc(), BookingRequest.start_time, BookingRequest.booking_id),
+    db.Index('ix_booking_requests_slot', BookingRequest.location, BookingRequest.date, BookingRequest.status),
+    db.Index('ix_bills_issued', Bill.issued_date, Bill.bill_id),
+    db.Index('ix_payments_date', Payment.payment_date, Payment.payment_id),
+    db.Index('ix_payments_user_date', Payment.user_id, Payment.payment_date, Payment.payment_id),
+    db.Index('ix_payments_status_date', Payment.status, Payment.payment_date),
+)
+
+# ============================================
+# Schema Migrations
+# ============================================
+class MigrationRunner:
+    """รัน migration ตามลำดับ version ทีละรายการใน transaction ของตัวเอง
+    และบันทึก version พร้อมเวลาที่ใช้ลงตาราง schema_migrations"""
+    
+    def __init__(self, database):
+        self.db = database
+        self.migrations = []
+    
+    def register(self, version, name):
+        def decorator(fn):
+            self.migrations.append((version, name, fn))
+            self.migrations.sort(key=lambda migration: migration[0])
+            return fn
+        return decorator
+    
+    def applied_versions(self):
+        # อ่านอย่างเดียว (เรียกจาก /admin/schema ด้วย) ตารางถูกสร้างใน run() ฐานข้อมูลที่ยังไม่เคย migrate จึงยังไม่มี version ใด
+        if not inspect(self.db.engine).has_table(SchemaMigration.__tablename__):
+            return set()
+        return {row.version for row in SchemaMigration.query.with_entities(SchemaMigration.version)}
+    
+    def pending(self):
+        applied = self.applied_versions()
+        return [(version, name) for version, name, _ in self.migrations if version not in applied]
+    
+    def run(self):
+        SchemaMigration.__table__.create(bind=self.db.engine, checkfirst=True)
+        applied = self.applied_versions()
+        for version, name, fn in self.migrations:
+            if version in applied:
+                continue
+            started = time.perf_counter()
+            try:
+                fn(self.db.session.connection())
+                duration_ms = (time.perf_counter() - started) * 1000
+                self.db.session.add(SchemaMigration(version=version, name=name, duration_ms=duration_ms))
+                self.db.session.commit()
+            except Exception:
+                self.db.session.rollback()
+                raise
+            current_app.logger.info('migration %03d %s: %.1f ms', version, name, duration_ms)
+
+
+migrations = MigrationRunner(db)
+
+
+@migrations.register(1, 'baseline schema')
+def _migrate_baseline(connection):
+    db.metadata.create_all(bind=connection)
+
+
+@migrations.register(2, 'backfill bill_recipients')
+def _migrate_bill_recipients(connection):
+    if BillRecipient.query.first() is None and Bill.query.first() is not None:
+        BillAudience.backfill()
+
+
+@migrations.register(3, 'composite indexes for list queries')
+def _migrate_composite_indexes(connection):
+    # SQLite สร้าง index ได้ขณะที่ reader อื่นยังอ่านผ่าน WAL ได้ตามปกติ, writer รอจนเสร็จ
+    for index in COMPOSITE_INDEXES:
+        index.create(bind=connection, checkfirst=True)
+
+
+@migrations.register(4, 'table version counters')
+def _migrate_table_versions(connection):
+    TableVersion.__table__.create(bind=connection, checkfirst=True)
+    TableVersionService.seed(connection)
+
+
+@migrations.register(5, 'image thumbnail paths')
+def _migrate_thumbnail_paths(connection):
+    # ฐานข้อมูลที่สร้างจาก create_all ของโค้ดใหม่มีคอลัมน์อยู่แล้ว
+    columns = {
+        'repair_requests': ('thumbnail_paths', 'TEXT'),
+        'payments': ('slip_thumbnail_path', 'VARCHAR(255)'),
+    }
+    for table, (column, column_type) in columns.items():
+        existing = {row[1] for row in connection.execute(text(f'PRAGMA table_info({table})'))}
+        if column not in existing:
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+    # รูปเดิมได้ path ไว้ก่อน ไฟล์ thumbnail ถูกสร้างเมื่อมีคนขอครั้งแรก
+    for request_id, image_paths in connection.execute(text(
+            'SELECT request_id, image_paths FROM repair_requests WHERE thumbnail_paths IS NULL')).all():
+        connection.execute(text('UPDATE repair_requests SET thumbnail_paths = :paths WHERE request_id = :id'),
+                           {'paths': ImagePipeline.thumbnail_paths(image_paths), 'id': request_id})
+    for payment_id, slip_path in connection.execute(text(
+            'SELECT payment_id, slip_path FROM payments WHERE slip_thumbnail_path IS NULL AND slip_path IS NOT NULL')).all():
+        connection.execute(text('UPDATE payments SET slip_thumbnail_path = :path WHERE payment_id = :id'),
+                           {'path': ImagePipeline.variant_path(slip_path), 'id': payment_id})
+
+
+@migrations.register(6, 'stored file reference counts')
+def _migrate_stored_files(connection):
+    StoredFile.__table__.create(bind=connection, checkfirst=True)
+    if StoredFile.query.first() is None:
+        UploadReferences.backfill()
+
+
+@migrations.register(7, "bills for 'all' go to approved residents only")
+def _migrate_bill_audience(connection):
+    BillAudience.restrict_to_members()
+    # สถานะบิลอาจเปลี่ยน ให้ counter ของแดชบอร์ดนับใหม่ตอนอ่านครั้งถัดไป และ ETag ของรายการบิลเปลี่ยน
+    DashboardCounter.query.delete(synchronize_session=False)
+    TableVersionService(db).bump(['bills'])
+
+
+@migrations.register(8, 'drop ix_bills_recipient_issued')
+def _migrate_drop_bill_recipient_index(connection):
+    # รายการบิลของผู้ใช้อ่านผ่าน bill_recipients แล้ว การค้น recipient_id = 'all' ใช้ ix_bills_recipient_id
+    connection.execute(text('DROP INDEX IF EXISTS ix_bills_recipient_issued'))
+
+
+def explain_query_plan(query):
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    return [row[-1] for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}'))]
+
+# ============================================
+# SQLite Engine Profile
+# ============================================
+class SQLiteEngineProfile:
+    def __init__(self, pragmas):
+        self.pragmas = dict(pragmas)
+    
+    def apply(self, dbapi_connection, connection_record=None):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in self.pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+    
+    def init_app(self, app, database):
+        with app.app_context():
+            engine = database.engine
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', self.apply)
+
+# ============================================
+# Write Queue (single SQLite writer with group commit)
+# ============================================
+class WriteQueueBusy(RuntimeError):
+    def __init__(self, cancelled):
+        # cancelled: งานยังไม่เริ่มและถูกยกเลิกแล้ว ไม่ถูกบันทึกแน่นอน ไม่เช่นนั้นอาจถูกบันทึกภายหลัง
+        super().__init__('Write was cancelled' if cancelled else 'Write is still running')
+        self.cancelled = cancelled
+
+
+class _WriteJob:
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.savepoint = None
+        self.committed = False
+        self.flushed = False
+        self.result = None
+        self.error = None
+        self.after_commit = []
+
+
+class WriteQueue:
+    """รันงานเขียนทุกงานบน writer thread เดียวที่ถือ connection ของตัวเอง
+
+    งานที่เข้าคิวพร้อมกันจะถูกรวมเป็น transaction เดียว (group commit) โดยแต่ละงาน
+    อยู่ใน SAVEPOINT ของตัวเอง งานที่ล้มเหลวจึงไม่กระทบงานอื่นในกลุ่ม
+    ส่วน request thread ใช้ connection จาก pool ปกติซึ่งถูกตั้งเป็น query_only
+    """
+    
+    def __init__(self, app, database, max_batch=64, timeout=30, engine_profile=None):
+        self.app = app
+        self.db = database
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'], pool_size=1, max_overflow=0)
+        if engine_profile:
+            event.listen(self.engine, 'connect', engine_profile.apply)
+        # ให้ SQLAlchemy ควบคุม BEGIN เอง เพื่อให้ SAVEPOINT ทำงานถูกต้องบน pysqlite
+        event.listen(self.engine, 'connect', self._disable_driver_transactions)
+        event.listen(self.engine, 'begin', self._begin_immediate)
+        with app.app_context():
+            event.listen(database.engine, 'checkout', self._set_query_only)
+        
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._invalidate_listeners = []
+        self._data_version = None
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+    
+    @staticmethod
+    def _disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+    
+    @staticmethod
+    def _begin_immediate(conn):
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+    
+    @staticmethod
+    def _set_query_only(dbapi_connection, connection_record, connection_proxy):
+        # connection ที่ request thread ใช้อ่านเท่านั้น, งานนอก request (เช่น create_all) เขียนได้ตามปกติ
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA query_only={'ON' if has_request_context() else 'OFF'}")
+        finally:
+            cursor.close()
+    
+    def in_writer_thread(self):
+        return threading.current_thread() is self._thread
+    
+    def submit(self, fn, *args, **kwargs):
+        if self.in_writer_thread():
+            return fn(*args, **kwargs)
+        job = _WriteJob(fn, args, kwargs)
+        self._queue.put(job)
+        try:
+            return job.future.result(self.timeout)
+        except FutureTimeoutError:
+            raise WriteQueueBusy(job.future.cancel())
+    
+    def _current_job(self):
+        return getattr(self._local, 'job', None)
+    
+    def commit(self):
+        job = self._current_job()
+        if job is None:
+            self.db.session.commit()
+            return
+        # commit จริงเกิดขึ้นครั้งเดียวตอนจบกลุ่ม
+        self.db.session.flush()
+        job.committed = True
+        job.flushed = True
+    
+    def rollback(self):
+        job = self._current_job()
+        if job is None:
+            self.db.session.rollback()
+            return
+        # flush ที่ล้มเหลวจะทำให้ savepoint inactive แต่ยังต้อง rollback เพื่อใช้ session ต่อได้
+        if job.savepoint is not None:
+            job.savepoint.rollback()
+            job.savepoint = None
+        job.committed = False
+        job.after_commit.clear()
+    
+    def on_invalidate(self, callback):
+        # สำหรับ cache ในหน่วยความจำที่ต้องล้างเมื่อ group commit ทั้งกลุ่มล้มเหลว
+        # หรือเมื่อมี process อื่นเขียนฐานข้อมูลไฟล์เดียวกัน
+        self._invalidate_listeners.append(callback)
+    
+    def _invalidate(self):
+        for listener in self._invalidate_listeners:
+            listener()
+    
+    def _check_external_writes(self, session):
+        # data_version เปลี่ยนเมื่อ connection อื่นที่ไม่ใช่ writer นี้ commit ลงไฟล์เดียวกัน
+        version = session.execute(text('PRAGMA data_version')).scalar()
+        if self._data_version is not None and version != self._data_version:
+            self._invalidate()
+        self._data_version = version
+    
+    def after_commit(self, callback):
+        job = self._current_job()
+        if job is None:
+            callback()
+        else:
+            job.after_commit.append(callback)
+    
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = [self._queue.get()]
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._run_batch(batch)
+    
+    def _run_batch(self, batch):
+        # งานที่ผู้ส่งรอจนหมดเวลาและยกเลิกไปแล้วไม่ถูกรัน
+        batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        session = Session(bind=self.engine, expire_on_commit=False)
+        self.db.session.registry.set(session)
+        try:
+            self._check_external_writes(session)
+            for job in batch:
+                self._run_job(session, job)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            self._invalidate()
+            for job in batch:
+                job.future.set_exception(e)
+            return
+        finally:
+            session.close()
+            self.db.session.registry.clear()
+        
+        for job in batch:
+            if job.error is not None:
+                job.future.set_exception(job.error)
+                continue
+            for callback in job.after_commit:
+                try:
+                    callback()
+                except Exception:
+                    self.app.logger.exception('after_commit callback failed')
+            job.future.set_result(job.result)
+    
+    def _run_job(self, session, job):
+        self._local.job = job
+        job.savepoint = session.begin_nested()
+        try:
+            job.result = job.fn(*job.args, **job.kwargs)
+        except Exception as e:
+            job.error = e
+        finally:
+            self._local.job = None
+        
+        if job.savepoint is not None:
+            if job.committed and job.error is None:
+                job.savepoint.commit()
+            else:
+                job.savepoint.rollback()
+        if not job.committed:
+            job.after_commit.clear()
+        if job.flushed and not (job.committed and job.error is None):
+            # cache ในหน่วยความจำที่ถูกแก้ทันทีหลัง flush (เช่น BookingIntervalIndex) อาจมีข้อมูลของงานที่ย้อนกลับไปแล้ว
+            self._invalidate()
+
+
+class DeferredEmitter:
+    """ห่อ SocketIO ให้ส่ง event หลัง group commit สำเร็จ ไม่ใช่ก่อนข้อมูลถูกบันทึก"""
+    
+    def __init__(self, socketio_instance, write_queue):
+        self.socketio = socketio_instance
+        self.write_queue = write_queue
+    
+    def emit(self, *args, **kwargs):
+        self.write_queue.after_commit(lambda: self.socketio.emit(*args, **kwargs))
+
+
+class WriterMixin:
+    writer = None
+    # ตารางที่ service นี้แก้ไข จะถูกเพิ่ม version ใน transaction เดียวกับข้อมูล
+    versions = None
+    written_tables = ()
+    
+    def _commit(self):
+        tables = self.written_tables if self.versions else ()
+        if tables:
+            self.versions.bump(tables)
+        if self.writer:
+            self.writer.commit()
+        else:
+            self.db.session.commit()
+        if tables:
+            # ล้าง cache หลัง commit จริง ไม่เช่นนั้น reader อาจโหลดค่าเก่ากลับเข้า cache ก่อนข้อมูลถูกบันทึก
+            notify = functools.partial(self.versions.notify, tables)
+            if self.writer:
+                self.writer.after_commit(notify)
+            else:
+                notify()
+    
+    def _rollback(self):
+        if self.writer:
+            self.writer.rollback()
+        else:
+            self.db.session.rollback()
+    
+    def _write(self, fn, *args, **kwargs):
+        if self.writer:
+            return self.writer.submit(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+
+def serialized_write(method):
+    # ส่ง method ที่แก้ไขข้อมูลไปรันบน writer thread เมื่อเปิดใช้ WriteQueue
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.writer is None:
+            return method(self, *args, **kwargs)
+        try:
+            return self.writer.submit(method, self, *args, **kwargs)
+        except SQLAlchemyError as e:
+            return {'message': f'Database write failed: {str(e)}'}, 500
+        except WriteQueueBusy as e:
+            return write_queue_busy_response(e), 503
+    return wrapper
+
+
+def write_queue_busy_response(error):
+    if error.cancelled:
+        return {'message': 'Server is busy, the change was not saved. Please try again'}
+    return {'message': 'Server is busy, the change may still be saved. Please check before trying again'}
+
+# ============================================
+# Entity Cache
+# ============================================
+class EntityCache:
+    """LRU + TTL cache ของผลลัพธ์ get_by_id/get_all ของ service หนึ่ง (thread-safe)"""
+    
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # เพิ่มทุกครั้งที่ invalidate ค่าที่โหลดก่อนหน้านั้นจะไม่ถูกเก็บ
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def get_or_load(self, key, loader, cacheable=True):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            generation = self._generation
+        
+        value = loader()
+        if cacheable and self._cacheable(value):
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (now + self.ttl, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+        return value
+    
+    @staticmethod
+    def _cacheable(value):
+        # get_by_id คืน (data, error, status) เก็บเฉพาะที่พบข้อมูล
+        return not isinstance(value, tuple) or value[-1] == 200
+    
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.invalidations += 1
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+
+def cached_read(method):
+    # อ่านผ่าน EntityCache ของ service ถ้าเปิดใช้ ไม่เก็บค่าที่อ่านบน writer thread เพราะอาจยังไม่ commit
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.cache is None:
+            return method(self, *args, **kwargs)
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        cacheable = not (self.writer and self.writer.in_writer_thread())
+        return self.cache.get_or_load(key, lambda: method(self, *args, **kwargs), cacheable)
+    return wrapper
+
+# ============================================
+# Password Hashing
+# ============================================
+class PasswordHasherBusy(RuntimeError):
+    pass
+
+
+def _hash_passwords(hash_password, passwords):
+    return [hash_password(password) for password in passwords]
+
+
+def _exit_with_parent(parent_pid):
+    # worker ของ pool ค้างอยู่ถ้า server ถูก kill โดยไม่ได้ shutdown pool จึงออกเองเมื่อ parent หายไป
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+    threading.Thread(target=watch, name='parent-watch', daemon=True).start()
+
+
+class PasswordHasher:
+    """hash และตรวจรหัสผ่านบน process pool เพราะ scrypt/PBKDF2 ใช้ CPU ล้วนและถือ GIL
+    ถ้ารันใน request thread จะหน่วงทุก request และ socket ของ process นั้น
+
+    pool ถูกสร้างเมื่อใช้ครั้งแรกด้วย spawn เพื่อไม่ fork process ที่มี writer thread และ socket thread อยู่
+    งานที่รอได้พร้อมกันถูกจำกัดด้วย max_pending เกินกว่านั้นรอไม่เกิน timeout แล้ว raise PasswordHasherBusy
+    """
+    
+    def __init__(self, method='scrypt', workers=None, max_pending=None, timeout=30, pool=True):
+        self.method = method
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.pool = pool
+        self._slots = threading.BoundedSemaphore(max_pending or self.workers * 8)
+        self._hash = functools.partial(generate_password_hash, method=method)
+        self._prefix = None
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_exit_with_parent, initargs=(os.getpid(),)
+                )
+            return self._executor
+    
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy('Password hashing queue is full')
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # คืน slot เมื่องานเสร็จจริง ไม่ใช่เมื่อผู้รอหมดเวลา งานที่ยังรันอยู่จึงยังนับรวมใน max_pending
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+    
+    def _result(self, future, fn, *args):
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordHasherBusy('Password hashing timed out')
+        except BrokenProcessPool:
+            # worker ตายกลางทาง (เช่นถูก OOM kill) สร้าง pool ใหม่ครั้งหน้า และทำงานนี้ใน thread ปัจจุบันแทน
+            self.shutdown()
+            return fn(*args)
+    
+    def _run(self, fn, *args):
+        if not self.pool:
+            return fn(*args)
+        try:
+            future = self._submit(fn, *args)
+        except BrokenProcessPool:
+            self.shutdown()
+            return fn(*args)
+        return self._result(future, fn, *args)
+    
+    def hash(self, password):
+        return self._run(self._hash, password)
+    
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+    
+    def needs_rehash(self, password_hash):
+        # เทียบส่วนหน้า '$' (method และค่า cost) กับ hash ที่สร้างด้วย method ปัจจุบัน
+        if self._prefix is None:
+            self._prefix = self._hash('').split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._prefix
+    
+    def hash_many(self, passwords):
+        passwords = list(passwords)
+        if not self.pool or len(passwords) < 2:
+            return [self._hash(password) for password in passwords]
+        # แต่ละ chunk ใช้หนึ่ง slot เหมือนงานเดี่ยว การนำเข้าขนาดใหญ่จึงไม่ทำให้คิวรวมเกิน max_pending
+        size = max(1, len(passwords) // (self.workers * 4))
+        chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+        try:
+            futures = [self._submit(_hash_passwords, self._hash, chunk) for chunk in chunks]
+        except BrokenProcessPool:
+            self.shutdown()
+            return [self._hash(password) for password in passwords]
+        return [
+            password_hash for future, chunk in zip(futures, chunks)
+            for password_hash in self._result(future, _hash_passwords, self._hash, chunk)
+        ]
+    
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+# ============================================
+# Socket.IO Message Queue
+# ============================================
+class LocalQueueManager(socketio_lib.PubSubManager):
+    """Pub/sub ภายใน process (local://) ให้ SocketIO หลาย instance ที่ใช้ channel เดียวกันเห็น event ของกัน ใช้แทน Redis ในการทดสอบ"""
+    name = 'local'
+    _subscribers = {}
+    _lock = threading.Lock()
+    
+    def __init__(self, url='local://', channel='flask-socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self._inbox = queue.Queue()
+        if not write_only:
+            with self._lock:
+                self._subscribers.setdefault(channel, []).append(self._inbox)
+    
+    def _publish(self, data):
+        message = json.dumps(data)
+        with self._lock:
+            inboxes = list(self._subscribers.get(self.channel, []))
+        for inbox in inboxes:
+            inbox.put(message)
+    
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+
+class FileQueueManager(socketio_lib.PubSubManager):
+    """Pub/sub ผ่านไฟล์ (file:///path/to/queue.log) สำหรับหลาย worker process บนเครื่องเดียวโดยไม่ต้องมี broker"""
+    name = 'file'
+    POLL_INTERVAL = 0.05  # วินาที
+    # เมื่อไฟล์ใหญ่เกินนี้ ผู้ส่งจะ unlink แล้วเริ่มไฟล์ใหม่ ผู้รับที่เปิดไฟล์เดิมอยู่ยังอ่านส่วนที่ค้างจนหมดก่อนย้ายไปไฟล์ใหม่
+    # ผู้รับที่ตามหลังเกินหนึ่งรอบการหมุนจะข้ามข้อความของไฟล์ที่ถูกหมุนไประหว่างนั้น (ช้ากว่าผู้ส่งเกิน MAX_BYTES)
+    MAX_BYTES = int(os.environ.get('SOCKETIO_FILE_QUEUE_MAX_BYTES', 16 * 1024 * 1024))
+    
+    def __init__(self, url, channel='flask-socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.path = f"{url[len('file://'):]}.{channel}"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        open(self.path, 'a').close()
+        # เปิดไฟล์ค้างไว้ตั้งแต่สร้าง ไฟล์ที่ถูกหมุนก่อน listener เริ่มจึงยังอ่านได้ครบ
+        self._file = None if write_only else open(self.path, 'rb')
+        if self._file:
+            self._file.seek(0, os.SEEK_END)
+    
+    def _publish(self, data):
+        line = (json.dumps(data) + '\n').encode('utf-8')
+        # O_APPEND + write เดียวต่อข้อความ ทำให้ข้อความจากหลาย process ไม่ปนกัน
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, line)
+            if os.fstat(fd).st_size > self.MAX_BYTES:
+                self._rotate(fd)
+        finally:
+            os.close(fd)
+    
+    def _rotate(self, fd):
+        # unlink เฉพาะเมื่อ path ยังเป็นไฟล์ที่เพิ่งเขียน (ผู้ส่งอื่นอาจหมุนไปก่อนแล้ว)
+        # บน Windows ลบไฟล์ที่ยังเปิดอยู่ไม่ได้ ไฟล์จึงโตต่อเหมือนเดิม
+        try:
+            if os.stat(self.path).st_ino == os.fstat(fd).st_ino:
+                os.unlink(self.path)
+        except OSError:
+            pass
+    
+    def _rotated(self, f):
+        try:
+            return os.stat(self.path).st_ino != os.fstat(f.fileno()).st_ino
+        except FileNotFoundError:
+            # หมุนแล้วแต่ยังไม่มีใครสร้างไฟล์ใหม่ อ่านไฟล์เดิมต่อไปก่อน
+            return False
+    
+    def _open(self):
+        while True:
+            try:
+                return open(self.path, 'rb')
+            except FileNotFoundError:
+                self.server.sleep(self.POLL_INTERVAL)
+    
+    def _listen(self):
+        f, pending = self._file, b''
+        try:
+            while True:
+                chunk = f.readline()
+                if chunk:
+                    pending += chunk
+                    if pending.endswith(b'\n'):
+                        yield pending.decode('utf-8')
+                        pending = b''
+                    continue
+                if not self._rotated(f):
+                    self.server.sleep(self.POLL_INTERVAL)
+                    continue
+                # รออีกรอบให้ผู้ส่งที่เปิดไฟล์เดิมค้างไว้เขียนเสร็จ อ่านส่วนที่เหลือ แล้วเปิดไฟล์ใหม่ตั้งแต่ต้น
+                self.server.sleep(self.POLL_INTERVAL)
+                for chunk in f:
+                    pending += chunk
+                    if pending.endswith(b'\n'):
+                        yield pending.decode('utf-8')
+                        pending = b''
+                f.close()
+                f, pending = self._open(), b''
+        finally:
+            f.close()
+
+
+MESSAGE_QUEUE_MANAGERS = {
+    'local://': LocalQueueManager,
+    'file://': FileQueueManager,
+}
+
+
+def socketio_queue_options(url, channel):
+    # local:// และ file:// ใช้ manager ของแอป, URL อื่น (redis://, amqp://, kafka://, zmq+tcp://) ส่งให้ Flask-SocketIO
+    if not url:
+        return {}
+    for prefix, manager_class in MESSAGE_QUEUE_MANAGERS.items():
+        if url.startswith(prefix):
+            return {'client_manager': manager_class(url, channel=channel)}
+    return {'message_queue': url, 'channel': channel}
+
+# ============================================
+# Query Counter
+# ============================================
+class QueryCounter:
+    HEADER = 'X-Query-Count'
+    
+    @staticmethod
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+    
+    @classmethod
+    def init_app(cls, app, database):
+        with app.app_context():
+            event.listen(database.engine, 'before_cursor_execute', cls._count_query)
+        
+        @app.after_request
+        def add_query_count_header(response):
+            response.headers[cls.HEADER] = str(g.get('query_count', 0))
+            return response
+
+# ============================================
+# Access Tokens
+# ============================================
+class TokenService:
+    """access token แบบ stateless ที่มี user_id และ role ลงลายเซ็น HMAC ตรวจในหน่วยความจำโดยไม่ query ผู้ใช้
+
+    การเพิกถอนเก็บใน process: jti ของ token ที่ logout แล้ว และเวลาที่เพิกถอน token ทั้งหมดของผู้ใช้
+    (ลบผู้ใช้หรือเปลี่ยน role/status) รายการหมดอายุถูกลบทิ้งพร้อม token
+    """
+    HEADER_PREFIX = 'Bearer '
+    PUBLIC_ENDPOINTS = {'home', 'static', 'login', 'create_user', 'uploaded_file'}  # รูปโหลดผ่าน <img> ที่แนบ header ไม่ได้
+    
+    def __init__(self, secret_key, max_age):
+        self.serializer = URLSafeSerializer(secret_key, salt='access-token')
+        self.max_age = max_age
+        self._denied = {}  # jti -> เวลาหมดอายุ
+        self._revoked_users = {}  # user_id -> เวลาที่เพิกถอน
+        self._lock = threading.Lock()
+    
+    def issue(self, user):
+        issued_at = time.time()
+        token = self.serializer.dumps({
+            'uid': user.user_id, 'role': user.role, 'jti': uuid.uuid4().hex, 'iat': issued_at
+        })
+        return token, int(self.max_age)
+    
+    def verify(self, token):
+        try:
+            claims = self.serializer.loads(token)
+        except BadSignature:
+            return None
+        expires_at = claims['iat'] + self.max_age
+        if expires_at <= time.time():
+            return None
+        with self._lock:
+            if claims['jti'] in self._denied or claims['iat'] <= self._revoked_users.get(claims['uid'], 0):
+                return None
+        return {'user_id': claims['uid'], 'role': claims['role'], 'jti': claims['jti'], 'expires_at': expires_at}
+    
+    def revoke(self, claims):
+        with self._lock:
+            self._denied[claims['jti']] = claims['expires_at']
+            self._prune()
+    
+    def revoke_user(self, user_id):
+        with self._lock:
+            self._revoked_users[user_id] = time.time()
+            self._prune()
+    
+    def _prune(self):
+        now = time.time()
+        for jti in [jti for jti, expires_at in self._denied.items() if expires_at <= now]:
+            del self._denied[jti]
+        for user_id in [uid for uid, revoked_at in self._revoked_users.items() if revoked_at + self.max_age <= now]:
+            del self._revoked_users[user_id]
+    
+    def init_app(self, app, required=False):
+        @app.before_request
+        def authenticate():
+            # token ที่แนบมาต้องถูกต้องเสมอ ส่วนการไม่แนบ token ขึ้นกับ AUTH_REQUIRED
+            g.auth = None
+            header = request.headers.get('Authorization', '')
+            if header.startswith(self.HEADER_PREFIX):
+                g.auth = self.verify(header[len(self.HEADER_PREFIX):])
+                if g.auth is None:
+                    return jsonify({'message': 'Invalid or expired token'}), 401
+            elif required and request.method != 'OPTIONS' and request.endpoint not in self.PUBLIC_ENDPOINTS:
+                return jsonify({'message': 'Authentication required'}), 401
+    
+    @staticmethod
+    def admin_required(view):
+        # งานของผู้ดูแลและการลบข้อมูลต้องมี token ของ admin เสมอ ไม่ขึ้นกับ AUTH_REQUIRED
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if g.auth is None:
+                return jsonify({'message': 'Authentication required'}), 401
+            if g.auth['role'] != 'admin':
+                return jsonify({'message': 'Admin access required'}), 403
+            return view(*args, **kwargs)
+        return wrapper
+
+# ============================================
+# JSON Encoding
+# ============================================
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider ของ Flask ที่ encode ด้วย orjson (datetime, date, UUID รองรับในตัว)
+    ชนิดอื่นส่งต่อให้ default ของ Flask เหมือนเดิม"""
+    
+    def _option(self):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+    
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=self.default, option=self._option())
+    
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode('utf-8')
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def json_provider_class(name):
+    if name == 'stdlib' or (name == 'auto' and orjson is None):
+        return DefaultJSONProvider
+    if orjson is None:
+        raise RuntimeError("JSON_ENCODER=orjson แต่ยังไม่ได้ติดตั้ง package 'orjson'")
+    return OrjsonProvider
+
+
+def encode_json_bytes(app, obj):
+    if isinstance(app.json, OrjsonProvider):
+        return app.json.dumps_bytes(obj)
+    return app.json.dumps(obj).encode('utf-8')
+
+
+def stream_json_array(rows, encode, chunk_size):
+    # encode ทีละ chunk แล้วส่งต่อทันที หน่วยความจำจึงขึ้นกับขนาด chunk ไม่ใช่จำนวนแถวทั้งหมด
+    yield b'['
+    chunk = []
+    separator = b''
+    for row in rows:
+        chunk.append(encode(row))
+        if len(chunk) >= chunk_size:
+            yield separator + b','.join(chunk)
+            separator = b','
+            chunk = []
+    if chunk:
+        yield separator + b','.join(chunk)
+    yield b']\n'
+
+def stream_csv(columns, rows, chunk_size):
+    # BOM ทำให้ Excel เปิดภาษาไทยได้ถูกต้อง, yield เมื่อครบ chunk เท่านั้น chunk แรกจึงรวม header กับแถวชุดแรก
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([csv_value(value) for value in row])
+        if count % chunk_size == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue().encode('utf-8')
+
+
+def csv_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
 # ============================================
 # Base Service Class (Abstract)
 # ============================================
-class BaseService(ABC):
-    def __init__(self, db_session, socketio_instance):
+class BaseService(WriterMixin, ABC):
+    # ลำดับการเรียงของรายการ (column, descending) โดยคอลัมน์สุดท้ายต้องเป็น primary key
+    # ใช้ทั้งใน get_all และเป็น key ของ cursor pagination
+    sort_keys = ()
+    # ตารางที่ผลลัพธ์ของ list ขึ้นอยู่ ใช้สร้าง ETag
+    list_tables = ()
+    
+    def __init__(self, db_session, socketio_instance, stats_service=None, writer=None, versions=None, cache=None):
         self.db = db_session
-        self.socketio = socketio_instance
+        self.writer = writer
+        self.versions = versions
+        self.cache = cache
+        if cache:
+            # ล้างเมื่อตารางที่ผลลัพธ์ขึ้นอยู่ถูกแก้ไข, เมื่อ group commit ล้มเหลว หรือ process อื่นเขียนฐานข้อมูล
+            if versions:
+                versions.watch(self.list_tables, cache.invalidate)
+            if writer:
+                writer.on_invalidate(cache.invalidate)
+        self.socketio = DeferredEmitter(socketio_instance, writer) if writer else socketio_instance
+        self.stats = stats_service
     
     @abstractmethod
     def get_all(self):
@@ -282,17 +1739,144 @@ class BaseService(ABC):
     def delete(self, item_id):
         pass
     
+    @abstractmethod
+    def _list_query(self, **filters):
+        # query ของรายการพร้อม ORDER BY ตาม sort_keys ใช้ร่วมกันโดย get_page, iter_all และ explain
+        pass
+    
+    def iter_all(self, chunk_size, **filters):
+        # ผลลัพธ์เดียวกับ get_all แต่อ่านทีละ chunk ด้วย keyset เดียวกับ get_page แต่ละ chunk เป็น query สั้นใน session ของตัวเอง
+        # จึงไม่ถือ read transaction ค้างไว้ระหว่างที่ client ดาวน์โหลดช้า ๆ (แถวที่ถูกแก้ระหว่างนั้นอาจเห็นต่างกันข้าม chunk)
+        # สร้าง query และอ่าน engine ตอน chunk แรกซึ่งยังอยู่ใน request context chunk ถัดไปถูกอ่านหลัง context ปิดแล้ว
+        sort_keys = self._sort_keys(**filters)
+        base_query = self._list_query(**filters)
+        engine = self.db.engine
+        values = None
+        while True:
+            session = Session(bind=engine)
+            try:
+                query = base_query.with_session(session)
+                if values is not None:
+                    query = query.filter(self._keyset_filter(sort_keys, values))
+                rows = query.limit(chunk_size).all()
+                items = [row.to_dict() for row in rows]
+                if rows:
+                    values = [getattr(rows[-1], column.key) for column, _ in sort_keys]
+            finally:
+                session.close()
+            yield from items
+            if len(rows) < chunk_size:
+                return
+    
+    def explain(self, **filters):
+        return explain_query_plan(self._list_query(**filters).limit(Config.DEFAULT_PAGE_SIZE))
+    
+    def _sort_keys(self, **filters):
+        # service ที่ใช้ตารางต่างกันตาม filter (เช่นบิลของผู้ใช้) override เพื่อให้ cursor ตรงกับ ORDER BY
+        return self.sort_keys
+    
+    def get_page(self, cursor=None, limit=None, **filters):
+        limit = min(limit or Config.DEFAULT_PAGE_SIZE, Config.MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError('limit must be a positive integer')
+        
+        sort_keys = self._sort_keys(**filters)
+        query = self._list_query(**filters)
+        if cursor:
+            query = query.filter(self._keyset_filter(sort_keys, self._decode_cursor(sort_keys, cursor)))
+        
+        rows = query.limit(limit + 1).all()
+        next_cursor = self._encode_cursor(sort_keys, rows[limit - 1]) if len(rows) > limit else None
+        return {'items': [row.to_dict() for row in rows[:limit]], 'next_cursor': next_cursor}
+    
+    def _keyset_filter(self, sort_keys, values):
+        clauses = []
+        for i, (column, descending) in enumerate(sort_keys):
+            equal_prefix = [prev == value for (prev, _), value in zip(sort_keys[:i], values[:i])]
+            step = column < values[i] if descending else column > values[i]
+            clauses.append(and_(*equal_prefix, step))
+        return or_(*clauses)
+    
+    def _encode_cursor(self, sort_keys, row):
+        values = []
+        for column, _ in sort_keys:
+            value = getattr(row, column.key)
+            values.append(value.isoformat() if isinstance(value, (datetime, date)) else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+    
+    def _decode_cursor(self, sort_keys, cursor):
+        try:
+            raw_values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            if not isinstance(raw_values, list) or len(raw_values) != len(sort_keys):
+                raise ValueError
+            return [self._decode_cursor_value(column, raw) for (column, _), raw in zip(sort_keys, raw_values)]
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+    
+    @staticmethod
+    def _decode_cursor_value(column, raw):
+        # cursor มาจาก client จึงตรวจชนิดให้ตรงคอลัมน์ก่อนนำไปเทียบใน SQL ค่าผิดชนิดตอบ 400 ไม่ใช่ 500
+        if raw is None and column.nullable:
+            return None
+        python_type = column.type.python_type
+        if python_type in (datetime, date):
+            if not isinstance(raw, str):
+                raise TypeError
+            return python_type.fromisoformat(raw)
+        if python_type is float and isinstance(raw, int) and not isinstance(raw, bool):
+            return float(raw)
+        if not isinstance(raw, python_type) or (python_type is int and isinstance(raw, bool)):
+            raise TypeError
+        return raw
+    
+    def _stat_keys(self, item):
+        return self.stats.keys_for(item) if self.stats else frozenset()
+    
+    def _record_stats(self, before, item):
+        # ปรับ counter ของ dashboard ใน transaction เดียวกับการแก้ไขข้อมูล
+        if self.stats:
+            self.stats.adjust(before, self._stat_keys(item) if item is not None else frozenset())
+    
+    def _record_stats_created(self, items):
+        # สำหรับ bulk insert: รวม delta ของทุกแถวแล้ว UPDATE counter ละครั้งเดียว
+        if self.stats:
+            self.stats.add_counts(Counter(key for item in items for key in self._stat_keys(item)))
+    
     def handle_error(self, error, custom_message=None):
-        self.db.session.rollback()
+        self._rollback()
         message = custom_message or str(error)
         return {'message': message}, 500
 
+class ExportMixin:
+    # สำหรับ service ที่มี CSV export (/exports/<name>.csv) ต้องกำหนด export_columns และ export_query
+    export_columns = ()
+    
+    @abstractmethod
+    def export_query(self, start=None, end=None):
+        # แถวที่วันที่หลักของตารางอยู่ในช่วง [start, end) เรียงตามเวลา คอลัมน์ตรงกับ export_columns
+        pass
+    
+    def iter_export(self, start=None, end=None, chunk_size=1000):
+        # อ่านแถวของ export_query จาก cursor ทีละ chunk หน่วยความจำจึงคงที่ไม่ว่าช่วงวันที่จะยาวแค่ไหน
+        session = Session(bind=self.db.engine)
+        try:
+            yield from self.export_query(start, end).with_session(session).yield_per(chunk_size)
+        finally:
+            session.close()
+
 # ============================================
 # Auth Service
 # ============================================
-class AuthService:
-    def __init__(self, db_session):
+class AuthService(WriterMixin):
+    written_tables = ('users',)
+    
+    def __init__(self, db_session, stats_service=None, writer=None, versions=None, password_hasher=None, token_service=None):
         self.db = db_session
+        self.stats = stats_service
+        self.writer = writer
+        self.versions = versions
+        self.hasher = password_hasher or PasswordHasher(pool=False)
+        self.tokens = token_service
     
     def login(self, username, password):
         if not username or not password:
@@ -300,13 +1884,16 @@ class AuthService:
         
         user = User.query.filter_by(username=username).first()
         
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user or not self.hasher.verify(user.password_hash, password):
             return None, {'message': 'Invalid credentials'}, 401
         
         if user.status != 'approved':
             return None, {'message': f'Your account is {user.status}. Please contact admin.'}, 403
         
-        return user, {
+        if self.hasher.needs_rehash(user.password_hash):
+            self._upgrade_hash(user, password)
+        
+        response = {
             'message': 'Login successful',
             'user_id': user.user_id,
             'name': user.name,
@@ -315,11 +1902,40 @@ class AuthService:
             'email': user.email,
             'address': user.address,
             'role': user.role
-        }, 200
+        }
+        if self.tokens:
+            response['token'], response['expires_in'] = self.tokens.issue(user)
+            response['token_type'] = 'Bearer'
+        return user, response, 200
+    
+    def logout(self, claims):
+        if self.tokens and claims:
+            self.tokens.revoke(claims)
+        return {'message': 'Logged out'}, 200
+    
+    def _upgrade_hash(self, user, password):
+        # ได้รหัสผ่านจริงเฉพาะตอน login จึงแปลง hash เป็น method/cost ปัจจุบันตอนนี้ ถ้าล้มเหลว login ยังสำเร็จตามปกติ
+        try:
+            self._write(self._replace_hash, user.user_id, user.password_hash, self.hasher.hash(password))
+        except (PasswordHasherBusy, WriteQueueBusy, SQLAlchemyError):
+            pass
+    
+    def _replace_hash(self, user_id, old_hash, new_hash):
+        try:
+            # ไม่ทับรหัสผ่านที่ถูกเปลี่ยนไประหว่างนั้น
+            User.query.filter_by(user_id=user_id, password_hash=old_hash).update(
+                {User.password_hash: new_hash}, synchronize_session=False
+            )
+            self._commit()
+        except SQLAlchemyError:
+            self._rollback()
+            raise
     
     def register(self, data):
+        return self._write(self._register, data, self.hasher.hash(data['password']))
+    
+    def _register(self, data, hashed_password):
         try:
-            hashed_password = generate_password_hash(data['password'])
             new_user = User(
                 name=data['name'],
                 username=data['username'],
@@ -331,23 +1947,46 @@ class AuthService:
                 status=data.get('status', 'pending')
             )
             self.db.session.add(new_user)
-            self.db.session.commit()
+            self.db.session.flush()
+            BillAudience.add_user(new_user.user_id)
+            if self.stats:
+                self.stats.adjust(frozenset(), self.stats.keys_for(new_user))
+            self._commit()
             return new_user, {'message': 'User created successfully', 'user': new_user.to_dict()}, 201
         except IntegrityError:
-            self.db.session.rollback()
+            self._rollback()
             return None, {'message': 'Username already exists'}, 409
         except Exception as e:
-            self.db.session.rollback()
+            self._rollback()
             return None, {'message': f'Error creating user: {str(e)}'}, 500
 
 # ============================================
 # User Service
 # ============================================
 class UserService(BaseService):
+    written_tables = ('users',)
+    list_tables = ('users',)
+    sort_keys = ((User.created_at, True), (User.user_id, True))
+    ROLES = ('resident', 'admin')
+    STATUSES = ('pending', 'approved')
+    IMPORT_REQUIRED_FIELDS = ('name', 'username', 'password')
+    IMPORT_TEXT_FIELDS = IMPORT_REQUIRED_FIELDS + ('phone', 'email', 'address', 'role', 'status')
+    # ฟิลด์ที่ผู้ใช้ที่ไม่ใช่ admin แก้ได้ในข้อมูลของตัวเอง (username, role และ status แก้ได้เฉพาะ admin)
+    SELF_EDITABLE_FIELDS = {'name', 'phone', 'email', 'address', 'password', 'current_password'}
+    
+    def __init__(self, *args, password_hasher=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hasher = password_hasher or PasswordHasher(workers=1)
+    
+    def _list_query(self):
+        return User.query.order_by(User.created_at.desc(), User.user_id.desc())
+    
+    @cached_read
     def get_all(self):
-        users = User.query.all()
+        users = self._list_query().all()
         return [user.to_dict() for user in users]
     
+    @cached_read
     def get_by_id(self, user_id):
         user = User.query.get(user_id)
         if not user:
@@ -355,8 +1994,11 @@ class UserService(BaseService):
         return user.to_dict(), None, 200
     
     def create(self, data):
+        return self._create(data, self.hasher.hash(data['password']))
+    
+    @serialized_write
+    def _create(self, data, hashed_password):
         try:
-            hashed_password = generate_password_hash(data['password'])
             new_user = User(
                 name=data['name'],
                 username=data['username'],
@@ -368,7 +2010,10 @@ class UserService(BaseService):
                 status=data.get('status', 'pending')
             )
             self.db.session.add(new_user)
-            self.db.session.commit()
+            self.db.session.flush()
+            BillAudience.add_user(new_user.user_id)
+            self._record_stats(frozenset(), new_user)
+            self._commit()
             return {'message': 'User created successfully', 'user': new_user.to_dict()}, 201
         except IntegrityError:
             return self.handle_error(None, 'Username already exists')
@@ -376,16 +2021,30 @@ class UserService(BaseService):
             return self.handle_error(e, f'Error creating user: {str(e)}')
     
     def update(self, user_id, data):
+        # ตรวจและ hash รหัสผ่านบน process pool ก่อนเข้า writer เพื่อไม่ให้งานเขียนอื่นต้องรอ
+        hashed_password = None
+        if 'password' in data and data['password']:
+            user = User.query.get(user_id)
+            if not user:
+                return {'message': 'User not found'}, 404
+            if 'current_password' in data:
+                if not self.hasher.verify(user.password_hash, data['current_password']):
+                    # ไม่ใช้ 401 เพราะ client ถือว่า 401 คือ token ใช้ไม่ได้แล้วจะออกจากระบบ
+                    return {'message': 'Incorrect current password'}, 403
+            hashed_password = self.hasher.hash(data['password'])
+        return self._update(user_id, data, hashed_password)
+    
+    @serialized_write
+    def _update(self, user_id, data, hashed_password=None):
         user = User.query.get(user_id)
         if not user:
             return {'message': 'User not found'}, 404
         
         try:
-            if 'password' in data and data['password']:
-                if 'current_password' in data:
-                    if not check_password_hash(user.password_hash, data['current_password']):
-                        return {'message': 'Incorrect current password'}, 401
-                user.password_hash = generate_password_hash(data['password'])
+            stat_keys = self._stat_keys(user)
+            was_member = BillAudience.is_member(user)
+            if hashed_password:
+                user.password_hash = hashed_password
             
             user.name = data.get('name', user.name)
             user.username = data.get('username', user.username)
@@ -394,40 +2053,150 @@ class UserService(BaseService):
             user.address = data.get('address', user.address)
             user.role = data.get('role', user.role)
             user.status = data.get('status', user.status)
+            if BillAudience.is_member(user) and not was_member:
+                self.db.session.flush()
+                BillAudience.add_user(user.user_id)  # ลูกบ้านที่เพิ่งอนุมัติได้รับบิล 'all' ที่ออกไปแล้ว
             
-            self.db.session.commit()
+            self._record_stats(stat_keys, user)
+            self._commit()
             return {'message': 'User updated successfully', 'user': user.to_dict()}, 200
         except IntegrityError:
             return self.handle_error(None, 'Username already exists')
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def delete(self, user_id):
         user = User.query.get(user_id)
         if not user:
             return {'message': 'User not found'}, 404
         
         try:
+            self._record_stats(self._stat_keys(user), None)
+            UploadReferences.adjust(removed=UploadReferences.owned_paths(user_id=user_id))
             self.db.session.delete(user)
-            self.db.session.commit()
+            self._commit()
             return {'message': 'User deleted successfully'}, 200
         except Exception as e:
             return self.handle_error(e)
 
+    def import_users(self, rows):
+        # ตรวจทุกแถวและ hash รหัสผ่านบน process pool ก่อน แล้วจึงเข้า writer เพื่อ insert ใน transaction เดียว
+        errors, valid, seen = [], [], set()
+        for number, row in enumerate(rows, 1):
+            if isinstance(row, dict):
+                row = {key: value.strip() if isinstance(value, str) and key != 'password' else value for key, value in row.items()}
+            message = self._import_error(row, seen)
+            if message:
+                errors.append(self._import_row_error(number, row, message))
+            else:
+                seen.add(row['username'])
+                valid.append((number, row))
+        
+        taken = self._taken_usernames(seen)
+        errors += [self._import_row_error(number, row, 'Username already exists') for number, row in valid if row['username'] in taken]
+        valid = [(number, row) for number, row in valid if row['username'] not in taken]
+        
+        hashes = self.hasher.hash_many(row['password'] for _, row in valid)
+        return self._insert_imported(len(rows), valid, hashes, errors)
+    
+    def _import_error(self, row, seen):
+        if not isinstance(row, dict):
+            return 'Row must be an object'
+        # JSON ส่งตัวเลข/list/object มาได้ ต้องเป็นข้อความทั้งหมดก่อนนำไปตรวจซ้ำ hash หรือ insert
+        not_text = [field for field in self.IMPORT_TEXT_FIELDS if row.get(field) is not None and not isinstance(row[field], str)]
+        if not_text:
+            return f"Fields must be text: {', '.join(not_text)}"
+        missing = [field for field in self.IMPORT_REQUIRED_FIELDS if not str(row.get(field) or '').strip()]
+        if missing:
+            return f"Missing required fields: {', '.join(missing)}"
+        if row['username'] in seen:
+            return 'Duplicate username in import'
+        if row.get('role') and row['role'] not in self.ROLES:
+            return f"Invalid role: {row['role']}"
+        if row.get('status') and row['status'] not in self.STATUSES:
+            return f"Invalid status: {row['status']}"
+        return None
+    
+    @staticmethod
+    def _import_row_error(number, row, message):
+        username = row.get('username') if isinstance(row, dict) else None
+        return {'row': number, 'username': username if isinstance(username, str) else None, 'message': message}
+    
+    def _taken_usernames(self, usernames):
+        if not usernames:
+            return set()
+        return {username for (username,) in self.db.session.query(User.username).filter(User.username.in_(usernames))}
+    
+    @serialized_write
+    def _insert_imported(self, total, valid, hashes, errors):
+        # ตรวจ username ซ้ำอีกครั้งบน writer เผื่อมีผู้สมัครพร้อมกันระหว่าง hash
+        taken = self._taken_usernames({row['username'] for _, row in valid})
+        now = datetime.utcnow()
+        records = []
+        for (number, row), password_hash in zip(valid, hashes):
+            if row['username'] in taken:
+                errors.append(self._import_row_error(number, row, 'Username already exists'))
+                continue
+            records.append({
+                'user_id': str(uuid.uuid4()),
+                'name': str(row['name']),
+                'username': str(row['username']),
+                'password_hash': password_hash,
+                'phone': row.get('phone') or None,
+                'email': row.get('email') or None,
+                'address': row.get('address') or None,
+                'role': row.get('role') or 'resident',
+                'status': row.get('status') or 'approved',
+                'created_at': now,
+                'updated_at': now
+            })
+        
+        try:
+            if records:
+                self.db.session.execute(User.__table__.insert(), records)
+                BillAudience.add_users([record['user_id'] for record in records])
+                self._record_stats_created(User(**record) for record in records)
+                self._commit()
+        except Exception as e:
+            return self.handle_error(e)
+        
+        errors.sort(key=lambda error: error['row'])
+        return {
+            'message': f'Imported {len(records)} of {total} users',
+            'created': len(records),
+            'failed': len(errors),
+            'user_ids': [record['user_id'] for record in records],
+            'errors': errors
+        }, 201 if records else 400
+
 # ============================================
 # Announcement Service
 # ============================================
 class AnnouncementService(BaseService):
+    written_tables = ('announcements',)
+    list_tables = ('announcements', 'users')
+    sort_keys = ((Announcement.published_date, True), (Announcement.announcement_id, True))
+    
+    def _base_query(self):
+        return Announcement.query.options(joinedload(Announcement.author))
+    
+    def _list_query(self):
+        return self._base_query().order_by(Announcement.published_date.desc(), Announcement.announcement_id.desc())
+    
+    @cached_read
     def get_all(self):
-        announcements = Announcement.query.order_by(Announcement.published_date.desc()).all()
+        announcements = self._list_query().all()
         return [ann.to_dict() for ann in announcements]
     
+    @cached_read
     def get_by_id(self, announcement_id):
-        announcement = Announcement.query.get(announcement_id)
+        announcement = self._base_query().get(announcement_id)
         if not announcement:
             return None, {'message': 'Announcement not found'}, 404
         return announcement.to_dict(), None, 200
     
+    @serialized_write
     def create(self, data):
         try:
             published_date = datetime.fromisoformat(data.get('published_date', datetime.utcnow().isoformat()).replace('Z', '+00:00'))
@@ -446,12 +2215,13 @@ class AnnouncementService(BaseService):
             )
             
             self.db.session.add(new_announcement)
-            self.db.session.commit()
+            self._commit()
             self.socketio.emit('new_announcement', new_announcement.to_dict())
             return {'message': 'Announcement created successfully', 'announcement': new_announcement.to_dict()}, 201
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def update(self, announcement_id, data):
         announcement = Announcement.query.get(announcement_id)
         if not announcement:
@@ -469,12 +2239,13 @@ class AnnouncementService(BaseService):
             announcement.tag_color = tag_color
             announcement.tag_bg = tag_bg
             
-            self.db.session.commit()
+            self._commit()
             self.socketio.emit('announcement_updated', announcement.to_dict())
             return {'message': 'Announcement updated successfully', 'announcement': announcement.to_dict()}, 200
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def delete(self, announcement_id):
         announcement = Announcement.query.get(announcement_id)
         if not announcement:
@@ -482,7 +2253,7 @@ class AnnouncementService(BaseService):
         
         try:
             self.db.session.delete(announcement)
-            self.db.session.commit()
+            self._commit()
             self.socketio.emit('announcement_deleted', {'announcement_id': announcement_id})
             return {'message': 'Announcement deleted successfully'}, 200
         except Exception as e:
@@ -500,19 +2271,32 @@ class AnnouncementService(BaseService):
 # Repair Request Service
 # ============================================
 class RepairRequestService(BaseService):
-    def get_all(self, user_id=None):
+    written_tables = ('repair_requests',)
+    list_tables = ('repair_requests', 'users')
+    sort_keys = ((RepairRequest.submitted_date, True), (RepairRequest.request_id, True))
+    
+    def _base_query(self):
+        return RepairRequest.query.options(joinedload(RepairRequest.requester))
+    
+    def _list_query(self, user_id=None):
+        query = self._base_query()
         if user_id:
-            requests = RepairRequest.query.filter_by(user_id=user_id).order_by(RepairRequest.submitted_date.desc()).all()
-        else:
-            requests = RepairRequest.query.order_by(RepairRequest.submitted_date.desc()).all()
+            query = query.filter_by(user_id=user_id)
+        return query.order_by(RepairRequest.submitted_date.desc(), RepairRequest.request_id.desc())
+    
+    @cached_read
+    def get_all(self, user_id=None):
+        requests = self._list_query(user_id).all()
         return [req.to_dict() for req in requests]
     
+    @cached_read
     def get_by_id(self, request_id):
-        repair = RepairRequest.query.get(request_id)
+        repair = self._base_query().get(request_id)
         if not repair:
             return None, {'message': 'Repair request not found'}, 404
         return repair.to_dict(), None, 200
     
+    @serialized_write
     def create(self, data):
         try:
             new_request = RepairRequest(
@@ -520,67 +2304,224 @@ class RepairRequestService(BaseService):
                 title=data['title'],
                 category=data['category'],
                 description=data.get('description'),
-                image_paths=data.get('image_paths', '[]')
+                image_paths=data.get('image_paths', '[]'),
+                thumbnail_paths=ImagePipeline.thumbnail_paths(data.get('image_paths', '[]')),
+                status='pending'
             )
             
             self.db.session.add(new_request)
-            self.db.session.commit()
+            UploadReferences.adjust(added=UploadReferences.repair_paths(new_request.image_paths))
+            self._record_stats(frozenset(), new_request)
+            self._commit()
             self.socketio.emit('new_repair_request', new_request.to_dict(), room='admins')
             return {'message': 'Repair request created successfully', 'request': new_request.to_dict()}, 201
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def update(self, request_id, data):
         req = RepairRequest.query.get(request_id)
         if not req:
             return {'message': 'Repair request not found'}, 404
         
         try:
+            stat_keys = self._stat_keys(req)
             req.title = data.get('title', req.title)
             req.category = data.get('category', req.category)
             req.description = data.get('description', req.description)
             
             old_status = req.status
             req.status = data.get('status', req.status)
-            req.image_paths = data.get('image_paths', req.image_paths)
+            if 'image_paths' in data:
+                UploadReferences.adjust(UploadReferences.repair_paths(req.image_paths), UploadReferences.repair_paths(data['image_paths']))
+                req.image_paths = data['image_paths']
+                req.thumbnail_paths = ImagePipeline.thumbnail_paths(req.image_paths)
             
-            self.db.session.commit()
+            self._record_stats(stat_keys, req)
+            self._commit()
             if old_status != req.status:
                 self.socketio.emit('repair_status_updated', req.to_dict(), room=req.user_id)
             return {'message': 'Repair request updated successfully', 'request': req.to_dict()}, 200
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def delete(self, request_id):
         req = RepairRequest.query.get(request_id)
         if not req:
             return {'message': 'Repair request not found'}, 404
         
         try:
+            self._record_stats(self._stat_keys(req), None)
+            UploadReferences.adjust(removed=UploadReferences.repair_paths(req.image_paths))
             self.db.session.delete(req)
-            self.db.session.commit()
+            self._commit()
             return {'message': 'Repair request deleted successfully'}, 200
         except Exception as e:
             return self.handle_error(e)
 
+# ============================================
+# Booking Interval Index
+# ============================================
+class BookingIntervalIndex:
+    # เก็บช่วงเวลาที่ถูกจอง (pending/approved) แยกตาม (location, date)
+    # เป็นรายการ (start, end, booking_id) หน่วยนาที เรียงตามเวลาเริ่ม คู่กับ end สูงสุดสะสม (prefix max)
+    # ข้อมูลเก่าที่เคยตรวจเวลาแบบ string อาจมีช่วงที่ทับกันอยู่แล้ว จึงไม่ถือว่าช่วงในรายการไม่ทับกัน
+    #
+    # แต่ละ key จำ version ของตาราง booking_requests ตอนโหลด และโหลดใหม่เมื่อ version เปลี่ยน
+    # การจองจาก process อื่น, จาก request ที่ไม่ผ่าน WriteQueue หรืองานก่อนหน้าในกลุ่มเดียวกันบน writer
+    # (ซึ่งเห็น version ที่ยังไม่ commit) จึงไม่ถูกมองข้าม ถ้าไม่มี TableVersionService จะอ่านจากฐานข้อมูลทุกครั้ง
+    ACTIVE_STATUSES = ('pending', 'approved')
+    TABLE = 'booking_requests'
+    
+    def __init__(self, versions=None):
+        self.versions = versions
+        self._entries = {}  # (location, date) -> (version, intervals, max_ends) ไม่ถูกแก้หลังสร้าง
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def to_minutes(time_str):
+        hours, minutes = time_str.split(':')[:2]
+        value = int(hours) * 60 + int(minutes)
+        if not 0 <= value <= 24 * 60:
+            raise ValueError(f'Invalid time: {time_str}')
+        return value
+    
+    @staticmethod
+    def to_time_str(minutes):
+        return f'{minutes // 60:02d}:{minutes % 60:02d}'
+    
+    def _version(self):
+        with db.session.no_autoflush:
+            return self.versions.get([self.TABLE])[0]
+    
+    def _get(self, location, booking_date):
+        # อ่าน version ก่อนแถว: ถ้ามี commit แทรกระหว่างนั้น entry จะถูกโหลดซ้ำครั้งหน้า ไม่ค้างเป็นข้อมูลเก่า
+        key = (location, booking_date)
+        version = self._version() if self.versions else None
+        if version is not None:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry
+        
+        rows = self._query_active(location, booking_date)
+        intervals = sorted(
+            (self.to_minutes(row.start_time), self.to_minutes(row.end_time), row.booking_id) for row in rows
+        )
+        entry = (version, intervals, list(itertools.accumulate((end for _, end, _ in intervals), max)))
+        if version is not None:
+            with self._lock:
+                self._entries[key] = entry
+        return entry
+    
+    def active_query(self, location, booking_date):
+        return BookingRequest.query.with_entities(
+            BookingRequest.booking_id, BookingRequest.start_time, BookingRequest.end_time
+        ).filter(
+            BookingRequest.location == location,
+            BookingRequest.date == booking_date,
+            BookingRequest.status.in_(self.ACTIVE_STATUSES)
+        )
+    
+    def _query_active(self, location, booking_date):
+        # ไม่ autoflush เพื่อไม่ให้การแก้ไขที่ยังไม่ commit ของ request ปัจจุบันหลุดเข้า index
+        with db.session.no_autoflush:
+            return self.active_query(location, booking_date).all()
+    
+    def find_conflict(self, location, booking_date, start_time, end_time, exclude_booking_id=None):
+        start, end = self.to_minutes(start_time), self.to_minutes(end_time)
+        _, intervals, max_ends = self._get(location, booking_date)
+        # ไล่ย้อนจากช่วงสุดท้ายที่เริ่มก่อน end จนกว่า end สูงสุดของช่วงที่เหลือจะไม่เกิน start
+        i = bisect.bisect_left(intervals, (end,))
+        while i > 0 and max_ends[i - 1] > start:
+            i -= 1
+            other_start, other_end, booking_id = intervals[i]
+            if other_end > start and booking_id != exclude_booking_id:
+                return booking_id
+        return None
+    
+    def reset(self):
+        # ล้าง index ทั้งหมด (group commit ล้มเหลว version ที่ writer เห็นก่อนหน้าอาจถูกใช้ซ้ำโดย commit อื่น)
+        with self._lock:
+            self._entries.clear()
+    
+    def free_slots(self, location, booking_date, open_time, close_time):
+        day_start, day_end = self.to_minutes(open_time), self.to_minutes(close_time)
+        _, intervals, _ = self._get(location, booking_date)
+        
+        slots = []
+        cursor = day_start
+        for start, end, _ in intervals:
+            if start > cursor:
+                slots.append((cursor, min(start, day_end)))
+            cursor = max(cursor, end)
+            if cursor >= day_end:
+                break
+        if cursor < day_end:
+            slots.append((cursor, day_end))
+        
+        return {
+            'booked': [
+                {'booking_id': booking_id, 'start_time': self.to_time_str(start), 'end_time': self.to_time_str(end)}
+                for start, end, booking_id in intervals
+            ],
+            'free_slots': [
+                {'start_time': self.to_time_str(start), 'end_time': self.to_time_str(end)}
+                for start, end in slots if end > start
+            ]
+        }
+
 # ============================================
 # Booking Request Service
 # ============================================
 class BookingRequestService(BaseService):
-    def get_all(self, user_id=None):
+    written_tables = ('booking_requests',)
+    list_tables = ('booking_requests', 'users')
+    sort_keys = ((BookingRequest.date, True), (BookingRequest.start_time, False), (BookingRequest.booking_id, False))
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.interval_index = BookingIntervalIndex(self.versions)
+        if self.writer:
+            self.writer.on_invalidate(self.interval_index.reset)
+    
+    def _base_query(self):
+        return BookingRequest.query.options(joinedload(BookingRequest.booker))
+    
+    def _list_query(self, user_id=None):
+        query = self._base_query()
         if user_id:
-            requests = BookingRequest.query.filter_by(user_id=user_id).order_by(BookingRequest.date.desc(), BookingRequest.start_time.asc()).all()
-        else:
-            requests = BookingRequest.query.order_by(BookingRequest.date.desc(), BookingRequest.start_time.asc()).all()
+            query = query.filter_by(user_id=user_id)
+        return query.order_by(BookingRequest.date.desc(), BookingRequest.start_time.asc(), BookingRequest.booking_id.asc())
+    
+    @cached_read
+    def get_all(self, user_id=None):
+        requests = self._list_query(user_id).all()
         return [req.to_dict() for req in requests]
     
+    @cached_read
     def get_by_id(self, booking_id):
-        booking = BookingRequest.query.get(booking_id)
+        booking = self._base_query().get(booking_id)
         if not booking:
             return None, {'message': 'Booking request not found'}, 404
         return booking.to_dict(), None, 200
     
+    @staticmethod
+    def _time_range_error(start_time, end_time):
+        try:
+            start, end = BookingIntervalIndex.to_minutes(start_time), BookingIntervalIndex.to_minutes(end_time)
+        except (AttributeError, ValueError):
+            return 'Invalid start or end time'
+        if start >= end:
+            return 'End time must be after start time'
+        return None
+    
+    @serialized_write
     def create(self, data):
+        time_error = self._time_range_error(data.get('start_time'), data.get('end_time'))
+        if time_error:
+            return {'message': time_error}, 400
         try:
             booking_date = datetime.fromisoformat(data['date']).date()
             
@@ -608,17 +2549,21 @@ class BookingRequestService(BaseService):
             )
             
             self.db.session.add(new_booking)
-            self.db.session.commit()
+            self._commit()
             self.socketio.emit('new_booking_request', new_booking.to_dict(), room='admins')
             self.socketio.emit('booking_request_submitted', new_booking.to_dict(), room=data['user_id'])
             return {'message': 'Booking request created successfully', 'booking': new_booking.to_dict()}, 201
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def update(self, booking_id, data):
         req = BookingRequest.query.get(booking_id)
         if not req:
             return {'message': 'Booking request not found'}, 404
+        time_error = self._time_range_error(data.get('start_time', req.start_time), data.get('end_time', req.end_time))
+        if time_error:
+            return {'message': time_error}, 400
         
         try:
             old_status = req.status
@@ -647,7 +2592,7 @@ class BookingRequestService(BaseService):
                         'conflicting_booking': conflict.to_dict()
                     }, 409
             
-            self.db.session.commit()
+            self._commit()
             if old_status != req.status:
                 self.socketio.emit('booking_status_updated', req.to_dict(), room=req.user_id)
                 self.socketio.emit('booking_updated', req.to_dict(), room='admins')
@@ -656,6 +2601,7 @@ class BookingRequestService(BaseService):
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def delete(self, booking_id):
         req = BookingRequest.query.get(booking_id)
         if not req:
@@ -664,7 +2610,7 @@ class BookingRequestService(BaseService):
         try:
             user_id = req.user_id
             self.db.session.delete(req)
-            self.db.session.commit()
+            self._commit()
             self.socketio.emit('booking_deleted', {'booking_id': booking_id, 'user_id': user_id}, room='admins')
             self.socketio.emit('booking_deleted', {'booking_id': booking_id, 'user_id': user_id}, room=user_id)
             return {'message': 'Booking request deleted successfully'}, 200
@@ -672,41 +2618,366 @@ class BookingRequestService(BaseService):
             return self.handle_error(e)
     
     def _check_booking_conflict(self, location, date, start_time, end_time, exclude_booking_id=None):
-        query = BookingRequest.query.filter(
-            BookingRequest.location == location,
-            BookingRequest.date == date,
-            BookingRequest.status.in_(['pending', 'approved']),
-            or_(
-                and_(BookingRequest.start_time < end_time, BookingRequest.end_time > start_time),
-                and_(BookingRequest.start_time >= start_time, BookingRequest.end_time <= end_time),
-                and_(BookingRequest.start_time <= start_time, BookingRequest.end_time >= end_time)
-            )
+        conflict_id = self.interval_index.find_conflict(location, date, start_time, end_time, exclude_booking_id)
+        return BookingRequest.query.get(conflict_id) if conflict_id else None
+    
+    def get_availability(self, location, booking_date):
+        result = self.interval_index.free_slots(location, booking_date, Config.BOOKING_OPEN_TIME, Config.BOOKING_CLOSE_TIME)
+        return {'location': location, 'date': booking_date.isoformat(), **result}
+
+# ============================================
+# Upload References & Garbage Collection
+# ============================================
+class UploadReferences:
+    # ดูแลตาราง stored_files ใน transaction เดียวกับรายการที่เพิ่ม/แก้/ลบ path ของไฟล์
+    # ไฟล์ที่ ref_count เป็น 0 ไม่มีรายการใดใช้แล้ว
+    
+    @staticmethod
+    def repair_paths(image_paths):
+        try:
+            paths = json.loads(image_paths or '[]')
+        except (TypeError, ValueError):
+            return []
+        return [path for path in paths if isinstance(path, str)] if isinstance(paths, list) else []
+    
+    @staticmethod
+    def payment_paths(slip_path):
+        return [slip_path] if slip_path else []
+    
+    @staticmethod
+    def adjust(removed=(), added=()):
+        delta = Counter(added)
+        delta.subtract(removed)
+        rows = [{'path': path, 'ref_count': max(change, 0), 'updated_at': datetime.utcnow()}
+                for path, change in delta.items() if change]
+        for row in rows:
+            statement = sqlite_insert(StoredFile).values(row)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=['path'],
+                set_={
+                    'ref_count': func.max(StoredFile.ref_count + delta[row['path']], 0),
+                    'updated_at': statement.excluded.updated_at
+                }
+            ))
+    
+    @classmethod
+    def owned_paths(cls, user_id=None, bill_id=None):
+        # path ของแจ้งซ่อมและการชำระเงินที่จะถูกลบตาม (ON DELETE CASCADE) เมื่อลบผู้ใช้หรือบิล
+        paths = []
+        if user_id is not None:
+            for (image_paths,) in RepairRequest.query.with_entities(RepairRequest.image_paths).filter_by(user_id=user_id):
+                paths += cls.repair_paths(image_paths)
+        payments = Payment.query.with_entities(Payment.slip_path).filter(Payment.slip_path.isnot(None))
+        if user_id is not None:
+            payments = payments.filter_by(user_id=user_id)
+        if bill_id is not None:
+            payments = payments.filter_by(bill_id=bill_id)
+        paths += [slip_path for (slip_path,) in payments]
+        return paths
+    
+    @classmethod
+    def backfill(cls):
+        paths = []
+        for (image_paths,) in RepairRequest.query.with_entities(RepairRequest.image_paths):
+            paths += cls.repair_paths(image_paths)
+        paths += [slip_path for (slip_path,) in Payment.query.with_entities(Payment.slip_path).filter(Payment.slip_path.isnot(None))]
+        cls.adjust(added=paths)
+
+
+class UploadCollector(WriterMixin):
+    """ลบไฟล์ที่อัปโหลดแล้วไม่มีรายการใดอ้างถึง (ref_count ใน stored_files เป็น 0 หรือไม่มีแถว) และเก่ากว่า grace period
+    รวม thumbnail/preview ของไฟล์นั้น และ chunked upload ที่ค้างไว้ไม่ส่งต่อ
+
+    ไล่ไฟล์ด้วย scandir แบบ generator แล้วตรวจ reference ในฐานข้อมูลทีละ batch หน่วยความจำจึงไม่ขึ้นกับจำนวนไฟล์
+    การตรวจและลบแต่ละ batch รันบน writer thread จึงไม่ชนกับ request ที่กำลังผูกไฟล์เดียวกันเข้ากับรายการ
+    ไฟล์ที่ FileManager ไม่ได้สร้าง (ไม่ใช่ objects/ หรือ <uuid4>_ชื่อไฟล์) และเอกสารใน OWNER_UPLOAD_TYPES
+    ซึ่งไม่มีรายการใดอ้างถึงตั้งแต่แรก จะไม่ถูกแตะ
+    """
+    
+    def __init__(self, db_session, file_manager, grace_period, batch_size=500, writer=None):
+        self.db = db_session
+        self.file_manager = file_manager
+        self.grace_period = grace_period
+        self.batch_size = batch_size
+        self.writer = writer
+        self.last_run = None
+        self._running = threading.Lock()
+        self._stop = threading.Event()
+    
+    def _scan(self, folder):
+        # DirEntry.stat() ใช้ข้อมูลจาก scandir โดยไม่ต้อง stat ซ้ำบนหลาย platform
+        try:
+            entries = list(os.scandir(folder))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from self._scan(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+    
+    def _candidates(self, cutoff, stats):
+        root = self.file_manager.upload_folder
+        for entry in self._scan(root):
+            stats['scanned'] += 1
+            path = os.path.relpath(entry.path, root).replace(os.sep, '/')
+            source = ImagePipeline.source_path(path) or path
+            if FileManager.is_owner_path(source) or not FileManager.is_immutable_path(source):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    yield path
+            except FileNotFoundError:
+                continue
+    
+    def _collect_batch(self, paths, cutoff, dry_run):
+        sources = {path: ImagePipeline.source_path(path) or path for path in paths}
+        referenced = {path for (path,) in StoredFile.query.with_entities(StoredFile.path).filter(
+            StoredFile.path.in_(set(sources.values())), StoredFile.ref_count > 0
+        )}
+        orphaned, freed, originals = 0, 0, []
+        for path, source in sources.items():
+            if source in referenced:
+                continue
+            # mtime ที่ตรวจตอนไล่ไฟล์อาจเปลี่ยนแล้ว ถ้าไฟล์ถูกอัปโหลดซ้ำบน request thread ระหว่างนั้น
+            size = self.file_manager.remove_stale(path, cutoff, source, dry_run)
+            if size is None:
+                continue
+            orphaned += 1
+            freed += size
+            if path == source:
+                originals.append(path)
+        if originals and not dry_run:
+            StoredFile.query.filter(StoredFile.path.in_(originals), StoredFile.ref_count <= 0).delete(synchronize_session=False)
+            self._commit()
+        return orphaned, freed
+    
+    def _expire_partial_uploads(self, cutoff, dry_run):
+        # chunked upload ที่ไม่มี chunk ใหม่เกิน grace period (.part ถูกแก้ทุกครั้งที่ได้ chunk) และไฟล์ชั่วคราวที่ค้าง
+        folder = self.file_manager.partial_folder
+        removed = 0
+        for entry in self._scan(folder) if folder else ():
+            base, extension = os.path.splitext(entry.path)
+            if extension == '.json' and os.path.exists(f'{base}.part'):
+                continue  # ลบพร้อม .part
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if not dry_run:
+                    os.remove(entry.path)
+                    if extension == '.part' and os.path.exists(f'{base}.json'):
+                        os.remove(f'{base}.json')
+                removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+    
+    def _remove_empty_folders(self):
+        # ลบเฉพาะโฟลเดอร์ตาม (type, user_id) แบบเดิมที่ว่างแล้ว ไม่แตะ objects/ และโฟลเดอร์ของ variant
+        # เพราะ FileManager จำ shard ที่สร้างแล้วไว้และจะไม่ makedirs ซ้ำ
+        root = self.file_manager.upload_folder
+        keep = {FileManager.OBJECT_FOLDER, *ImagePipeline.VARIANT_FOLDERS.values()}
+        for folder, _, _ in os.walk(root, topdown=False):
+            relative = os.path.relpath(folder, root).split(os.sep)
+            if folder == root or relative[0] in keep:
+                continue
+            try:
+                os.rmdir(folder)
+            except OSError:
+                pass  # ยังมีไฟล์อยู่
+    
+    def sweep(self, dry_run=False, grace_period=None):
+        if not self._running.acquire(blocking=False):
+            return None  # มีรอบอื่นกำลังทำงานอยู่
+        try:
+            started = time.perf_counter()
+            grace_period = self.grace_period if grace_period is None else grace_period
+            cutoff = time.time() - grace_period
+            stats = {'scanned': 0, 'orphaned': 0, 'bytes_freed': 0}
+            candidates = self._candidates(cutoff, stats)
+            for batch in iter(lambda: list(itertools.islice(candidates, self.batch_size)), []):
+                orphaned, freed = self._write(self._collect_batch, batch, cutoff, dry_run)
+                stats['orphaned'] += orphaned
+                stats['bytes_freed'] += freed
+            stats['partial_uploads_expired'] = self._expire_partial_uploads(cutoff, dry_run)
+            if not dry_run:
+                self._remove_empty_folders()
+            stats.update(dry_run=dry_run, grace_period=grace_period, duration_ms=round((time.perf_counter() - started) * 1000, 1),
+                         finished_at=datetime.utcnow().isoformat())
+            self.last_run = stats
+            return stats
+        finally:
+            self._running.release()
+    
+    def start(self, app, interval):
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    with app.app_context():
+                        self.sweep()
+                except Exception:
+                    app.logger.exception('upload garbage collection failed')
+        threading.Thread(target=run, name='upload-gc', daemon=True).start()
+    
+    def stop(self):
+        self._stop.set()
+
+
+class BillAudience:
+    # ดูแลตาราง bill_recipients: บิลที่ส่งถึง 'all' ถูกกระจายเป็นหนึ่งแถวต่อลูกบ้านที่อนุมัติแล้ว
+    # admin ไม่ใช่ครัวเรือนที่ต้องจ่าย ส่วนบัญชีที่รออนุมัติยัง login ไม่ได้ จึงไม่นับจนกว่าจะถูกอนุมัติ
+    # ลูกบ้านที่สมัครหรือถูกอนุมัติภายหลังได้รับแถวของบิล 'all' ที่มีอยู่แล้ว
+    ALL = 'all'
+    COLUMNS = ['bill_id', 'user_id', 'issued_date', 'status']
+    
+    @staticmethod
+    def _members():
+        return User.role == 'resident', User.status == 'approved'
+    
+    @classmethod
+    def is_member(cls, user):
+        return user.role == 'resident' and user.status == 'approved'
+    
+    @staticmethod
+    def _insert_from(source):
+        table = BillRecipient.__table__
+        db.session.execute(table.insert().prefix_with('OR IGNORE').from_select(BillAudience.COLUMNS, source))
+    
+    @classmethod
+    def materialize(cls, bill, status='unpaid'):
+        # เพิ่มผู้รับของบิลตาม recipient_id และลบแถวของผู้ที่ไม่ใช่ผู้รับแล้ว (กรณีแก้ไขผู้รับ)
+        source = select(
+            literal(bill.bill_id), User.user_id, literal(bill.issued_date, db.DateTime), literal(status)
         )
-        
-        if exclude_booking_id:
-            query = query.filter(BookingRequest.booking_id != exclude_booking_id)
-        
-        return query.first()
+        if bill.recipient_id != cls.ALL:
+            source = source.where(User.user_id == bill.recipient_id)
+            BillRecipient.query.filter(
+                BillRecipient.bill_id == bill.bill_id, BillRecipient.user_id != bill.recipient_id
+            ).delete(synchronize_session=False)
+        else:
+            source = source.where(*cls._members())
+            BillRecipient.query.filter(
+                BillRecipient.bill_id == bill.bill_id,
+                ~BillRecipient.user_id.in_(select(User.user_id).where(*cls._members()))
+            ).delete(synchronize_session=False)
+        cls._insert_from(source)
+    
+    @classmethod
+    def add_user(cls, user_id):
+        cls.add_users([user_id])
+    
+    @staticmethod
+    def remove_bill(bill_id):
+        BillRecipient.query.filter_by(bill_id=bill_id).delete(synchronize_session=False)
+    
+    @staticmethod
+    def set_status(bill_id, status, user_id=None, from_status=None):
+        query = BillRecipient.query.filter_by(bill_id=bill_id)
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        if from_status is not None:
+            query = query.filter_by(status=from_status)
+        query.update({BillRecipient.status: status}, synchronize_session=False)
+    
+    @classmethod
+    def all_paid(cls, bill_id):
+        # นับเฉพาะลูกบ้านที่ยังอนุมัติอยู่ แถวของผู้ที่ถูกเปลี่ยนเป็น admin หรือถูกระงับภายหลังไม่ค้างบิลไว้
+        return not db.session.query(exists().where(
+            BillRecipient.bill_id == bill_id, BillRecipient.status != 'paid',
+            BillRecipient.user_id.in_(select(User.user_id).where(*cls._members()))
+        )).scalar()
+    
+    @classmethod
+    def add_users(cls, user_ids):
+        cls._insert_from(
+            select(Bill.bill_id, User.user_id, Bill.issued_date, literal('unpaid'))
+            .join(User, literal(True)).where(Bill.recipient_id == cls.ALL, User.user_id.in_(user_ids), *cls._members())
+        )
+    
+    @classmethod
+    def restrict_to_members(cls):
+        # ลบแถวของบิล 'all' ที่เคยกระจายให้ admin และบัญชีที่ยังไม่อนุมัติ แล้วคำนวณสถานะของบิลเหล่านั้นใหม่
+        all_bills = select(Bill.bill_id).where(Bill.recipient_id == cls.ALL)
+        BillRecipient.query.filter(
+            BillRecipient.bill_id.in_(all_bills),
+            ~BillRecipient.user_id.in_(select(User.user_id).where(*cls._members()))
+        ).delete(synchronize_session=False)
+        for bill in Bill.query.filter_by(recipient_id=cls.ALL):
+            if BillRecipient.query.filter_by(bill_id=bill.bill_id).first() is not None:
+                bill.status = 'paid' if cls.all_paid(bill.bill_id) else 'unpaid'
+    
+    @classmethod
+    def backfill(cls):
+        # สร้าง bill_recipients จากบิลที่มีอยู่ก่อนมีตารางนี้
+        cls._insert_from(
+            select(Bill.bill_id, User.user_id, Bill.issued_date, Bill.status)
+            .join(User, User.user_id == Bill.recipient_id)
+        )
+        cls._insert_from(
+            select(Bill.bill_id, User.user_id, Bill.issued_date, literal('unpaid'))
+            .join(User, literal(True)).where(Bill.recipient_id == cls.ALL, *cls._members())
+        )
+        paid = select(Payment.bill_id).where(
+            Payment.bill_id == BillRecipient.bill_id, Payment.user_id == BillRecipient.user_id, Payment.status == 'paid'
+        ).exists()
+        BillRecipient.query.filter(paid).update({BillRecipient.status: 'paid'}, synchronize_session=False)
 
 # ============================================
 # Bill Service
 # ============================================
-class BillService(BaseService):
-    def get_all(self, user_id=None):
+class BillService(ExportMixin, BaseService):
+    written_tables = ('bills',)
+    list_tables = ('bills', 'users')
+    sort_keys = ((Bill.issued_date, True), (Bill.bill_id, True))
+    recipient_sort_keys = ((BillRecipient.issued_date, True), (BillRecipient.bill_id, True))
+    
+    def _base_query(self):
+        return Bill.query.options(joinedload(Bill.issuer))
+    
+    def _sort_keys(self, user_id=None):
+        return self.recipient_sort_keys if user_id else self.sort_keys
+    
+    def _list_query(self, user_id=None):
         if user_id:
-            bills = Bill.query.filter(
-                (Bill.recipient_id == user_id) | (Bill.recipient_id == 'all')
-            ).order_by(Bill.issued_date.desc()).all()
-        else:
-            bills = Bill.query.order_by(Bill.issued_date.desc()).all()
+            # บิลของผู้ใช้อ่านจาก bill_recipients พร้อมสถานะการชำระของครัวเรือนนั้น
+            return BillRecipient.query.options(
+                joinedload(BillRecipient.bill).joinedload(Bill.issuer)
+            ).filter(BillRecipient.user_id == user_id).order_by(
+                BillRecipient.issued_date.desc(), BillRecipient.bill_id.desc()
+            )
+        return self._base_query().order_by(Bill.issued_date.desc(), Bill.bill_id.desc())
+    
+    export_columns = ('bill_id', 'issued_date', 'item_name', 'amount', 'due_date',
+                      'recipient_id', 'recipient_name', 'status', 'issued_by')
+    
+    def export_query(self, start=None, end=None):
+        recipient = aliased(User)
+        issuer = aliased(User)
+        query = self.db.session.query(
+            Bill.bill_id, Bill.issued_date, Bill.item_name, Bill.amount, Bill.due_date,
+            Bill.recipient_id, recipient.name, Bill.status, issuer.name
+        ).outerjoin(recipient, recipient.user_id == Bill.recipient_id).outerjoin(
+            issuer, issuer.user_id == Bill.issued_by_user_id
+        )
+        if start:
+            query = query.filter(Bill.issued_date >= start)
+        if end:
+            query = query.filter(Bill.issued_date < end)
+        return query.order_by(Bill.issued_date, Bill.bill_id)
+    
+    @cached_read
+    def get_all(self, user_id=None):
+        bills = self._list_query(user_id).all()
         return [bill.to_dict() for bill in bills]
     
+    @cached_read
     def get_by_id(self, bill_id):
-        bill = Bill.query.get(bill_id)
+        bill = self._base_query().get(bill_id)
         if not bill:
             return None, {'message': 'Bill not found'}, 404
         return bill.to_dict(), None, 200
     
+    @serialized_write
     def create(self, data):
         try:
             due_date = datetime.fromisoformat(data['due_date']).date()
@@ -721,18 +2992,24 @@ class BillService(BaseService):
             )
             
             self.db.session.add(new_bill)
-            self.db.session.commit()
+            self.db.session.flush()
+            BillAudience.materialize(new_bill)
+            self._record_stats(frozenset(), new_bill)
+            self._commit()
             self.socketio.emit('new_bill_created', new_bill.to_dict())
             return {'message': 'Bill created successfully', 'bill': new_bill.to_dict()}, 201
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def update(self, bill_id, data):
         bill = Bill.query.get(bill_id)
         if not bill:
             return {'message': 'Bill not found'}, 404
         
         try:
+            stat_keys = self._stat_keys(bill)
+            old_recipient_id, old_status = bill.recipient_id, bill.status
             bill.item_name = data.get('item_name', bill.item_name)
             bill.amount = data.get('amount', bill.amount)
             
@@ -742,12 +3019,18 @@ class BillService(BaseService):
             bill.recipient_id = data.get('recipient_id', bill.recipient_id)
             bill.status = data.get('status', bill.status)
             
-            self.db.session.commit()
+            if bill.recipient_id != old_recipient_id:
+                BillAudience.materialize(bill, bill.status)
+            if bill.status != old_status:
+                BillAudience.set_status(bill.bill_id, bill.status)
+            self._record_stats(stat_keys, bill)
+            self._commit()
             self.socketio.emit('bill_updated', bill.to_dict())
             return {'message': 'Bill updated successfully', 'bill': bill.to_dict()}, 200
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def delete(self, bill_id):
         bill = Bill.query.get(bill_id)
         if not bill:
@@ -756,30 +3039,152 @@ class BillService(BaseService):
         bill_data = bill.to_dict()
         
         try:
+            self._record_stats(self._stat_keys(bill), None)
+            BillAudience.remove_bill(bill_id)
+            UploadReferences.adjust(removed=UploadReferences.owned_paths(bill_id=bill_id))
             self.db.session.delete(bill)
-            self.db.session.commit()
+            self._commit()
             self.socketio.emit('bill_deleted', {'bill_id': bill_id, 'item_name': bill_data['item_name'], 'recipient_id': bill_data['recipient_id']})
             return {'message': 'Bill deleted successfully'}, 200
         except Exception as e:
             return self.handle_error(e)
+    
+    def _missing_recipients(self, recipient_ids):
+        found = set()
+        for i in range(0, len(recipient_ids), 500):
+            chunk = recipient_ids[i:i + 500]
+            found.update(row.user_id for row in User.query.with_entities(User.user_id).filter(User.user_id.in_(chunk)))
+        return [recipient_id for recipient_id in recipient_ids if recipient_id not in found]
+    
+    @serialized_write
+    def create_batch(self, template, recipients):
+        # ออกบิลจาก template เดียวให้ผู้รับหลายคนใน transaction เดียว (bulk insert)
+        # recipients เป็น user_id หรือ {'recipient_id', 'amount'} เมื่อยอดของแต่ละหลังไม่เท่ากัน
+        try:
+            due_date = datetime.fromisoformat(template['due_date']).date()
+            entries = [r if isinstance(r, dict) else {'recipient_id': r} for r in recipients]
+            recipient_ids = [entry.get('recipient_id') for entry in entries]
+            amounts = [float(entry.get('amount', template['amount'])) for entry in entries]
+        except (KeyError, TypeError, ValueError) as e:
+            return {'message': f'Invalid batch data: {str(e)}'}, 400
+        
+        # ต้องเป็น string ก่อนเข้า set() และ IN (...) ไม่เช่นนั้น list/object จาก JSON จะกลายเป็น 500
+        if not all(isinstance(recipient_id, str) and recipient_id for recipient_id in recipient_ids):
+            return {'message': 'Invalid batch data: recipient_id must be a non-empty string'}, 400
+        if len(set(recipient_ids)) != len(recipient_ids):
+            return {'message': 'Duplicate recipients in batch'}, 400
+        missing = self._missing_recipients(recipient_ids)
+        if missing:
+            return {'message': 'Unknown recipients', 'recipient_ids': missing}, 400
+        
+        try:
+            issued_date = datetime.utcnow()
+            rows = [{
+                'bill_id': str(uuid.uuid4()),
+                'item_name': template['item_name'],
+                'amount': amount,
+                'due_date': due_date,
+                'recipient_id': recipient_id,
+                'issued_by_user_id': template['issued_by_user_id'],
+                'issued_date': issued_date,
+                'status': 'unpaid'
+            } for recipient_id, amount in zip(recipient_ids, amounts)]
+            
+            self.db.session.execute(Bill.__table__.insert(), rows)
+            self.db.session.execute(BillRecipient.__table__.insert(), [
+                {'bill_id': row['bill_id'], 'user_id': row['recipient_id'], 'issued_date': issued_date, 'status': 'unpaid'}
+                for row in rows
+            ])
+            self._record_stats_created(Bill(**row) for row in rows)
+            self._commit()
+        except Exception as e:
+            return self.handle_error(e)
+        
+        # แจ้งผู้รับแต่ละห้องครั้งเดียว แทน new_bill_created ทีละใบ
+        for row in rows:
+            self.socketio.emit('bills_issued', {
+                'count': 1,
+                'item_name': row['item_name'],
+                'total_amount': row['amount'],
+                'due_date': row['due_date'].isoformat(),
+                'bill_ids': [row['bill_id']]
+            }, room=row['recipient_id'])
+        summary = {
+            'count': len(rows),
+            'item_name': template['item_name'],
+            'total_amount': sum(amounts),
+            'due_date': due_date.isoformat(),
+            'issued_date': issued_date.isoformat()
+        }
+        self.socketio.emit('bill_batch_created', summary, room='admins')
+        return {'message': 'Bills created successfully', **summary, 'bill_ids': [row['bill_id'] for row in rows]}, 201
 
 # ============================================
 # Payment Service
 # ============================================
-class PaymentService(BaseService):
-    def get_all(self, user_id=None):
+class PaymentService(ExportMixin, BaseService):
+    written_tables = ('payments', 'bills')
+    list_tables = ('payments', 'bills', 'users')
+    sort_keys = ((Payment.payment_date, True), (Payment.payment_id, True))
+    
+    def __init__(self, *args, report_service=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reports = report_service
+    
+    def _report_entries(self, payment):
+        return self.reports.entries_for(payment) if self.reports else {}
+    
+    def _record_report(self, before, payment):
+        # ปรับยอดสรุปรายเดือนใน transaction เดียวกับการเปลี่ยนสถานะการชำระเงิน
+        if self.reports:
+            self.reports.adjust(before, self._report_entries(payment) if payment is not None else {})
+    
+    def _base_query(self):
+        return Payment.query.options(joinedload(Payment.bill), joinedload(Payment.payer))
+    
+    def _set_household_status(self, bill, user_id, status, from_status=None):
+        # สถานะของบิล 'all' เป็น paid เมื่อทุกครัวเรือนชำระแล้ว ส่วนบิลรายบุคคลตามสถานะของผู้รับ
+        BillAudience.set_status(bill.bill_id, status, user_id, from_status)
+        stat_keys = self._stat_keys(bill)
+        if bill.recipient_id == BillAudience.ALL:
+            bill.status = 'paid' if BillAudience.all_paid(bill.bill_id) else 'unpaid'
+        elif from_status is None or bill.status == from_status:
+            bill.status = status
+        self._record_stats(stat_keys, bill)
+    
+    def _list_query(self, user_id=None):
+        query = self._base_query()
         if user_id:
-            payments = Payment.query.filter_by(user_id=user_id).order_by(Payment.payment_date.desc()).all()
-        else:
-            payments = Payment.query.order_by(Payment.payment_date.desc()).all()
+            query = query.filter_by(user_id=user_id)
+        return query.order_by(Payment.payment_date.desc(), Payment.payment_id.desc())
+    
+    export_columns = ('payment_id', 'payment_date', 'bill_id', 'item_name', 'user_id', 'payer_name',
+                      'payer_address', 'amount', 'payment_method', 'status')
+    
+    def export_query(self, start=None, end=None):
+        query = self.db.session.query(
+            Payment.payment_id, Payment.payment_date, Payment.bill_id, Bill.item_name, Payment.user_id,
+            User.name, User.address, Payment.amount, Payment.payment_method, Payment.status
+        ).join(Bill, Bill.bill_id == Payment.bill_id).join(User, User.user_id == Payment.user_id)
+        if start:
+            query = query.filter(Payment.payment_date >= start)
+        if end:
+            query = query.filter(Payment.payment_date < end)
+        return query.order_by(Payment.payment_date, Payment.payment_id)
+    
+    @cached_read
+    def get_all(self, user_id=None):
+        payments = self._list_query(user_id).all()
         return [payment.to_dict() for payment in payments]
     
+    @cached_read
     def get_by_id(self, payment_id):
-        payment = Payment.query.get(payment_id)
+        payment = self._base_query().get(payment_id)
         if not payment:
             return None, {'message': 'Payment not found'}, 404
         return payment.to_dict(), None, 200
     
+    @serialized_write
     def create(self, data):
         bill = Bill.query.get(data['bill_id'])
         if not bill:
@@ -792,12 +3197,14 @@ class PaymentService(BaseService):
                 amount=data['amount'],
                 payment_method=data['payment_method'],
                 slip_path=data.get('slip_path'),
+                slip_thumbnail_path=ImagePipeline.variant_path(data.get('slip_path')),
                 status='pending'
             )
             
             self.db.session.add(new_payment)
-            bill.status = 'pending_verification'
-            self.db.session.commit()
+            UploadReferences.adjust(added=UploadReferences.payment_paths(new_payment.slip_path))
+            self._set_household_status(bill, data['user_id'], 'pending_verification')
+            self._commit()
             
             self.socketio.emit('new_payment_receipt', new_payment.to_dict(), room='admins')
             
@@ -805,35 +3212,42 @@ class PaymentService(BaseService):
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def update(self, payment_id, data):
         payment = Payment.query.get(payment_id)
         if not payment:
             return {'message': 'Payment not found'}, 404
         
         try:
+            report_entries = self._report_entries(payment)
             payment.status = data.get('status', payment.status)
             payment.amount = data.get('amount', payment.amount)
             payment.payment_method = data.get('payment_method', payment.payment_method)
             
-            self.db.session.commit()
+            self._record_report(report_entries, payment)
+            self._commit()
             return {'message': 'Payment updated successfully', 'payment': payment.to_dict()}, 200
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def delete(self, payment_id):
         payment = Payment.query.get(payment_id)
         if not payment:
             return {'message': 'Payment not found'}, 404
         
         try:
+            self._record_report(self._report_entries(payment), None)
+            UploadReferences.adjust(removed=UploadReferences.payment_paths(payment.slip_path))
             self.db.session.delete(payment)
-            self.db.session.commit()
+            self._commit()
             return {'message': 'Payment deleted successfully'}, 200
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def approve(self, payment_id):
-        payment = Payment.query.get(payment_id)
+        payment = self._base_query().get(payment_id)
         if not payment:
             return {'message': 'Payment not found'}, 404
         
@@ -841,13 +3255,15 @@ class PaymentService(BaseService):
             return {'message': 'Payment already approved'}, 400
         
         try:
+            report_entries = self._report_entries(payment)
             payment.status = 'paid'
+            self._record_report(report_entries, payment)
             
             bill = Bill.query.get(payment.bill_id)
             if bill:
-                bill.status = 'paid'
+                self._set_household_status(bill, payment.user_id, 'paid')
             
-            self.db.session.commit()
+            self._commit()
             
             payment_data = payment.to_dict()
             self.socketio.emit('payment_approved', payment_data, room=payment.user_id)
@@ -857,8 +3273,9 @@ class PaymentService(BaseService):
         except Exception as e:
             return self.handle_error(e)
     
+    @serialized_write
     def reject(self, payment_id):
-        payment = Payment.query.get(payment_id)
+        payment = self._base_query().get(payment_id)
         if not payment:
             return {'message': 'Payment not found'}, 404
         
@@ -866,13 +3283,15 @@ class PaymentService(BaseService):
             return {'message': 'Cannot reject an already paid payment'}, 400
         
         try:
+            report_entries = self._report_entries(payment)
             payment.status = 'rejected'
+            self._record_report(report_entries, payment)
             
             bill = Bill.query.get(payment.bill_id)
-            if bill and bill.status == 'pending_verification':
-                bill.status = 'unpaid'
+            if bill:
+                self._set_household_status(bill, payment.user_id, 'unpaid', from_status='pending_verification')
             
-            self.db.session.commit()
+            self._commit()
             
             self.socketio.emit('payment_rejected', payment.to_dict(), room=payment.user_id)
             self.socketio.emit('payment_rejected', payment.to_dict(), room='admins')
@@ -881,26 +3300,343 @@ class PaymentService(BaseService):
         except Exception as e:
             return self.handle_error(e)
 
+# ============================================
+# Table Version Service
+# ============================================
+class TableVersionService:
+    """version counter ต่อตาราง ใช้สร้าง ETag ของ list endpoint
+    counter อยู่ในฐานข้อมูลจึงถูกต้องแม้มีหลาย process และย้อนกลับพร้อม transaction ที่ล้มเหลว"""
+
+    def __init__(self, db_session):
+        self.db = db_session
+        self._watchers = []
+
+    @staticmethod
+    def _initial_version():
+        # เริ่มจากเวลาปัจจุบัน ฐานข้อมูลที่สร้างใหม่จึงไม่ได้ ETag ซ้ำกับของเดิมที่ browser cache ไว้
+        return int(time.time() * 1000) % 2**31
+
+    @classmethod
+    def seed(cls, connection):
+        tables = [table.name for table in db.metadata.sorted_tables]
+        statement = sqlite_insert(TableVersion).values([
+            {'table_name': name, 'version': cls._initial_version()} for name in tables
+        ])
+        connection.execute(statement.on_conflict_do_nothing(index_elements=['table_name']))
+
+    def bump(self, tables):
+        statement = sqlite_insert(TableVersion).values([
+            {'table_name': name, 'version': self._initial_version()} for name in tables
+        ])
+        self.db.session.execute(statement.on_conflict_do_update(
+            index_elements=['table_name'],
+            set_={'version': TableVersion.version + 1}
+        ))
+
+    def watch(self, tables, callback):
+        self._watchers.append((frozenset(tables), callback))
+
+    def notify(self, tables):
+        # เรียกหลัง commit สำเร็จ
+        for watched, callback in self._watchers:
+            if watched.intersection(tables):
+                callback()
+
+    def get(self, tables):
+        rows = dict(self.db.session.query(TableVersion.table_name, TableVersion.version).filter(
+            TableVersion.table_name.in_(tables)
+        ).all())
+        return [rows.get(name, 0) for name in tables]
+
+    def etag(self, tables):
+        return '-'.join(str(version) for version in self.get(tables))
+
+# ============================================
+# Dashboard Stats Service
+# ============================================
+class DashboardStatsService(WriterMixin):
+    # ชื่อ counter -> (model, เงื่อนไขของแถวที่นับ)
+    COUNTERS = {
+        'approved_residents': (User, {'role': 'resident', 'status': 'approved'}),
+        'pending_repairs': (RepairRequest, {'status': 'pending'}),
+        'completed_repairs': (RepairRequest, {'status': 'completed'}),
+        'unpaid_bills': (Bill, {'status': 'unpaid'}),
+    }
+    RECENT_ACTIVITY_LIMIT = 5
+    
+    def __init__(self, db_session, writer=None):
+        self.db = db_session
+        self.writer = writer
+    
+    def keys_for(self, item):
+        return frozenset(
+            name for name, (model, criteria) in self.COUNTERS.items()
+            if isinstance(item, model) and all(getattr(item, field) == value for field, value in criteria.items())
+        )
+    
+    def adjust(self, before, after):
+        for name in before - after:
+            self._increment(name, -1)
+        for name in after - before:
+            self._increment(name, 1)
+    
+    def add_counts(self, counts):
+        for name, delta in counts.items():
+            self._increment(name, delta)
+    
+    def _increment(self, name, delta):
+        DashboardCounter.query.filter_by(name=name).update(
+            {DashboardCounter.value: DashboardCounter.value + delta},
+            synchronize_session=False
+        )
+    
+    def rebuild(self):
+        counters = {}
+        for name, (model, criteria) in self.COUNTERS.items():
+            counters[name] = model.query.filter_by(**criteria).count()
+            self.db.session.merge(DashboardCounter(name=name, value=counters[name]))
+        self._commit()
+        return counters
+    
+    def get_stats(self):
+        counters = {counter.name: counter.value for counter in DashboardCounter.query.all()}
+        if set(counters) != set(self.COUNTERS):
+            counters = self._write(self.rebuild)
+        
+        recent_repairs = RepairRequest.query.options(joinedload(RepairRequest.requester)).order_by(
+            RepairRequest.submitted_date.desc()
+        ).limit(self.RECENT_ACTIVITY_LIMIT).all()
+        
+        return {**counters, 'recent_activities': [repair.to_dict() for repair in recent_repairs]}
+
+# ============================================
+# Monthly Report Service
+# ============================================
+class MonthlyReportService(WriterMixin):
+    # ระบบยังไม่มีตารางรายจ่ายของหมู่บ้าน รายงานจึงมีเฉพาะรายรับจากการชำระเงิน
+    INCOME = 'income'
+    CATEGORIES = (INCOME,)
+    # แถว month=0 บันทึกว่า rollup ถูกสร้างแล้ว ปีที่ยังไม่มีการชำระเงินจึงไม่ทำให้ rebuild ทุกครั้งที่เปิดรายงาน
+    BUILT_MARKER = {'year': 0, 'month': 0, 'category': 'built'}
+    
+    def __init__(self, db_session, writer=None):
+        self.db = db_session
+        self.writer = writer
+    
+    def entries_for(self, payment):
+        # การชำระเงินที่อนุมัติแล้วนับเป็นรายรับของเดือนที่ชำระ
+        if payment.status != 'paid':
+            return {}
+        return {(payment.payment_date.year, payment.payment_date.month, self.INCOME): float(payment.amount)}
+    
+    def adjust(self, before, after):
+        for key in set(before) | set(after):
+            amount_delta = after.get(key, 0) - before.get(key, 0)
+            count_delta = (key in after) - (key in before)
+            if amount_delta or count_delta:
+                self._upsert(key, amount_delta, count_delta)
+    
+    def _upsert(self, key, amount_delta, count_delta):
+        year, month, category = key
+        statement = sqlite_insert(MonthlyFinancialRollup).values(
+            year=year, month=month, category=category,
+            total_amount=amount_delta, entry_count=count_delta
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=['year', 'month', 'category'],
+            set_={
+                'total_amount': MonthlyFinancialRollup.total_amount + amount_delta,
+                'entry_count': MonthlyFinancialRollup.entry_count + count_delta
+            }
+        )
+        self.db.session.execute(statement)
+    
+    @staticmethod
+    def paid_payments_query():
+        return Payment.query.filter_by(status='paid').order_by(Payment.payment_date)
+    
+    def is_built(self):
+        return MonthlyFinancialRollup.query.filter_by(**self.BUILT_MARKER).first() is not None
+    
+    def rebuild(self):
+        MonthlyFinancialRollup.query.delete()
+        for payment in self.paid_payments_query().yield_per(1000):
+            self.adjust({}, self.entries_for(payment))
+        self.db.session.add(MonthlyFinancialRollup(**self.BUILT_MARKER))
+        self._commit()
+    
+    def _build_once(self):
+        # ตรวจอีกครั้งบน writer เพราะหลาย request อาจเห็นว่ายังไม่ได้สร้างพร้อมกัน
+        if not self.is_built():
+            self.rebuild()
+    
+    def get_monthly(self, year):
+        if not self.is_built():
+            self._write(self._build_once)
+        
+        series = {category: [0.0] * 12 for category in self.CATEGORIES}
+        for row in MonthlyFinancialRollup.query.filter(MonthlyFinancialRollup.year == year, MonthlyFinancialRollup.month > 0):
+            series.setdefault(row.category, [0.0] * 12)[row.month - 1] = row.total_amount
+        return {'year': year, 'categories': series}
+
 # ============================================
 # Application Factory
 # ============================================
 def create_app():
     app = Flask(__name__, static_folder=Config.STATIC_FOLDER, static_url_path='')
+    app.json = json_provider_class(Config.JSON_ENCODER)(app)
     CORS(app)
     Config.init_app(app)
     
     db.init_app(app)
-    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+    engine_profile = SQLiteEngineProfile(Config.SQLITE_PRAGMAS) if Config.SQLITE_PROFILE_ENABLED else None
+    if engine_profile:
+        engine_profile.init_app(app, db)
+    if Config.QUERY_COUNTER_ENABLED:
+        QueryCounter.init_app(app, db)
+    socketio = SocketIO(
+        app, cors_allowed_origins="*", async_mode=Config.SOCKETIO_ASYNC_MODE,
+        **socketio_queue_options(Config.SOCKETIO_MESSAGE_QUEUE, Config.SOCKETIO_CHANNEL)
+    )
     
     # Initialize services
-    file_manager = FileManager(Config.UPLOAD_FOLDER, Config.ALLOWED_EXTENSIONS)
-    auth_service = AuthService(db)
-    user_service = UserService(db, socketio)
-    announcement_service = AnnouncementService(db, socketio)
-    repair_service = RepairRequestService(db, socketio)
-    booking_service = BookingRequestService(db, socketio)
-    bill_service = BillService(db, socketio)
-    payment_service = PaymentService(db, socketio)
+    image_pipeline = ImagePipeline(
+        Config.UPLOAD_FOLDER, {'thumb': Config.THUMBNAIL_SIZE, 'preview': Config.PREVIEW_SIZE},
+        Config.IMAGE_VARIANT_QUALITY, Config.IMAGE_WORKERS, app.logger
+    )
+    app.extensions['image_pipeline'] = image_pipeline
+    file_manager = FileManager(
+        Config.UPLOAD_FOLDER, Config.ALLOWED_EXTENSIONS, image_pipeline,
+        Config.CHUNKED_UPLOAD_FOLDER, Config.CHUNKED_UPLOAD_MAX_SIZE, Config.UPLOAD_SAVE_WORKERS
+    )
+    writer = None
+    if Config.WRITE_QUEUE_ENABLED:
+        writer = WriteQueue(app, db, Config.WRITE_QUEUE_MAX_BATCH, Config.WRITE_QUEUE_TIMEOUT, engine_profile)
+        app.extensions['write_queue'] = writer
+    upload_collector = UploadCollector(db, file_manager, Config.UPLOAD_GC_GRACE, Config.UPLOAD_GC_BATCH_SIZE, writer)
+    app.extensions['upload_collector'] = upload_collector
+    if Config.UPLOAD_GC_INTERVAL > 0:
+        upload_collector.start(app, Config.UPLOAD_GC_INTERVAL)
+    
+    def entity_cache(name):
+        if name not in Config.ENTITY_CACHE_SERVICES:
+            return None
+        cache = EntityCache(Config.ENTITY_CACHE_MAX_SIZE, Config.ENTITY_CACHE_TTL)
+        entity_caches[name] = cache
+        return cache
+    
+    entity_caches = {}
+    version_service = TableVersionService(db)
+    stats_service = DashboardStatsService(db, writer)
+    report_service = MonthlyReportService(db, writer)
+    password_hasher = PasswordHasher(
+        Config.PASSWORD_HASH_METHOD, Config.PASSWORD_HASH_WORKERS,
+        Config.PASSWORD_HASH_MAX_PENDING, Config.PASSWORD_HASH_TIMEOUT
+    )
+    app.extensions['password_hasher'] = password_hasher
+    token_service = TokenService(Config.SECRET_KEY, Config.ACCESS_TOKEN_MAX_AGE)
+    token_service.init_app(app, Config.AUTH_REQUIRED)
+    app.extensions['token_service'] = token_service
+    admin_required = token_service.admin_required
+    auth_service = AuthService(db, stats_service, writer, versions=version_service,
+                               password_hasher=password_hasher, token_service=token_service)
+    user_service = UserService(db, socketio, stats_service, writer, versions=version_service,
+                               cache=entity_cache('users'), password_hasher=password_hasher)
+    announcement_service = AnnouncementService(db, socketio, writer=writer, versions=version_service,
+                                               cache=entity_cache('announcements'))
+    repair_service = RepairRequestService(db, socketio, stats_service, writer, versions=version_service,
+                                          cache=entity_cache('repair_requests'))
+    booking_service = BookingRequestService(db, socketio, writer=writer, versions=version_service,
+                                            cache=entity_cache('booking_requests'))
+    bill_service = BillService(db, socketio, stats_service, writer, versions=version_service,
+                               cache=entity_cache('bills'))
+    payment_service = PaymentService(db, socketio, stats_service, writer, versions=version_service,
+                                     cache=entity_cache('payments'), report_service=report_service)
+    
+    def conditional_response(tables, build):
+        # ETag มาจาก version ของตารางที่ผลลัพธ์ขึ้นอยู่ ถ้า client ถือ ETag ล่าสุดอยู่แล้วตอบ 304 โดยไม่ query/serialize
+        etag = version_service.etag(tables)
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            payload, status_code = build()
+            response = payload if isinstance(payload, Response) else jsonify(payload)
+            response.status_code = status_code
+            if status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    def stream_list(service, **filters):
+        # service ที่มี EntityCache (ค่าเริ่มต้นคือ users, announcements) ใช้รายการจาก cache ซึ่งอยู่ในหน่วยความจำอยู่แล้ว
+        # จึง stream เฉพาะการ encode ส่วน service อื่นอ่านจากฐานข้อมูลทีละ chunk
+        if service.cache is not None:
+            rows = service.get_all(**filters)
+        else:
+            rows = service.iter_all(Config.JSON_STREAM_CHUNK_SIZE, **filters)
+        chunks = stream_json_array(
+            rows,
+            functools.partial(encode_json_bytes, app),
+            Config.JSON_STREAM_CHUNK_SIZE
+        )
+        # รัน query และ encode chunk แรกก่อนส่ง header เพื่อให้ error ยังตอบเป็น 500 ได้ตามปกติ
+        first = next(chunks) + next(chunks)
+        body = itertools.chain((first,), chunks)
+        return Response(body, mimetype=app.json.mimetype)
+    
+    def list_response(service, **filters):
+        # ส่ง array เต็มเหมือนเดิมถ้าไม่ระบุ cursor/limit, มิฉะนั้นตอบแบบแบ่งหน้า
+        cursor = request.args.get('cursor')
+        if cursor is None and 'limit' not in request.args:
+            if Config.JSON_STREAM_LISTS:
+                return conditional_response(service.list_tables, lambda: (stream_list(service, **filters), 200))
+            return conditional_response(service.list_tables, lambda: (service.get_all(**filters), 200))
+        
+        def build_page():
+            try:
+                return service.get_page(cursor=cursor, limit=request.args.get('limit', type=int), **filters), 200
+            except ValueError as e:
+                return {'message': str(e)}, 400
+        return conditional_response(service.list_tables, build_page)
+    
+    def upload_etag(filename):
+        # ไฟล์ใน objects/ ใช้ hash ของเนื้อหาเป็น strong ETag ซึ่งเท่ากันทุกเครื่อง (ค่าเริ่มต้นของ werkzeug ขึ้นกับ mtime)
+        source = ImagePipeline.source_path(filename)
+        if not FileManager.is_object_path(source or filename):
+            return True
+        digest = os.path.basename(source or filename).split('.', 1)[0]
+        return f"{filename.split('/', 1)[0]}-{digest}" if source else digest
+    
+    def send_upload(upload_folder, filename, immutable=False):
+        if not os.path.isfile(safe_join(upload_folder, filename) or ''):
+            return jsonify({'message': 'File not found'}), 404
+        if Config.UPLOAD_ACCEL_REDIRECT:
+            # nginx ส่งไฟล์จาก internal location เอง (รวม Range และ conditional GET) โดยคง Content-Type และ Cache-Control นี้ไว้
+            response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = Config.UPLOAD_ACCEL_REDIRECT.rstrip('/') + '/' + url_quote(filename)
+        else:
+            # send_file รองรับ Range (206) และ If-None-Match/If-Modified-Since (304) และใช้ X-Sendfile ถ้าเปิดไว้
+            response = send_from_directory(upload_folder, filename, etag=upload_etag(filename),
+                                           max_age=Config.UPLOAD_IMMUTABLE_MAX_AGE if immutable else None)
+        if immutable:
+            response.cache_control.public = True
+            response.cache_control.max_age = Config.UPLOAD_IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+    
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(error):
+        return jsonify({'message': 'Server is busy, please try again'}), 503
+    
+    @app.errorhandler(WriteQueueBusy)
+    def write_queue_busy(error):
+        # งานเขียนผ่าน _write ที่ไม่ได้ห่อด้วย serialized_write
+        return jsonify(write_queue_busy_response(error)), 503
+    
+    @app.errorhandler(UploadNotFound)
+    def upload_not_found(error):
+        return jsonify({'message': 'Upload not found'}), 404
     
     # ============================================
     # Routes
@@ -912,7 +3648,17 @@ def create_app():
     
     @app.route('/uploads/<path:filename>')
     def uploaded_file(filename):
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        # FileManager เขียนไฟล์เทียบกับ working directory จึงอ่านจากที่เดียวกัน (ไม่ใช่ root_path ของ app)
+        upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+        source = ImagePipeline.source_path(filename)
+        if source and not os.path.isfile(safe_join(upload_folder, filename) or ''):
+            # thumbnail ยังย่อไม่เสร็จหรือเป็นรูปก่อนมีระบบนี้ ส่งต้นฉบับไปก่อนแล้วสั่งย่อ
+            # ไม่ให้ cache เพราะ URL เดียวกันจะได้ thumbnail จริงเมื่อย่อเสร็จ
+            if not os.path.isfile(safe_join(upload_folder, source) or ''):
+                return jsonify({'message': 'File not found'}), 404
+            image_pipeline.submit(source)
+            return send_upload(upload_folder, source)
+        return send_upload(upload_folder, filename, FileManager.is_immutable_path(source or filename))
     
     # --- File Upload Routes ---
     @app.route('/upload', methods=['POST'])
@@ -932,7 +3678,8 @@ def create_app():
             return jsonify({
                 'message': 'File uploaded successfully',
                 'filename': os.path.basename(path),
-                'path': path
+                'path': path,
+                'thumbnail_path': ImagePipeline.variant_path(path)
             }), 200
         except ValueError as e:
             return jsonify({'message': str(e)}), 400
@@ -952,11 +3699,67 @@ def create_app():
             paths = file_manager.save_multiple_files(files, upload_type, user_id)
             return jsonify({
                 'message': 'Files uploaded successfully',
-                'paths': paths
+                'paths': paths,
+                'thumbnail_paths': [ImagePipeline.variant_path(path) for path in paths]
             }), 200
         except Exception as e:
             return jsonify({'message': f'Error uploading files: {str(e)}'}), 500
     
+    # --- Chunked Upload Routes ---
+    # POST เริ่ม -> PUT ส่ง chunk พร้อม header Upload-Offset (body เป็น bytes ล้วน) -> POST .../complete
+    # การเชื่อมต่อหลุดให้ GET เพื่อดู offset ล่าสุดแล้วส่งต่อจากตรงนั้น
+    @app.route('/upload/chunked', methods=['POST'])
+    def init_chunked_upload():
+        data = request.get_json() or {}
+        try:
+            upload = file_manager.init_upload(
+                data.get('filename'), data.get('size'), data.get('type', 'general'), data.get('user_id')
+            )
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        return jsonify({
+            'upload_id': upload['upload_id'],
+            'offset': upload['offset'],
+            'size': upload['size'],
+            'chunk_size': Config.CHUNKED_UPLOAD_CHUNK_SIZE
+        }), 201
+    
+    @app.route('/upload/chunked/<upload_id>', methods=['GET'])
+    def get_chunked_upload(upload_id):
+        upload = file_manager.upload_status(upload_id)
+        return jsonify({'upload_id': upload['upload_id'], 'offset': upload['offset'], 'size': upload['size']}), 200
+    
+    @app.route('/upload/chunked/<upload_id>', methods=['PUT'])
+    def append_chunked_upload(upload_id):
+        offset = request.headers.get('Upload-Offset', type=int)
+        if offset is None or request.content_length is None:
+            return jsonify({'message': 'Upload-Offset and Content-Length headers are required'}), 400
+        try:
+            upload = file_manager.append_chunk(upload_id, offset, request.stream, request.content_length)
+        except UploadOffsetMismatch as e:
+            return jsonify({'message': str(e), 'offset': e.offset}), 409
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        return jsonify({'upload_id': upload['upload_id'], 'offset': upload['offset'], 'size': upload['size']}), 200
+    
+    @app.route('/upload/chunked/<upload_id>/complete', methods=['POST'])
+    def complete_chunked_upload(upload_id):
+        try:
+            path = file_manager.finalize_upload(upload_id)
+        except UploadOffsetMismatch as e:
+            return jsonify({'message': 'Upload is incomplete', 'offset': e.offset}), 409
+        return jsonify({
+            'message': 'File uploaded successfully',
+            'filename': os.path.basename(path),
+            'path': path,
+            'thumbnail_path': ImagePipeline.variant_path(path)
+        }), 200
+    
+    @app.route('/upload/chunked/<upload_id>', methods=['DELETE'])
+    def abort_chunked_upload(upload_id):
+        file_manager.abort_upload(upload_id)
+        return jsonify({'message': 'Upload cancelled'}), 200
+    
     # --- Auth Routes ---
     @app.route('/login', methods=['POST'])
     def login():
@@ -964,20 +3767,51 @@ def create_app():
         user, response, status_code = auth_service.login(data.get('username'), data.get('password'))
         return jsonify(response), status_code
     
+    @app.route('/logout', methods=['POST'])
+    def logout():
+        response, status_code = auth_service.logout(g.auth)
+        return jsonify(response), status_code
+    
     # --- User Routes ---
     @app.route('/users', methods=['POST'])
     def create_user():
         data = request.get_json()
         if not data.get('name') or not data.get('username') or not data.get('password'):
             return jsonify({'message': 'Name, username, and password are required'}), 400
+        # สมัครเองได้เฉพาะลูกบ้านที่รออนุมัติ บัญชี admin หรือบัญชีที่อนุมัติแล้วต้องสร้างโดย admin
+        is_admin = g.auth is not None and g.auth['role'] == 'admin'
+        if not is_admin and (data.get('role', 'resident') != 'resident' or data.get('status', 'pending') != 'pending'):
+            return jsonify({'message': 'Admin access required to set role or status'}), 403
         
         user, response, status_code = auth_service.register(data)
         return jsonify(response), status_code
     
+    @app.route('/users/import', methods=['POST'])
+    @admin_required
+    def import_users():
+        # รับ CSV (ไฟล์ใน field 'file' หรือ body แบบ text/csv) หรือ JSON {"users": [...]}
+        upload = request.files.get('file')
+        if upload is not None or request.mimetype == 'text/csv':
+            raw = upload.read() if upload is not None else request.get_data()
+            try:
+                rows = list(csv.DictReader(io.StringIO(raw.decode('utf-8-sig'))))
+            except (UnicodeDecodeError, csv.Error) as e:
+                return jsonify({'message': f'Invalid CSV: {str(e)}'}), 400
+        else:
+            data = request.get_json(silent=True)
+            rows = data.get('users') if isinstance(data, dict) else data
+        
+        if not isinstance(rows, list) or not rows:
+            return jsonify({'message': 'No users to import'}), 400
+        if len(rows) > Config.USER_IMPORT_MAX_ROWS:
+            return jsonify({'message': f'Import exceeds {Config.USER_IMPORT_MAX_ROWS} rows'}), 400
+        
+        response, status_code = user_service.import_users(rows)
+        return jsonify(response), status_code
+    
     @app.route('/users', methods=['GET'])
     def get_all_users():
-        users = user_service.get_all()
-        return jsonify(users), 200
+        return list_response(user_service)
     
     @app.route('/users/<user_id>', methods=['GET'])
     def get_user(user_id):
@@ -988,13 +3822,33 @@ def create_app():
     
     @app.route('/users/<user_id>', methods=['PUT'])
     def update_user(user_id):
-        data = request.get_json()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'message': 'Invalid user data'}), 400
+        # role/status อยู่ใน token ที่ออกใหม่ด้านล่าง จึงต้องตรวจสิทธิ์ก่อนแก้ ไม่เช่นนั้นลูกบ้านตั้งตัวเองเป็น admin ได้
+        if g.auth is None:
+            return jsonify({'message': 'Authentication required'}), 401
+        if g.auth['role'] != 'admin':
+            if g.auth['user_id'] != user_id:
+                return jsonify({'message': 'You can only edit your own account'}), 403
+            forbidden = sorted(set(data) - UserService.SELF_EDITABLE_FIELDS)
+            if forbidden:
+                return jsonify({'message': f"Admin access required to change: {', '.join(forbidden)}"}), 403
         response, status_code = user_service.update(user_id, data)
+        if status_code == 200 and ('role' in data or 'status' in data or data.get('password')):
+            # token เดิมมี role เก่าอยู่ ให้ login ใหม่ ยกเว้นผู้ใช้ที่แก้ข้อมูลของตัวเองซึ่งได้ token ใหม่กลับไปเลย
+            token_service.revoke_user(user_id)
+            if g.auth and g.auth['user_id'] == user_id:
+                response['token'], response['expires_in'] = token_service.issue(User.query.get(user_id))
+                response['token_type'] = 'Bearer'
         return jsonify(response), status_code
     
     @app.route('/users/<user_id>', methods=['DELETE'])
+    @admin_required
     def delete_user(user_id):
         response, status_code = user_service.delete(user_id)
+        if status_code == 200:
+            token_service.revoke_user(user_id)
         return jsonify(response), status_code
     
     # --- Announcement Routes ---
@@ -1009,16 +3863,17 @@ def create_app():
     
     @app.route('/announcements', methods=['GET'])
     def get_all_announcements():
-        announcements = announcement_service.get_all()
-        return jsonify(announcements), 200
+        return list_response(announcement_service)
     
     @app.route('/announcements/<announcement_id>', methods=['PUT'])
+    @admin_required
     def update_announcement(announcement_id):
         data = request.get_json()
         response, status_code = announcement_service.update(announcement_id, data)
         return jsonify(response), status_code
     
     @app.route('/announcements/<announcement_id>', methods=['DELETE'])
+    @admin_required
     def delete_announcement(announcement_id):
         response, status_code = announcement_service.delete(announcement_id)
         return jsonify(response), status_code
@@ -1035,11 +3890,10 @@ def create_app():
     
     @app.route('/repair-requests', methods=['GET'])
     def get_all_repair_requests():
-        user_id = request.args.get('user_id')
-        requests = repair_service.get_all(user_id)
-        return jsonify(requests), 200
+        return list_response(repair_service, user_id=request.args.get('user_id'))
     
     @app.route('/repair-requests/<request_id>', methods=['PUT'])
+    @admin_required
     def update_repair_request(request_id):
         data = request.get_json()
         response, status_code = repair_service.update(request_id, data)
@@ -1058,11 +3912,24 @@ def create_app():
     
     @app.route('/booking-requests', methods=['GET'])
     def get_all_booking_requests():
-        user_id = request.args.get('user_id')
-        requests = booking_service.get_all(user_id)
-        return jsonify(requests), 200
+        return list_response(booking_service, user_id=request.args.get('user_id'))
+    
+    @app.route('/booking-requests/availability', methods=['GET'])
+    def get_booking_availability():
+        location = request.args.get('location')
+        booking_date = request.args.get('date')
+        if not location or not booking_date:
+            return jsonify({'message': 'location and date are required'}), 400
+        
+        try:
+            booking_date = datetime.fromisoformat(booking_date).date()
+        except ValueError:
+            return jsonify({'message': 'Invalid date'}), 400
+        
+        return jsonify(booking_service.get_availability(location, booking_date)), 200
     
     @app.route('/booking-requests/<booking_id>', methods=['PUT'])
+    @admin_required
     def update_booking_request(booking_id):
         data = request.get_json()
         response, status_code = booking_service.update(booking_id, data)
@@ -1070,6 +3937,15 @@ def create_app():
     
     @app.route('/booking-requests/<booking_id>', methods=['DELETE'])
     def delete_booking_request(booking_id):
+        # ลูกบ้านยกเลิกการจองของตัวเองได้ การจองของผู้อื่นต้องเป็น admin
+        if g.auth is None:
+            return jsonify({'message': 'Authentication required'}), 401
+        if g.auth['role'] != 'admin':
+            booking = BookingRequest.query.get(booking_id)
+            if booking is None:
+                return jsonify({'message': 'Booking request not found'}), 404
+            if booking.user_id != g.auth['user_id']:
+                return jsonify({'message': 'You can only cancel your own bookings'}), 403
         response, status_code = booking_service.delete(booking_id)
         return jsonify(response), status_code
     
@@ -1084,19 +3960,34 @@ def create_app():
         response, status_code = bill_service.create(data)
         return jsonify(response), status_code
     
+    @app.route('/bills/batch', methods=['POST'])
+    @admin_required
+    def create_bill_batch():
+        data = request.get_json() or {}
+        template = data.get('template') or {}
+        recipients = data.get('recipients')
+        required_fields = ['item_name', 'amount', 'due_date', 'issued_by_user_id']
+        if not all(template.get(field) is not None for field in required_fields) or not isinstance(recipients, list) or not recipients:
+            return jsonify({'message': 'Missing required fields'}), 400
+        if len(recipients) > Config.BILL_BATCH_MAX_SIZE:
+            return jsonify({'message': f'Batch exceeds {Config.BILL_BATCH_MAX_SIZE} recipients'}), 400
+        
+        response, status_code = bill_service.create_batch(template, recipients)
+        return jsonify(response), status_code
+    
     @app.route('/bills', methods=['GET'])
     def get_all_bills():
-        user_id = request.args.get('user_id')
-        bills = bill_service.get_all(user_id)
-        return jsonify(bills), 200
+        return list_response(bill_service, user_id=request.args.get('user_id'))
     
     @app.route('/bills/<bill_id>', methods=['PUT'])
+    @admin_required
     def update_bill(bill_id):
         data = request.get_json()
         response, status_code = bill_service.update(bill_id, data)
         return jsonify(response), status_code
     
     @app.route('/bills/<bill_id>', methods=['DELETE'])
+    @admin_required
     def delete_bill(bill_id):
         response, status_code = bill_service.delete(bill_id)
         return jsonify(response), status_code
@@ -1114,20 +4005,113 @@ def create_app():
     
     @app.route('/payments', methods=['GET'])
     def get_all_payments():
-        user_id = request.args.get('user_id')
-        payments = payment_service.get_all(user_id)
-        return jsonify(payments), 200
+        return list_response(payment_service, user_id=request.args.get('user_id'))
     
     @app.route('/payments/approve/<payment_id>', methods=['PUT'])
+    @admin_required
     def approve_payment(payment_id):
         response, status_code = payment_service.approve(payment_id)
         return jsonify(response), status_code
     
     @app.route('/payments/reject/<payment_id>', methods=['PUT'])
+    @admin_required
     def reject_payment(payment_id):
         response, status_code = payment_service.reject(payment_id)
         return jsonify(response), status_code
     
+    # --- Dashboard Routes ---
+    @app.route('/dashboard/stats', methods=['GET'])
+    def get_dashboard_stats():
+        return conditional_response(('users', 'repair_requests', 'bills'), lambda: (stats_service.get_stats(), 200))
+    
+    # --- Report Routes ---
+    @app.route('/reports/monthly', methods=['GET'])
+    def get_monthly_report():
+        year = request.args.get('year', datetime.utcnow().year, type=int)
+        return jsonify(report_service.get_monthly(year)), 200
+    
+    # --- Export Routes ---
+    def export_csv(service, name):
+        # from/to เป็นวันที่ (YYYY-MM-DD) แบบรวมทั้งสองวัน
+        try:
+            start = request.args.get('from')
+            end = request.args.get('to')
+            start = datetime.combine(date.fromisoformat(start), datetime.min.time()) if start else None
+            end = datetime.combine(date.fromisoformat(end) + timedelta(days=1), datetime.min.time()) if end else None
+        except ValueError:
+            return jsonify({'message': 'from/to must be dates in YYYY-MM-DD format'}), 400
+        
+        chunks = stream_csv(
+            service.export_columns,
+            service.iter_export(start, end, Config.EXPORT_CHUNK_SIZE),
+            Config.EXPORT_CHUNK_SIZE
+        )
+        # รัน query ก่อนส่ง header เพื่อให้ error ยังตอบเป็น 500 ได้ตามปกติ
+        body = itertools.chain((next(chunks),), chunks)
+        suffix = '_'.join(part for part in (request.args.get('from'), request.args.get('to')) if part)
+        filename = f"{name}_{suffix}.csv" if suffix else f"{name}.csv"
+        return Response(body, mimetype='text/csv', headers={
+            'Content-Disposition': f'attachment; filename="{filename}"'
+        })
+    
+    @app.route('/exports/bills.csv', methods=['GET'])
+    @admin_required
+    def export_bills():
+        return export_csv(bill_service, 'bills')
+    
+    @app.route('/exports/payments.csv', methods=['GET'])
+    @admin_required
+    def export_payments():
+        return export_csv(payment_service, 'payments')
+    
+    # --- Schema Routes ---
+    @app.route('/admin/cache', methods=['GET'])
+    @admin_required
+    def get_cache_stats():
+        return jsonify({name: cache.stats() for name, cache in entity_caches.items()}), 200
+    
+    @app.route('/admin/uploads/gc', methods=['GET'])
+    @admin_required
+    def get_upload_gc_status():
+        return jsonify({'last_run': upload_collector.last_run, 'grace_period': upload_collector.grace_period}), 200
+    
+    @app.route('/admin/uploads/gc', methods=['POST'])
+    @admin_required
+    def run_upload_gc():
+        # dry_run=1 รายงานอย่างเดียวโดยไม่ลบ, grace=<วินาที> ใช้แทน UPLOAD_GC_GRACE สำหรับรอบนี้ (ไม่ต่ำกว่า UPLOAD_GC_MIN_GRACE)
+        grace_period = request.args.get('grace', type=int)
+        if grace_period is not None:
+            grace_period = max(grace_period, Config.UPLOAD_GC_MIN_GRACE)
+        stats = upload_collector.sweep(dry_run=request.args.get('dry_run') == '1', grace_period=grace_period)
+        if stats is None:
+            return jsonify({'message': 'Garbage collection is already running'}), 409
+        return jsonify(stats), 200
+    
+    @app.route('/admin/schema', methods=['GET'])
+    @admin_required
+    def get_schema_status():
+        # version ของ migration ที่รันแล้ว และ EXPLAIN QUERY PLAN ของ list query หลัก (ค่า filter เป็นตัวอย่าง)
+        sample_id = 'sample-user-id'
+        query_plans = {
+            'users': user_service.explain(),
+            'announcements': announcement_service.explain(),
+            'repair_requests': repair_service.explain(),
+            'repair_requests_by_user': repair_service.explain(user_id=sample_id),
+            'booking_requests': booking_service.explain(),
+            'booking_requests_by_user': booking_service.explain(user_id=sample_id),
+            'booking_slot': explain_query_plan(booking_service.interval_index.active_query('คลับเฮ้าส์', date.today())),
+            'bills': bill_service.explain(),
+            'bills_by_user': bill_service.explain(user_id=sample_id),
+            'payments': payment_service.explain(),
+            'payments_by_user': payment_service.explain(user_id=sample_id),
+            'paid_payments': explain_query_plan(report_service.paid_payments_query()),
+        }
+        return jsonify({
+            'migrations': [m.to_dict() for m in SchemaMigration.query.order_by(SchemaMigration.version)],
+            'pending': [{'version': version, 'name': name} for version, name in migrations.pending()],
+            'query_plans': query_plans
+        }), 200
+    
     # --- SocketIO Events ---
     @socketio.on('connect')
     def handle_connect():
@@ -1183,7 +4167,7 @@ def populate_initial_data():
         admin_user = User(
             name='ผู้ดูแลระบบ',
             username='admin',
-            password_hash=generate_password_hash('admin123'),
+            password_hash=generate_password_hash('admin123', Config.PASSWORD_HASH_METHOD),
             phone='',
             email='',
             address='',
@@ -1195,7 +4179,7 @@ def populate_initial_data():
         resident_user = User(
             name='ผู้อยู่อาศัย',
             username='resident',
-            password_hash=generate_password_hash('resident123'),
+            password_hash=generate_password_hash('resident123', Config.PASSWORD_HASH_METHOD),
             phone='',
             email='',
             address='',
@@ -1215,16 +4199,17 @@ def populate_initial_data():
 # ============================================
 # Main Execution
 # ============================================
-if __name__ == '__main__':
-    app, socketio = create_app()
-    
+def init_database(app):
     with app.app_context():
-        db.create_all()
+        migrations.run()
         
         if User.query.count() == 0:
             populate_initial_data()
         else:
             print("ฐานข้อมูลมีข้อมูลผู้ใช้อยู่แล้ว")
-    
-    port = int(os.environ.get('PORT', 5000))
-    socketio.run(app, debug=True, port=port, host='0.0.0.0')
+
+if __name__ == '__main__':
+    # Development server (Werkzeug) สำหรับ production ให้รัน wsgi.py
+    app, socketio = create_app()
+    init_database(app)
+    socketio.run(app, debug=Config.DEBUG, port=Config.PORT, host=Config.HOST, allow_unsafe_werkzeug=True)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+wsgi.py - Production entry point ของ Smart Village backend
+
+เลือก async worker ของ Socket.IO จาก SOCKETIO_ASYNC_MODE (eventlet | gevent | threading | auto)
+eventlet/gevent ต้อง monkey patch ก่อน import app.py จึงต้องแยกไฟล์นี้ออกมา
+
+การรัน:
+SOCKETIO_ASYNC_MODE=eventlet python wsgi.py
+gunicorn -k eventlet -w 1 --bind 0.0.0.0:5000 wsgi:app
+gunicorn -k gthread -w 1 --threads 100 --bind 0.0.0.0:5000 wsgi:app  (threading mode)
+
+Socket.IO เก็บสถานะ session ไว้ในหน่วยความจำของ process จึงใช้ worker เดียว (-w 1) ต่อ process
+ถ้าต้องการหลาย process ให้ตั้ง SOCKETIO_MESSAGE_QUEUE (เช่น redis://...) แล้วรันหลาย process
+คนละ port หลัง load balancer ที่เปิด sticky session
+"""
+
+import os
+import sys
+
+
+def resolve_async_mode(requested):
+    # auto: ใช้ eventlet ถ้ามี, ถัดไป gevent, สุดท้าย threading
+    candidates = ('eventlet', 'gevent') if requested == 'auto' else (requested,)
+    for mode in candidates:
+        if mode == 'threading':
+            return mode
+        try:
+            __import__(mode)
+            return mode
+        except ImportError:
+            if requested != 'auto':
+                sys.exit(f"SOCKETIO_ASYNC_MODE={mode} แต่ยังไม่ได้ติดตั้ง package '{mode}'")
+    return 'threading'
+
+
+ASYNC_MODE = resolve_async_mode(os.environ.get('SOCKETIO_ASYNC_MODE', 'auto'))
+
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+# ให้ Config ใน app.py อ่านค่า mode ที่เลือกแล้ว
+os.environ['SOCKETIO_ASYNC_MODE'] = ASYNC_MODE
+
+from app import Config, create_app, init_database  # noqa: E402
+
+# worker ของ process pool (PasswordHasher ใช้ spawn) import ไฟล์นี้ซ้ำในชื่อ __mp_main__ จึงไม่ต้องสร้างแอป
+if __name__ != '__mp_main__':
+    app, socketio = create_app()
+    init_database(app)
+
+
+def run_threading_server():
+    # threading mode ใช้ gunicorn (gthread) เป็น WSGI server ถ้ามี ไม่เช่นนั้นถอยไปใช้ Werkzeug
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("⚠️  ไม่พบ gunicorn - ใช้ Werkzeug server แทน (ไม่แนะนำสำหรับ production)")
+        socketio.run(app, host=Config.HOST, port=Config.PORT, allow_unsafe_werkzeug=True)
+        return
+
+    class GunicornApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{Config.HOST}:{Config.PORT}')
+            self.cfg.set('workers', 1)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', Config.SERVER_THREADS)
+
+        def load(self):
+            return app
+
+    GunicornApplication().run()
+
+
+if __name__ == '__main__':
+    print(f"Starting Smart Village backend ({ASYNC_MODE}) on {Config.HOST}:{Config.PORT}")
+    if ASYNC_MODE == 'threading':
+        run_threading_server()
+    else:
+        # eventlet.wsgi / gevent.pywsgi เป็น production server อยู่แล้ว
+        socketio.run(app, host=Config.HOST, port=Config.PORT)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+bench_bill_batch.py - เปรียบเทียบเวลาออกบิลค่าส่วนกลางให้ N ครัวเรือน
+ระหว่าง POST /bills ทีละใบ กับ POST /bills/batch ครั้งเดียว
+
+การรัน:
+python "FINAL PROJECT/benchmarks/bench_bill_batch.py" --households 2000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import app as backend  # noqa: E402
+
+
+def build_app(db_path, households):
+    backend.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{db_path}"
+    app, socketio = backend.create_app()
+    with app.app_context():
+        backend.db.create_all()
+        admin = backend.User(name="Bench Admin", username="bench_admin", password_hash="x", role="admin", status="approved")
+        backend.db.session.add(admin)
+        backend.db.session.add_all(
+            backend.User(name=f"House {n}", username=f"house_{n}", password_hash="x", role="resident", status="approved")
+            for n in range(households)
+        )
+        backend.db.session.commit()
+        resident_ids = [u.user_id for u in backend.User.query.filter_by(role="resident")]
+        token, _ = app.extensions["token_service"].issue(admin)  # /bills/batch ต้องใช้ token ของ admin
+        return app, admin.user_id, resident_ids, {"Authorization": f"Bearer {token}"}
+
+
+def template(admin_id):
+    return {
+        "item_name": "ค่าส่วนกลาง",
+        "amount": 1500.00,
+        "due_date": (date.today() + timedelta(days=30)).isoformat(),
+        "issued_by_user_id": admin_id
+    }
+
+
+def issue_one_by_one(client, admin_id, resident_ids, headers):
+    for resident_id in resident_ids:
+        response = client.post("/bills", json={**template(admin_id), "recipient_id": resident_id})
+        assert response.status_code == 201
+
+
+def issue_batch(client, admin_id, resident_ids, headers):
+    response = client.post(
+        "/bills/batch", json={"template": template(admin_id), "recipients": resident_ids}, headers=headers
+    )
+    assert response.status_code == 201, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--households", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<12} {'bills':>7} {'seconds':>9} {'bills/s':>10}")
+    for label, issue in (("one-by-one", issue_one_by_one), ("batch", issue_batch)):
+        with tempfile.TemporaryDirectory() as tmp:
+            app, admin_id, resident_ids, headers = build_app(os.path.join(tmp, "bench.db"), args.households)
+            client = app.test_client()
+            started = time.perf_counter()
+            issue(client, admin_id, resident_ids, headers)
+            elapsed = time.perf_counter() - started
+            with app.app_context():
+                backend.db.engine.dispose()
+            if "write_queue" in app.extensions:
+                app.extensions["write_queue"].engine.dispose()
+        print(f"{label:<12} {len(resident_ids):>7} {elapsed:>9.2f} {len(resident_ids) / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
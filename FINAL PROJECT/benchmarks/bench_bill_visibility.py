@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+bench_bill_visibility.py - เปรียบเทียบการอ่านรายการบิลของลูกบ้านหนึ่งคนที่ 100k บิล
+ระหว่างเงื่อนไขเดิม (recipient_id == user_id OR recipient_id == 'all')
+กับการอ่านจาก bill_recipients ผ่าน index (user_id, issued_date, bill_id)
+
+การรัน:
+python "FINAL PROJECT/benchmarks/bench_bill_visibility.py" --bills 100000 --households 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import app as backend  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+
+def seed(households, bills, all_ratio):
+    db = backend.db
+    users = [backend.User(name=f"House {n}", username=f"house_{n}", password_hash="x", role="resident", status="approved")
+             for n in range(households)]
+    db.session.add_all(users)
+    db.session.commit()
+    user_ids = [u.user_id for u in users]
+
+    started = datetime(2020, 1, 1)
+    rows = []
+    for n in range(bills):
+        rows.append({
+            "bill_id": str(uuid.uuid4()),
+            "item_name": f"bill {n}",
+            "amount": 100.0,
+            "due_date": date(2030, 1, 1),
+            "recipient_id": "all" if random.random() < all_ratio else random.choice(user_ids),
+            "issued_by_user_id": None,
+            "issued_date": started + timedelta(minutes=n),
+            "status": "unpaid"
+        })
+    db.session.execute(backend.Bill.__table__.insert(), rows)
+    backend.BillAudience.backfill()
+    db.session.commit()
+    return user_ids
+
+
+def old_page(user_id, limit):
+    Bill = backend.Bill
+    bills = Bill.query.options(joinedload(Bill.issuer)).filter(
+        (Bill.recipient_id == user_id) | (Bill.recipient_id == "all")
+    ).order_by(Bill.issued_date.desc(), Bill.bill_id.desc()).limit(limit).all()
+    return [bill.to_dict() for bill in bills]
+
+
+def timed(fn, user_ids, repeat):
+    started = time.perf_counter()
+    for i in range(repeat):
+        fn(user_ids[i % len(user_ids)])
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def explain(query):
+    compiled = query.statement.compile(compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in backend.db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bills", type=int, default=100000)
+    parser.add_argument("--households", type=int, default=200)
+    parser.add_argument("--all-ratio", type=float, default=0.02, help="สัดส่วนบิลที่ส่งถึง 'all'")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app, socketio = backend.create_app()
+        with app.app_context():
+            backend.db.create_all()
+            user_ids = seed(args.households, args.bills, args.all_ratio)
+            service = backend.BillService(backend.db, socketio)
+            recipients = backend.BillRecipient.query.count()
+
+            old_ms = timed(lambda uid: old_page(uid, args.limit), user_ids, args.repeat)
+            new_ms = timed(lambda uid: service.get_page(limit=args.limit, user_id=uid), user_ids, args.repeat)
+
+            print(f"bills={args.bills} households={args.households} bill_recipients={recipients}")
+            print(f"{'query':<18} {'ms/page':>9}")
+            print(f"{'recipient_id OR':<18} {old_ms:>9.2f}")
+            print(f"{'bill_recipients':<18} {new_ms:>9.2f}")
+            print("\nplan (OR):", explain(backend.Bill.query.filter(
+                (backend.Bill.recipient_id == user_ids[0]) | (backend.Bill.recipient_id == "all")
+            ).order_by(backend.Bill.issued_date.desc(), backend.Bill.bill_id.desc()).limit(args.limit)))
+            print("plan (bill_recipients):", explain(service._list_query(user_id=user_ids[0]).limit(args.limit)))
+            backend.db.engine.dispose()
+        if "write_queue" in app.extensions:
+            app.extensions["write_queue"].engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+bench_json_lists.py - วัด GET /payments แบบเต็มรายการของหมู่บ้านขนาดใหญ่
+เปรียบเทียบ jsonify + json ของ stdlib (แบบเดิม), orjson แบบ buffer ทั้งก้อน และ orjson แบบ stream จาก yield_per
+รายงานเวลาถึง byte แรก (TTFB), เวลารวม และหน่วยความจำสูงสุดระหว่าง request (tracemalloc)
+
+การรัน:
+python "FINAL PROJECT/benchmarks/bench_json_lists.py" --payments 50000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import app as backend  # noqa: E402
+
+
+def seed(households, payments):
+    db = backend.db
+    users = [backend.User(name=f"House {n}", username=f"house_{n}", password_hash="x", role="resident", status="approved")
+             for n in range(households)]
+    db.session.add_all(users)
+    db.session.commit()
+    user_ids = [u.user_id for u in users]
+
+    started = datetime(2020, 1, 1)
+    bills, rows = [], []
+    for n in range(payments):
+        bill_id = str(uuid.uuid4())
+        user_id = user_ids[n % households]
+        bills.append({
+            "bill_id": bill_id, "item_name": f"ค่าส่วนกลาง {n}", "amount": 500.0, "due_date": date(2030, 1, 1),
+            "recipient_id": user_id, "issued_by_user_id": None, "issued_date": started + timedelta(minutes=n),
+            "status": "paid"
+        })
+        rows.append({
+            "payment_id": str(uuid.uuid4()), "bill_id": bill_id, "user_id": user_id, "amount": 500.0,
+            "payment_date": started + timedelta(minutes=n), "payment_method": "transfer",
+            "status": "approved", "slip_path": f"slips/{n}.jpg"
+        })
+    db.session.execute(backend.Bill.__table__.insert(), bills)
+    db.session.execute(backend.Payment.__table__.insert(), rows)
+    db.session.commit()
+
+
+def timed(client):
+    started = time.perf_counter()
+    response = client.get("/payments", buffered=False)
+    body = iter(response.response)
+    size = len(next(body))
+    ttfb = time.perf_counter() - started
+    for chunk in body:
+        size += len(chunk)
+    total = time.perf_counter() - started
+    response.close()
+    return ttfb * 1000, total * 1000, size / 1024 / 1024
+
+
+def peak_memory(client):
+    # วัดแยกจากเวลา เพราะ tracemalloc ทำให้ทุกอย่างช้าลงหลายเท่า
+    tracemalloc.start()
+    response = client.get("/payments", buffered=False)
+    for _ in response.response:
+        pass
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=50000)
+    parser.add_argument("--households", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    modes = [("stdlib buffered", "stdlib", False)]
+    if backend.orjson is not None:
+        modes += [("orjson buffered", "orjson", False), ("orjson stream", "orjson", True)]
+    else:
+        modes += [("stdlib stream", "stdlib", True)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        backend.Config.QUERY_COUNTER_ENABLED = False
+        backend.Config.ENTITY_CACHE_SERVICES = set()
+        app, socketio = backend.create_app()
+        with app.app_context():
+            backend.db.create_all()
+            seed(args.households, args.payments)
+
+        print(f"payments={args.payments} households={args.households}")
+        print(f"{'mode':<17} {'ttfb ms':>9} {'total ms':>9} {'peak MiB':>9} {'body MiB':>9}")
+        client = app.test_client()
+        for label, encoder, stream in modes:
+            app.json = backend.json_provider_class(encoder)(app)
+            backend.Config.JSON_STREAM_LISTS = stream
+            timed(client)  # warm-up
+            results = [timed(client) for _ in range(args.repeat)]
+            ttfb, total, size = (min(values) for values in zip(*results))
+            peak = peak_memory(client)
+            print(f"{label:<17} {ttfb:>9.1f} {total:>9.1f} {peak:>9.1f} {size:>9.1f}")
+
+        with app.app_context():
+            backend.db.engine.dispose()
+        if "write_queue" in app.extensions:
+            app.extensions["write_queue"].engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
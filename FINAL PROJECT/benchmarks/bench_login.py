@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+bench_login.py - จำลองช่วง login พร้อมกันตอนเช้า เปรียบเทียบการตรวจรหัสผ่านใน request thread
+กับการส่งไปตรวจบน process pool ของ PasswordHasher
+
+ระหว่างที่ thread จำนวน --concurrency ยิง POST /login ต่อเนื่อง จะมี probe ยิง GET / ทุก 50 ms
+เพื่อวัดว่า request เบา ๆ (เทียบได้กับ socket traffic) ถูกหน่วงเพราะ GIL แค่ไหน
+
+การรัน:
+python "FINAL PROJECT/benchmarks/bench_login.py" --workers 4 --concurrency 16 --seconds 10
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import app as backend  # noqa: E402
+
+
+def login_storm(app, concurrency, seconds):
+    stop = threading.Event()
+    counts = [0] * concurrency
+    probes = []
+
+    def login(n):
+        client = app.test_client()
+        while not stop.is_set():
+            response = client.post("/login", json={"username": "resident", "password": "resident123"})
+            assert response.status_code == 200, response.json
+            counts[n] += 1
+
+    def probe():
+        client = app.test_client()
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get("/")
+            probes.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=login, args=(n,)) for n in range(concurrency)]
+    threads.append(threading.Thread(target=probe))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds, statistics.median(probes), max(probes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        backend.Config.PASSWORD_HASH_WORKERS = args.workers
+        app, socketio = backend.create_app()
+        backend.init_database(app)
+        hasher = app.extensions["password_hasher"]
+        cores = min(args.workers, os.cpu_count() or 1)
+
+        print(f"workers={args.workers} cpus={os.cpu_count()} concurrency={args.concurrency} method={hasher.method}")
+        print(f"{'mode':<15} {'logins/s':>9} {'per core':>9} {'probe p50 ms':>13} {'probe max ms':>13}")
+        for label, pool in (("request thread", False), ("process pool", True)):
+            hasher.pool = pool
+            if pool:
+                hasher.hash_many(["warm-up"] * args.workers * 2)  # spawn worker ก่อนจับเวลา
+            rate, p50, worst = login_storm(app, args.concurrency, args.seconds)
+            per_core = rate / (cores if pool else 1)
+            print(f"{label:<15} {rate:>9.1f} {per_core:>9.1f} {p50:>13.1f} {worst:>13.1f}")
+
+        hasher.shutdown()
+        with app.app_context():
+            backend.db.engine.dispose()
+        if "write_queue" in app.extensions:
+            app.extensions["write_queue"].engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+bench_multi_upload.py - วัดการแจ้งซ่อมพร้อมรูป 10 รูปผ่าน POST /upload-multiple
+เปรียบเทียบการบันทึกทีละไฟล์ (UPLOAD_SAVE_WORKERS=1) กับการบันทึกพร้อมกันบน thread pool
+รายงานทั้งเวลารวมของ request (รวมการ parse multipart ซึ่งเท่ากันทั้งสองแบบ)
+และเวลาของ save_multiple_files อย่างเดียว
+
+การรัน:
+python "FINAL PROJECT/benchmarks/bench_multi_upload.py" --photos 10 --size-mb 4 --workers 4
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from werkzeug.datastructures import FileStorage
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import app as backend  # noqa: E402
+
+
+def photos(count, size):
+    # ไบต์สุ่มทุกครั้งเพื่อไม่ให้ไฟล์ซ้ำกับรอบก่อนแล้วถูก dedup
+    return [(f"photo_{n}.jpg", os.urandom(size)) for n in range(count)]
+
+
+def request_time(client, files):
+    data = {"files[]": [(io.BytesIO(content), name) for name, content in files], "type": "repair"}
+    started = time.perf_counter()
+    response = client.post("/upload-multiple", data=data, content_type="multipart/form-data")
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200 and len(response.json["paths"]) == len(files)
+    return elapsed * 1000
+
+
+def save_time(file_manager, files):
+    storages = [FileStorage(io.BytesIO(content), filename=name) for name, content in files]
+    started = time.perf_counter()
+    paths = file_manager.save_multiple_files(storages, "repair")
+    elapsed = time.perf_counter() - started
+    assert len(paths) == len(files)
+    return elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=10)
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    size = int(args.size_mb * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        backend.Config.UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+        backend.Config.CHUNKED_UPLOAD_FOLDER = os.path.join(tmp, "partial")
+        backend.Config.MAX_CONTENT_LENGTH = (args.photos + 1) * size
+
+        print(f"photos={args.photos} size={args.size_mb} MiB workers={args.workers} cpus={os.cpu_count()}")
+        print(f"{'mode':<12} {'request ms':>11} {'save ms':>9}")
+        for label, workers in (("sequential", 1), ("thread pool", args.workers)):
+            backend.Config.UPLOAD_SAVE_WORKERS = workers
+            app, socketio = backend.create_app()
+            app.extensions["image_pipeline"].enabled = False  # วัดเฉพาะการบันทึก ไม่นับการย่อรูป
+            file_manager = backend.FileManager(
+                backend.Config.UPLOAD_FOLDER, backend.Config.ALLOWED_EXTENSIONS,
+                partial_folder=backend.Config.CHUNKED_UPLOAD_FOLDER, save_workers=workers
+            )
+            client = app.test_client()
+            request_times = [request_time(client, photos(args.photos, size)) for _ in range(args.repeat)]
+            save_times = [save_time(file_manager, photos(args.photos, size)) for _ in range(args.repeat)]
+            print(f"{label:<12} {statistics.median(request_times):>11.1f} {statistics.median(save_times):>9.1f}")
+            app.extensions["password_hasher"].shutdown()
+            with app.app_context():
+                backend.db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+bench_socket_capacity.py - วัดจำนวน Socket.IO connection ของลูกบ้านที่ backend process เดียวรับได้
+
+เปิด backend ผ่าน wsgi.py ตาม async mode ที่เลือก แล้วเปิด WebSocket พร้อมกันจำนวนมาก
+(แต่ละ connection join room ของตัวเองเหมือน frontend) ค้างไว้ตามเวลาที่กำหนดและตอบ ping
+จากนั้นรายงานจำนวน connection ที่ยังอยู่, จำนวน thread และหน่วยความจำของ server
+
+การรัน:
+python "FINAL PROJECT/benchmarks/bench_socket_capacity.py" --modes threading eventlet --connections 2000 --hold 20
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+HOST = "127.0.0.1"
+
+
+# --- Minimal WebSocket / Engine.IO v4 client ---
+async def read_frame(reader):
+    header = await reader.readexactly(2)
+    opcode = header[0] & 0x0F
+    length = header[1] & 0x7F
+    if length == 126:
+        length = int.from_bytes(await reader.readexactly(2), "big")
+    elif length == 127:
+        length = int.from_bytes(await reader.readexactly(8), "big")
+    payload = await reader.readexactly(length)
+    return opcode, payload.decode("utf-8", "replace")
+
+
+def write_frame(writer, text):
+    payload = text.encode()
+    mask = os.urandom(4)
+    header = bytes([0x81])
+    if len(payload) < 126:
+        header += bytes([0x80 | len(payload)])
+    else:
+        header += bytes([0x80 | 126]) + len(payload).to_bytes(2, "big")
+    writer.write(header + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload)))
+
+
+async def resident_socket(port, room, connected, stop, gate):
+    async with gate:
+        reader, writer = await asyncio.open_connection(HOST, port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((
+            "GET /socket.io/?EIO=4&transport=websocket HTTP/1.1\r\n"
+            f"Host: {HOST}:{port}\r\n"
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        ).encode())
+        response = await reader.readuntil(b"\r\n\r\n")
+        if b" 101 " not in response.split(b"\r\n", 1)[0]:
+            writer.close()
+            raise ConnectionError(response.split(b"\r\n", 1)[0].decode())
+
+        await read_frame(reader)  # Engine.IO open packet
+        write_frame(writer, "40")
+        await read_frame(reader)  # Socket.IO connect ack
+        write_frame(writer, f'42["join_room",{{"room_name":"{room}"}}]')
+        connected.append(room)
+
+    try:
+        # ค้าง connection ไว้และตอบ ping ของ server จนกว่าจะหมดเวลา
+        while not stop.is_set():
+            try:
+                opcode, payload = await asyncio.wait_for(read_frame(reader), timeout=1)
+            except asyncio.TimeoutError:
+                continue
+            if opcode == 0x8:
+                raise ConnectionError("closed by server")
+            if payload == "2":
+                write_frame(writer, "3")
+        return True
+    finally:
+        writer.close()
+
+
+async def hold_connections(port, count, hold_seconds, ramp_concurrency, sample):
+    connected = []
+    stop = asyncio.Event()
+    gate = asyncio.Semaphore(ramp_concurrency)
+
+    started = time.perf_counter()
+    tasks = [
+        asyncio.ensure_future(resident_socket(port, f"resident-{n}", connected, stop, gate))
+        for n in range(count)
+    ]
+    while len(connected) < count and time.perf_counter() - started < 60:
+        if all(t.done() for t in tasks):
+            break
+        await asyncio.sleep(0.2)
+    ramp_seconds = time.perf_counter() - started
+
+    await asyncio.sleep(hold_seconds)
+    alive = sum(1 for t in tasks if not t.done())
+    stats = sample()
+    stop.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    errors = sum(1 for r in results if isinstance(r, Exception))
+    return len(connected), alive, errors, ramp_seconds, stats
+
+
+# --- Server process ---
+def server_stats(pid):
+    stats = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "Threads"):
+                stats[key] = value.strip()
+    return stats
+
+
+def start_server(mode, port, db_path):
+    env = dict(os.environ, SOCKETIO_ASYNC_MODE=mode, PORT=str(port), HOST=HOST, DATABASE_NAME=db_path)
+    process = subprocess.Popen(
+        [sys.executable, "wsgi.py"], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(60):
+        try:
+            requests.get(f"http://{HOST}:{port}/dashboard/stats", timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.5)
+    process.kill()
+    raise RuntimeError(f"backend ({mode}) did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["threading", "eventlet", "gevent"])
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--hold", type=float, default=10, help="seconds to hold every socket open")
+    parser.add_argument("--ramp", type=int, default=100, help="concurrent handshakes while ramping up")
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    print(f"{'mode':<10} {'target':>7} {'connected':>10} {'alive':>7} {'errors':>7} {'ramp s':>7} {'threads':>8} {'rss':>12}")
+    for mode in args.modes:
+        if mode != "threading":
+            try:
+                __import__(mode)
+            except ImportError:
+                print(f"{mode:<10} skipped (package not installed)")
+                continue
+        with tempfile.TemporaryDirectory() as tmp:
+            server = start_server(mode, args.port, os.path.join(tmp, "bench.db"))
+            try:
+                connected, alive, errors, ramp_seconds, stats = asyncio.run(hold_connections(
+                    args.port, args.connections, args.hold, args.ramp, lambda: server_stats(server.pid)
+                ))
+            finally:
+                server.terminate()
+                server.wait()
+        print(f"{mode:<10} {args.connections:>7} {connected:>10} {alive:>7} {errors:>7} {ramp_seconds:>7.1f} "
+              f"{stats.get('Threads', '?'):>8} {stats.get('VmRSS', '?'):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+bench_sqlite_profile.py - เปรียบเทียบ write throughput ของ SQLite
+ระหว่างค่า default (rollback journal) กับ engine profile ใน Config.SQLITE_PRAGMAS
+
+การรัน:
+python "FINAL PROJECT/benchmarks/bench_sqlite_profile.py" --threads 8 --requests 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import app as backend  # noqa: E402
+
+
+def build_app(db_path, profile_enabled):
+    backend.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{db_path}"
+    backend.Config.SQLITE_PROFILE_ENABLED = profile_enabled
+    app, socketio = backend.create_app()
+    with app.app_context():
+        backend.db.create_all()
+        resident = backend.User(
+            name="Bench Resident",
+            username="bench_resident",
+            password_hash="x",
+            role="resident",
+            status="approved"
+        )
+        backend.db.session.add(resident)
+        backend.db.session.commit()
+        return app, resident.user_id
+
+
+def run_writers(app, user_id, threads, requests_per_thread):
+    client = app.test_client()
+    results = {"ok": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        ok = errors = 0
+        for i in range(requests_per_thread):
+            response = client.post("/repair-requests", json={
+                "user_id": user_id,
+                "title": f"bench {worker_id}-{i}",
+                "category": "ไฟฟ้า"
+            })
+            if response.status_code == 201:
+                ok += 1
+            else:
+                errors += 1
+        with lock:
+            results["ok"] += ok
+            results["errors"] += errors
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per thread")
+    args = parser.parse_args()
+
+    print(f"{'profile':<10} {'ok':>7} {'errors':>7} {'seconds':>9} {'writes/s':>10}")
+    for label, enabled in (("default", False), ("tuned", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            app, user_id = build_app(os.path.join(tmp, "bench.db"), enabled)
+            results, elapsed = run_writers(app, user_id, args.threads, args.requests)
+            with app.app_context():
+                backend.db.engine.dispose()
+        print(f"{label:<10} {results['ok']:>7} {results['errors']:>7} {elapsed:>9.2f} {results['ok'] / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+bench_user_import.py - เปรียบเทียบการเพิ่มลูกบ้านทั้งโครงการทีละคนผ่าน POST /users
+กับการนำเข้าครั้งเดียวผ่าน POST /users/import (hash รหัสผ่านบน process pool + bulk insert)
+
+การรัน:
+python "FINAL PROJECT/benchmarks/bench_user_import.py" --houses 800 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import app as backend  # noqa: E402
+
+
+def residents(prefix, count):
+    return [{
+        "name": f"ลูกบ้าน {n}",
+        "username": f"{prefix}_{n}",
+        "password": f"Pass@{n:04d}",
+        "address": f"99/{n}",
+        "role": "resident",
+        "status": "approved"
+    } for n in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--houses", type=int, default=800)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        backend.Config.PASSWORD_HASH_WORKERS = args.workers
+        app, socketio = backend.create_app()
+        backend.init_database(app)
+        client = app.test_client()
+        token = client.post("/login", json={"username": "admin", "password": "admin123"}).json["token"]
+        headers = {"Authorization": f"Bearer {token}"}  # /users/import และการสร้างบัญชีที่อนุมัติแล้วต้องใช้ token ของ admin
+
+        started = time.perf_counter()
+        for user in residents("single", args.houses):
+            assert client.post("/users", json=user, headers=headers).status_code == 201
+        single = time.perf_counter() - started
+
+        # สร้าง process pool ก่อนจับเวลา เพื่อไม่นับเวลา spawn worker
+        client.post("/users/import", json={"users": residents("warmup", args.workers * 2)}, headers=headers)
+        started = time.perf_counter()
+        response = client.post("/users/import", json={"users": residents("bulk", args.houses)}, headers=headers)
+        bulk = time.perf_counter() - started
+        assert response.status_code == 201 and response.json["created"] == args.houses
+
+        print(f"houses={args.houses} workers={args.workers} cpus={os.cpu_count()}")
+        print(f"{'method':<22} {'seconds':>8} {'users/s':>9}")
+        print(f"{'POST /users x N':<22} {single:>8.2f} {args.houses / single:>9.0f}")
+        print(f"{'POST /users/import':<22} {bulk:>8.2f} {args.houses / bulk:>9.0f}")
+
+        with app.app_context():
+            backend.db.engine.dispose()
+        if "write_queue" in app.extensions:
+            app.extensions["write_queue"].engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,16 +10,20 @@ pip install pytest requests pytest-html
 pytest test_backend.py -v --html=report.html --self-contained-html
 """
 
+import base64
 import pytest
 import requests
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import Path
 
 # ================================
 # Configuration
 # ================================
 BASE_URL = "http://localhost:5000"
+BACKEND_DIR = Path(__file__).resolve().parents[3] / "FINAL PROJECT" / "backend"
 
 TEST_DATA = {
     "admin": {
@@ -49,8 +53,13 @@ def resident_login():
     assert response.status_code == 200, "Resident login failed"
     return response.json()
 
+@pytest.fixture(scope="session")
+def admin_headers(admin_login):
+    """Authorization header ของ Admin สำหรับ API ที่ต้องใช้สิทธิ์ผู้ดูแล"""
+    return {"Authorization": f"Bearer {admin_login['token']}"}
+
 @pytest.fixture
-def test_user(admin_login):
+def test_user(admin_login, admin_headers):
     """สร้าง test user และ cleanup หลังใช้งาน"""
     username = f"testuser_{int(time.time())}"
     user_data = {
@@ -64,7 +73,7 @@ def test_user(admin_login):
         "status": "approved"
     }
     
-    response = requests.post(f"{BASE_URL}/users", json=user_data)
+    response = requests.post(f"{BASE_URL}/users", json=user_data, headers=admin_headers)
     assert response.status_code == 201
     user = response.json()["user"]
     
@@ -72,7 +81,7 @@ def test_user(admin_login):
     
     # Cleanup
     try:
-        requests.delete(f"{BASE_URL}/users/{user['user_id']}")
+        requests.delete(f"{BASE_URL}/users/{user['user_id']}", headers=admin_headers)
     except:
         pass
 
@@ -136,7 +145,7 @@ class TestAuthentication:
 class TestUserManagement:
     """Test User Management API"""
     
-    def test_create_user(self):
+    def test_create_user(self, admin_headers):
         """TC-006: สร้าง user ใหม่"""
         username = f"newuser_{int(time.time())}"
         user_data = {
@@ -156,7 +165,7 @@ class TestUserManagement:
         print("✓ TC-006 PASSED: User created")
         
         # Cleanup
-        requests.delete(f"{BASE_URL}/users/{data['user']['user_id']}")
+        requests.delete(f"{BASE_URL}/users/{data['user']['user_id']}", headers=admin_headers)
     
     def test_create_user_duplicate_username(self):
         """TC-007: สร้าง user ด้วย username ซ้ำ"""
@@ -193,7 +202,7 @@ class TestUserManagement:
         assert data["user_id"] == user_id
         print("✓ TC-009 PASSED: User retrieved by ID")
     
-    def test_update_user(self, test_user):
+    def test_update_user(self, test_user, admin_headers):
         """TC-010: แก้ไขข้อมูล user"""
         updated_data = {
             "name": "Updated Name",
@@ -202,7 +211,8 @@ class TestUserManagement:
         
         response = requests.put(
             f"{BASE_URL}/users/{test_user['user_id']}",
-            json=updated_data
+            json=updated_data,
+            headers=admin_headers
         )
         
         assert response.status_code == 200
@@ -210,7 +220,7 @@ class TestUserManagement:
         assert data["user"]["name"] == updated_data["name"]
         print("✓ TC-010 PASSED: User updated")
     
-    def test_delete_user(self):
+    def test_delete_user(self, admin_headers):
         """TC-011: ลบ user"""
         username = f"todelete_{int(time.time())}"
         create_response = requests.post(
@@ -223,7 +233,7 @@ class TestUserManagement:
         )
         user_id = create_response.json()["user"]["user_id"]
         
-        response = requests.delete(f"{BASE_URL}/users/{user_id}")
+        response = requests.delete(f"{BASE_URL}/users/{user_id}", headers=admin_headers)
         
         assert response.status_code == 200
         assert "deleted successfully" in response.json()["message"]
@@ -238,7 +248,7 @@ class TestUserManagement:
 class TestAnnouncements:
     """Test Announcements API"""
     
-    def test_create_announcement(self, admin_login):
+    def test_create_announcement(self, admin_login, admin_headers):
         """TC-012: สร้างประกาศใหม่"""
         ann_data = {
             "title": "ประกาศทดสอบ",
@@ -255,7 +265,7 @@ class TestAnnouncements:
         assert data["announcement"]["title"] == ann_data["title"]
         print("✓ TC-012 PASSED: Announcement created")
         
-        requests.delete(f"{BASE_URL}/announcements/{data['announcement']['announcement_id']}")
+        requests.delete(f"{BASE_URL}/announcements/{data['announcement']['announcement_id']}", headers=admin_headers)
     
     def test_get_all_announcements(self):
         """TC-013: ดึงประกาศทั้งหมด"""
@@ -266,7 +276,7 @@ class TestAnnouncements:
         assert isinstance(data, list)
         print(f"✓ TC-013 PASSED: Retrieved {len(data)} announcements")
     
-    def test_update_announcement(self, admin_login):
+    def test_update_announcement(self, admin_login, admin_headers):
         """TC-014: แก้ไขประกาศ"""
         create_response = requests.post(
             f"{BASE_URL}/announcements",
@@ -280,16 +290,17 @@ class TestAnnouncements:
         
         response = requests.put(
             f"{BASE_URL}/announcements/{ann_id}",
-            json={"title": "Updated", "content": "Updated Content"}
+            json={"title": "Updated", "content": "Updated Content"},
+            headers=admin_headers
         )
         
         assert response.status_code == 200
         assert response.json()["announcement"]["title"] == "Updated"
         print("✓ TC-014 PASSED: Announcement updated")
         
-        requests.delete(f"{BASE_URL}/announcements/{ann_id}")
+        requests.delete(f"{BASE_URL}/announcements/{ann_id}", headers=admin_headers)
     
-    def test_delete_announcement(self, admin_login):
+    def test_delete_announcement(self, admin_login, admin_headers):
         """TC-015: ลบประกาศ"""
         create_response = requests.post(
             f"{BASE_URL}/announcements",
@@ -301,7 +312,7 @@ class TestAnnouncements:
         )
         ann_id = create_response.json()["announcement"]["announcement_id"]
         
-        response = requests.delete(f"{BASE_URL}/announcements/{ann_id}")
+        response = requests.delete(f"{BASE_URL}/announcements/{ann_id}", headers=admin_headers)
         
         assert response.status_code == 200
         assert "deleted successfully" in response.json()["message"]
@@ -340,7 +351,7 @@ class TestRepairRequests:
         assert isinstance(data, list)
         print(f"✓ TC-017 PASSED: Retrieved {len(data)} repair requests")
     
-    def test_update_repair_status(self, resident_login):
+    def test_update_repair_status(self, resident_login, admin_headers):
         """TC-018: อัปเดตสถานะงานซ่อม"""
         create_response = requests.post(
             f"{BASE_URL}/repair-requests",
@@ -355,7 +366,8 @@ class TestRepairRequests:
         
         response = requests.put(
             f"{BASE_URL}/repair-requests/{request_id}",
-            json={"status": "in_progress"}
+            json={"status": "in_progress"},
+            headers=admin_headers
         )
         
         assert response.status_code == 200
@@ -382,7 +394,7 @@ class TestRepairRequests:
 class TestBookingRequests:
     """Test Booking Requests API"""
     
-    def test_create_booking(self, resident_login):
+    def test_create_booking(self, resident_login, admin_headers):
         """TC-020: จองพื้นที่ใหม่"""
         tomorrow = (datetime.now() + timedelta(days=1)).date()
         booking_data = {
@@ -402,7 +414,7 @@ class TestBookingRequests:
         assert data["booking"]["status"] == "pending"
         print("✓ TC-020 PASSED: Booking created")
         
-        requests.delete(f"{BASE_URL}/booking-requests/{data['booking']['booking_id']}")
+        requests.delete(f"{BASE_URL}/booking-requests/{data['booking']['booking_id']}", headers=admin_headers)
     
     def test_get_all_bookings(self):
         """TC-021: ดึงรายการจองทั้งหมด"""
@@ -413,7 +425,7 @@ class TestBookingRequests:
         assert isinstance(data, list)
         print(f"✓ TC-021 PASSED: Retrieved {len(data)} bookings")
     
-    def test_booking_conflict_detection(self, resident_login):
+    def test_booking_conflict_detection(self, resident_login, admin_headers):
         """TC-022: ตรวจจับการจองซ้อนทับ"""
         tomorrow = (datetime.now() + timedelta(days=1)).date()
         
@@ -433,7 +445,8 @@ class TestBookingRequests:
         
         requests.put(
             f"{BASE_URL}/booking-requests/{booking1_id}",
-            json={"status": "approved"}
+            json={"status": "approved"},
+            headers=admin_headers
         )
         
         response = requests.post(
@@ -452,9 +465,9 @@ class TestBookingRequests:
         assert "already booked" in response.json()["message"].lower()
         print("✓ TC-022 PASSED: Conflict detected")
         
-        requests.delete(f"{BASE_URL}/booking-requests/{booking1_id}")
+        requests.delete(f"{BASE_URL}/booking-requests/{booking1_id}", headers=admin_headers)
     
-    def test_update_booking_status(self, resident_login):
+    def test_update_booking_status(self, resident_login, admin_headers):
         """TC-023: อัปเดตสถานะการจอง"""
         tomorrow = (datetime.now() + timedelta(days=1)).date()
         
@@ -473,16 +486,17 @@ class TestBookingRequests:
         
         response = requests.put(
             f"{BASE_URL}/booking-requests/{booking_id}",
-            json={"status": "approved"}
+            json={"status": "approved"},
+            headers=admin_headers
         )
         
         assert response.status_code == 200
         assert response.json()["booking"]["status"] == "approved"
         print("✓ TC-023 PASSED: Booking status updated")
         
-        requests.delete(f"{BASE_URL}/booking-requests/{booking_id}")
+        requests.delete(f"{BASE_URL}/booking-requests/{booking_id}", headers=admin_headers)
     
-    def test_delete_booking(self, resident_login):
+    def test_delete_booking(self, resident_login, admin_headers):
         """TC-024: ยกเลิกการจอง"""
         tomorrow = (datetime.now() + timedelta(days=1)).date()
         
@@ -499,7 +513,7 @@ class TestBookingRequests:
         )
         booking_id = create_response.json()["booking"]["booking_id"]
         
-        response = requests.delete(f"{BASE_URL}/booking-requests/{booking_id}")
+        response = requests.delete(f"{BASE_URL}/booking-requests/{booking_id}", headers=admin_headers)
         
         assert response.status_code == 200
         assert "deleted successfully" in response.json()["message"]
@@ -511,7 +525,7 @@ class TestBookingRequests:
 class TestBills:
     """Test Bills API"""
     
-    def test_create_bill(self, admin_login):
+    def test_create_bill(self, admin_login, admin_headers):
         """TC-025: สร้างบิลใหม่"""
         next_month = (datetime.now() + timedelta(days=30)).date()
         bill_data = {
@@ -530,7 +544,7 @@ class TestBills:
         assert data["bill"]["status"] == "unpaid"
         print("✓ TC-025 PASSED: Bill created")
         
-        requests.delete(f"{BASE_URL}/bills/{data['bill']['bill_id']}")
+        requests.delete(f"{BASE_URL}/bills/{data['bill']['bill_id']}", headers=admin_headers)
     
     def test_get_all_bills(self):
         """TC-026: ดึงบิลทั้งหมด"""
@@ -551,7 +565,7 @@ class TestBills:
         assert isinstance(data, list)
         print(f"✓ TC-027 PASSED: Retrieved {len(data)} bills for user")
     
-    def test_update_bill(self, admin_login):
+    def test_update_bill(self, admin_login, admin_headers):
         """TC-028: แก้ไขบิล"""
         next_month = (datetime.now() + timedelta(days=30)).date()
         
@@ -569,16 +583,17 @@ class TestBills:
         
         response = requests.put(
             f"{BASE_URL}/bills/{bill_id}",
-            json={"item_name": "Updated", "amount": 200.00}
+            json={"item_name": "Updated", "amount": 200.00},
+            headers=admin_headers
         )
         
         assert response.status_code == 200
         assert response.json()["bill"]["item_name"] == "Updated"
         print("✓ TC-028 PASSED: Bill updated")
         
-        requests.delete(f"{BASE_URL}/bills/{bill_id}")
+        requests.delete(f"{BASE_URL}/bills/{bill_id}", headers=admin_headers)
     
-    def test_delete_bill(self, admin_login):
+    def test_delete_bill(self, admin_login, admin_headers):
         """TC-029: ลบบิล"""
         next_month = (datetime.now() + timedelta(days=30)).date()
         
@@ -594,7 +609,7 @@ class TestBills:
         )
         bill_id = create_response.json()["bill"]["bill_id"]
         
-        response = requests.delete(f"{BASE_URL}/bills/{bill_id}")
+        response = requests.delete(f"{BASE_URL}/bills/{bill_id}", headers=admin_headers)
         
         assert response.status_code == 200
         assert "deleted successfully" in response.json()["message"]
@@ -606,7 +621,7 @@ class TestBills:
 class TestPayments:
     """Test Payments API"""
     
-    def test_create_payment(self, resident_login, admin_login):
+    def test_create_payment(self, resident_login, admin_login, admin_headers):
         """TC-030: สร้างการชำระเงิน"""
         next_month = (datetime.now() + timedelta(days=30)).date()
         
@@ -637,7 +652,7 @@ class TestPayments:
         assert data["payment"]["status"] == "pending"
         print("✓ TC-030 PASSED: Payment created")
         
-        requests.delete(f"{BASE_URL}/bills/{bill_id}")
+        requests.delete(f"{BASE_URL}/bills/{bill_id}", headers=admin_headers)
     
     def test_get_all_payments(self):
         """TC-031: ดึงการชำระเงินทั้งหมด (Admin)"""
@@ -659,7 +674,7 @@ class TestPayments:
             assert payment["user_id"] == user_id
         print("✓ TC-032 PASSED: User payments retrieved")
     
-    def test_approve_payment(self, resident_login, admin_login):
+    def test_approve_payment(self, resident_login, admin_login, admin_headers):
         """TC-033: Admin อนุมัติการชำระเงิน"""
         next_month = (datetime.now() + timedelta(days=30)).date()
         
@@ -687,7 +702,7 @@ class TestPayments:
         )
         payment_id = payment_response.json()["payment"]["payment_id"]
         
-        response = requests.put(f"{BASE_URL}/payments/approve/{payment_id}")
+        response = requests.put(f"{BASE_URL}/payments/approve/{payment_id}", headers=admin_headers)
         
         assert response.status_code == 200
         assert response.json()["payment"]["status"] == "paid"
@@ -698,9 +713,9 @@ class TestPayments:
         bill = next((b for b in bills if b["bill_id"] == bill_id), None)
         assert bill["status"] == "paid"
         
-        requests.delete(f"{BASE_URL}/bills/{bill_id}")
+        requests.delete(f"{BASE_URL}/bills/{bill_id}", headers=admin_headers)
     
-    def test_reject_payment(self, resident_login, admin_login):
+    def test_reject_payment(self, resident_login, admin_login, admin_headers):
         """TC-034: Admin ปฏิเสธการชำระเงิน"""
         next_month = (datetime.now() + timedelta(days=30)).date()
         
@@ -728,7 +743,7 @@ class TestPayments:
         )
         payment_id = payment_response.json()["payment"]["payment_id"]
         
-        response = requests.put(f"{BASE_URL}/payments/reject/{payment_id}")
+        response = requests.put(f"{BASE_URL}/payments/reject/{payment_id}", headers=admin_headers)
         
         assert response.status_code == 200
         assert response.json()["payment"]["status"] == "rejected"
@@ -739,7 +754,7 @@ class TestPayments:
         bill = next((b for b in bills if b["bill_id"] == bill_id), None)
         assert bill["status"] == "unpaid"
         
-        requests.delete(f"{BASE_URL}/bills/{bill_id}")
+        requests.delete(f"{BASE_URL}/bills/{bill_id}", headers=admin_headers)
 
 # ================================
 # TEST CLASS 8: FILE UPLOADS
@@ -822,7 +837,7 @@ class TestFileUploads:
 class TestIntegrationWorkflows:
     """Test Complete Workflows"""
     
-    def test_complete_repair_workflow(self, resident_login, admin_login):
+    def test_complete_repair_workflow(self, resident_login, admin_login, admin_headers):
         """TC-039: Workflow การแจ้งซ่อมแบบสมบูรณ์"""
         # 1. Resident แจ้งซ่อม
         repair_response = requests.post(
@@ -841,7 +856,8 @@ class TestIntegrationWorkflows:
         # 2. Admin รับเรื่อง
         accept_response = requests.put(
             f"{BASE_URL}/repair-requests/{request_id}",
-            json={"status": "in_progress"}
+            json={"status": "in_progress"},
+            headers=admin_headers
         )
         assert accept_response.status_code == 200
         assert accept_response.json()["request"]["status"] == "in_progress"
@@ -850,7 +866,8 @@ class TestIntegrationWorkflows:
         # 3. Admin ทำเสร็จ
         complete_response = requests.put(
             f"{BASE_URL}/repair-requests/{request_id}",
-            json={"status": "completed"}
+            json={"status": "completed"},
+            headers=admin_headers
         )
         assert complete_response.status_code == 200
         assert complete_response.json()["request"]["status"] == "completed"
@@ -858,7 +875,7 @@ class TestIntegrationWorkflows:
         
         print("✓ TC-039 PASSED: Complete repair workflow")
     
-    def test_complete_booking_workflow(self, resident_login, admin_login):
+    def test_complete_booking_workflow(self, resident_login, admin_login, admin_headers):
         """TC-040: Workflow การจองแบบสมบูรณ์"""
         tomorrow = (datetime.now() + timedelta(days=1)).date()
         
@@ -882,7 +899,8 @@ class TestIntegrationWorkflows:
         # 2. Admin อนุมัติ
         approve_response = requests.put(
             f"{BASE_URL}/booking-requests/{booking_id}",
-            json={"status": "approved"}
+            json={"status": "approved"},
+            headers=admin_headers
         )
         assert approve_response.status_code == 200
         assert approve_response.json()["booking"]["status"] == "approved"
@@ -890,14 +908,15 @@ class TestIntegrationWorkflows:
         
         # 3. Resident ยกเลิก
         cancel_response = requests.delete(
-            f"{BASE_URL}/booking-requests/{booking_id}"
+            f"{BASE_URL}/booking-requests/{booking_id}",
+            headers=admin_headers
         )
         assert cancel_response.status_code == 200
         print("  Step 3: Resident ยกเลิก ✓")
         
         print("✓ TC-040 PASSED: Complete booking workflow")
     
-    def test_complete_payment_workflow(self, resident_login, admin_login):
+    def test_complete_payment_workflow(self, resident_login, admin_login, admin_headers):
         """TC-041: Workflow การชำระเงินแบบสมบูรณ์"""
         next_month = (datetime.now() + timedelta(days=30)).date()
         
@@ -933,7 +952,8 @@ class TestIntegrationWorkflows:
         
         # 3. Admin อนุมัติ
         approve_response = requests.put(
-            f"{BASE_URL}/payments/approve/{payment_id}"
+            f"{BASE_URL}/payments/approve/{payment_id}",
+            headers=admin_headers
         )
         assert approve_response.status_code == 200
         assert approve_response.json()["payment"]["status"] == "paid"
@@ -949,9 +969,9 @@ class TestIntegrationWorkflows:
         print("✓ TC-041 PASSED: Complete payment workflow")
         
         # Cleanup
-        requests.delete(f"{BASE_URL}/bills/{bill_id}")
+        requests.delete(f"{BASE_URL}/bills/{bill_id}", headers=admin_headers)
     
-    def test_user_registration_workflow(self, admin_login):
+    def test_user_registration_workflow(self, admin_login, admin_headers):
         """TC-042: Workflow การลงทะเบียนและอนุมัติ"""
         new_username = f"newresident_{int(time.time())}"
         
@@ -988,7 +1008,8 @@ class TestIntegrationWorkflows:
         # 4. Admin อนุมัติ
         approve_response = requests.put(
             f"{BASE_URL}/users/{user_id}",
-            json={"status": "approved"}
+            json={"status": "approved"},
+            headers=admin_headers
         )
         assert approve_response.status_code == 200
         print("  Step 4: Admin อนุมัติ ✓")
@@ -1004,7 +1025,1224 @@ class TestIntegrationWorkflows:
         print("✓ TC-042 PASSED: User registration workflow")
         
         # Cleanup
-        requests.delete(f"{BASE_URL}/users/{user_id}")
+        requests.delete(f"{BASE_URL}/users/{user_id}", headers=admin_headers)
+
+# ================================
+# TEST CLASS 10: LIST PERFORMANCE
+# ================================
+class TestPagination:
+    """Test Cursor Pagination and query counts on list endpoints"""
+    
+    def test_paginate_bills_with_cursor(self, admin_login, admin_headers):
+        """TC-043: แบ่งหน้ารายการบิลด้วย cursor"""
+        next_month = (datetime.now() + timedelta(days=30)).date()
+        bill_ids = []
+        for i in range(3):
+            create_response = requests.post(
+                f"{BASE_URL}/bills",
+                json={
+                    "item_name": f"Paged Bill {i}",
+                    "amount": 100 + i,
+                    "due_date": next_month.isoformat(),
+                    "recipient_id": "all",
+                    "issued_by_user_id": admin_login["user_id"]
+                }
+            )
+            bill_ids.append(create_response.json()["bill"]["bill_id"])
+        
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = requests.get(f"{BASE_URL}/bills", params=params)
+            assert response.status_code == 200
+            data = response.json()
+            assert len(data["items"]) <= 2
+            seen.extend(bill["bill_id"] for bill in data["items"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        
+        full_list = requests.get(f"{BASE_URL}/bills").json()
+        assert seen == [bill["bill_id"] for bill in full_list]
+        assert set(bill_ids) <= set(seen)
+        print(f"✓ TC-043 PASSED: Paged through {len(seen)} bills")
+        
+        for bill_id in bill_ids:
+            requests.delete(f"{BASE_URL}/bills/{bill_id}", headers=admin_headers)
+    
+    def test_invalid_cursor(self):
+        """TC-044: ส่ง cursor ที่ไม่ถูกต้อง ทั้งที่ decode ไม่ได้และที่ค่าข้างในผิดชนิดกับคอลัมน์"""
+        response = requests.get(f"{BASE_URL}/payments", params={"cursor": "not-a-cursor"})
+        
+        assert response.status_code == 400
+        assert "Invalid cursor" in response.json()["message"]
+        
+        # payments เรียงด้วย (payment_date, payment_id)
+        for values in ([123, "PAY-1"], [{"at": 1}, "PAY-1"], ["2024-01-01T00:00:00", 5], ["2024-01-01T00:00:00", [1]]):
+            tampered = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = requests.get(f"{BASE_URL}/payments", params={"cursor": tampered})
+            assert response.status_code == 400, values
+            assert "Invalid cursor" in response.json()["message"]
+        print("✓ TC-044 PASSED: Invalid cursor rejected")
+    
+    def test_list_query_count_is_constant(self, resident_login, admin_login, admin_headers):
+        """TC-045: จำนวน query ของ list endpoint ไม่เพิ่มตามจำนวนแถว"""
+        endpoints = ["users", "announcements", "repair-requests", "booking-requests", "bills", "payments"]
+        # อุ่น entity cache ก่อน เพื่อให้ทั้งสองรอบวัดจาก cache สถานะเดียวกัน
+        for ep in endpoints:
+            requests.get(f"{BASE_URL}/{ep}")
+        before ={ep: requests.get(f"{BASE_URL}/{ep}").headers["X-Query-Count"] for ep in endpoints}
+        
+        next_month = (datetime.now() + timedelta(days=30)).date()
+        bill_response = requests.post(
+            f"{BASE_URL}/bills",
+            json={
+                "item_name": "Query Count Bill",
+                "amount": 10,
+                "due_date": next_month.isoformat(),
+                "recipient_id": resident_login["user_id"],
+                "issued_by_user_id": admin_login["user_id"]
+            }
+        )
+        bill_id = bill_response.json()["bill"]["bill_id"]
+        requests.post(
+            f"{BASE_URL}/payments",
+            json={
+                "bill_id": bill_id,
+                "user_id": resident_login["user_id"],
+                "amount": 10,
+                "payment_method": "transfer"
+            }
+        )
+        
+        after = {ep: requests.get(f"{BASE_URL}/{ep}").headers["X-Query-Count"] for ep in endpoints}
+        assert after == before
+        print(f"✓ TC-045 PASSED: Query counts stay constant {after}")
+        
+        requests.delete(f"{BASE_URL}/bills/{bill_id}", headers=admin_headers)
+
+# ================================
+# TEST CLASS 11: DASHBOARD & REPORTS
+# ================================
+class TestDashboard:
+    """Test Dashboard Statistics and Report APIs"""
+    
+    def test_dashboard_stats_follow_repairs(self, resident_login, admin_headers):
+        """TC-046: สถิติ dashboard อัปเดตตามงานซ่อม"""
+        before = requests.get(f"{BASE_URL}/dashboard/stats").json()
+        
+        create_response = requests.post(
+            f"{BASE_URL}/repair-requests",
+            json={
+                "user_id": resident_login["user_id"],
+                "title": "ประปารั่ว",
+                "category": "ประปา"
+            }
+        )
+        request_id = create_response.json()["request"]["request_id"]
+        
+        pending = requests.get(f"{BASE_URL}/dashboard/stats").json()
+        assert pending["pending_repairs"] == before["pending_repairs"] + 1
+        assert pending["recent_activities"][0]["request_id"] == request_id
+        
+        requests.put(f"{BASE_URL}/repair-requests/{request_id}", json={"status": "completed"}, headers=admin_headers)
+        
+        completed = requests.get(f"{BASE_URL}/dashboard/stats").json()
+        assert completed["pending_repairs"] == before["pending_repairs"]
+        assert completed["completed_repairs"] == before["completed_repairs"] + 1
+        print("✓ TC-046 PASSED: Dashboard stats updated")
+    
+    def test_monthly_report_counts_approved_payment(self, resident_login, admin_login, admin_headers):
+        """TC-047: รายงานรายเดือนรวมยอดการชำระเงินที่อนุมัติ"""
+        month_index = datetime.utcnow().month - 1
+        before = requests.get(f"{BASE_URL}/reports/monthly").json()
+        
+        next_month = (datetime.now() + timedelta(days=30)).date()
+        bill_response = requests.post(
+            f"{BASE_URL}/bills",
+            json={
+                "item_name": "Report Bill",
+                "amount": 750,
+                "due_date": next_month.isoformat(),
+                "recipient_id": resident_login["user_id"],
+                "issued_by_user_id": admin_login["user_id"]
+            }
+        )
+        bill_id = bill_response.json()["bill"]["bill_id"]
+        payment_response = requests.post(
+            f"{BASE_URL}/payments",
+            json={
+                "bill_id": bill_id,
+                "user_id": resident_login["user_id"],
+                "amount": 750,
+                "payment_method": "transfer"
+            }
+        )
+        payment_id = payment_response.json()["payment"]["payment_id"]
+        requests.put(f"{BASE_URL}/payments/approve/{payment_id}", headers=admin_headers)
+        
+        after = requests.get(f"{BASE_URL}/reports/monthly").json()
+        assert list(after["categories"]) == ["income"]
+        assert len(after["categories"]["income"]) == 12
+        assert after["categories"]["income"][month_index] == before["categories"]["income"][month_index] + 750
+        print("✓ TC-047 PASSED: Monthly report updated")
+
+# ================================
+# TEST CLASS 12: BOOKING AVAILABILITY
+# ================================
+class TestBookingAvailability:
+    """Test Booking Availability API"""
+    
+    def test_availability_excludes_booked_slot(self, resident_login, admin_headers):
+        """TC-048: ช่วงเวลาว่างไม่รวมช่วงที่ถูกจองแล้ว"""
+        day = (datetime.now() + timedelta(days=2)).date()
+        booking = requests.post(
+            f"{BASE_URL}/booking-requests",
+            json={
+                "user_id": resident_login["user_id"],
+                "location": "คลับเฮ้าส์",
+                "date": day.isoformat(),
+                "start_time": "13:00",
+                "end_time": "15:00",
+                "purpose": "ประชุม"
+            }
+        )
+        booking_id = booking.json()["booking"]["booking_id"]
+        
+        response = requests.get(
+            f"{BASE_URL}/booking-requests/availability",
+            params={"location": "คลับเฮ้าส์", "date": day.isoformat()}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert any(b["booking_id"] == booking_id for b in data["booked"])
+        for slot in data["free_slots"]:
+            assert slot["end_time"] <= "13:00" or slot["start_time"] >= "15:00"
+        print("✓ TC-048 PASSED: Availability excludes booked slot")
+        
+        requests.delete(f"{BASE_URL}/booking-requests/{booking_id}", headers=admin_headers)
+        
+        after_delete = requests.get(
+            f"{BASE_URL}/booking-requests/availability",
+            params={"location": "คลับเฮ้าส์", "date": day.isoformat()}
+        ).json()
+        assert all(b["booking_id"] != booking_id for b in after_delete["booked"])
+    
+    def test_availability_requires_params(self):
+        """TC-049: เรียก availability โดยไม่ระบุ location/date"""
+        response = requests.get(f"{BASE_URL}/booking-requests/availability")
+        
+        assert response.status_code == 400
+        print("✓ TC-049 PASSED: Missing params rejected")
+    
+    def test_reversed_time_range_rejected(self, resident_login, admin_headers):
+        """TC-086: จองโดยเวลาสิ้นสุดไม่หลังเวลาเริ่ม ทั้งตอนสร้างและแก้ไข ต้องได้ 400"""
+        booking = {
+            "user_id": resident_login["user_id"],
+            "location": "สนามแบดมินตัน",
+            "date": (datetime.now() + timedelta(days=90)).date().isoformat(),
+            "start_time": "13:00",
+            "end_time": "12:00"
+        }
+        assert requests.post(f"{BASE_URL}/booking-requests", json=booking).status_code == 400
+        assert requests.post(f"{BASE_URL}/booking-requests", json={**booking, "end_time": "13:00"}).status_code == 400
+        
+        booking_id = requests.post(
+            f"{BASE_URL}/booking-requests", json={**booking, "end_time": "14:00"}
+        ).json()["booking"]["booking_id"]
+        update = requests.put(f"{BASE_URL}/booking-requests/{booking_id}", json={"start_time": "15:00"}, headers=admin_headers)
+        
+        assert update.status_code == 400
+        print("✓ TC-086 PASSED: Reversed time range rejected")
+        
+        requests.delete(f"{BASE_URL}/booking-requests/{booking_id}", headers=admin_headers)
+    
+    def test_index_sees_bookings_from_other_worker(self, tmp_path, monkeypatch):
+        """TC-095: สอง app บนฐานข้อมูลเดียวกัน (เหมือนสอง worker) การจองจากตัวหนึ่งต้องเห็นในอีกตัวที่โหลด index ไว้แล้ว"""
+        monkeypatch.syspath_prepend(str(BACKEND_DIR))
+        backend = pytest.importorskip("app")
+        settings = {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'workers.db'}",
+            "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+            "CHUNKED_UPLOAD_FOLDER": str(tmp_path / "uploads_partial"),
+            "UPLOAD_GC_INTERVAL": 0,
+            "PASSWORD_HASH_WORKERS": 1,
+        }
+        for name, value in settings.items():
+            monkeypatch.setattr(backend.Config, name, value)
+        first, _ = backend.create_app()
+        backend.init_database(first)
+        second, _ = backend.create_app()
+        day = (datetime.now() + timedelta(days=120)).date().isoformat()
+        availability = {"location": "สนามเทนนิส", "date": day}
+        
+        try:
+            with first.app_context():
+                user_id = backend.User.query.filter_by(username="resident").one().user_id
+            # ให้ worker ที่สองโหลด key นี้ไว้ก่อนมีการจอง
+            assert second.test_client().get("/booking-requests/availability", query_string=availability).json["booked"] == []
+            
+            booking = {"user_id": user_id, **availability, "start_time": "09:00", "end_time": "10:00"}
+            created = first.test_client().post("/booking-requests", json=booking)
+            assert created.status_code == 201
+            
+            booked = second.test_client().get("/booking-requests/availability", query_string=availability).json["booked"]
+            assert [b["booking_id"] for b in booked] == [created.json["booking"]["booking_id"]]
+            assert second.test_client().post("/booking-requests", json={**booking, "start_time": "09:30"}).status_code == 409
+        finally:
+            for app in (first, second):
+                app.extensions["password_hasher"].shutdown()
+        print("✓ TC-095 PASSED: Booking index reloads after another worker books")
+
+# ================================
+# TEST CLASS 13: CONCURRENT WRITES
+# ================================
+class TestConcurrentWrites:
+    """Test Concurrent Write Handling"""
+    
+    def test_concurrent_repair_requests(self, resident_login):
+        """TC-050: ส่งคำร้องแจ้งซ่อมพร้อมกันหลายรายการ"""
+        def submit(i):
+            return requests.post(
+                f"{BASE_URL}/repair-requests",
+                json={
+                    "user_id": resident_login["user_id"],
+                    "title": f"Concurrent repair {i}",
+                    "category": "ไฟฟ้า"
+                }
+            )
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(submit, range(16)))
+        
+        assert all(r.status_code == 201 for r in responses)
+        repair_ids = {r.json()["request"]["request_id"] for r in responses}
+        assert len(repair_ids) == 16
+        print("✓ TC-050 PASSED: Concurrent writes all committed")
+    
+    def test_concurrent_booking_same_slot(self, resident_login, admin_headers):
+        """TC-051: จองช่วงเวลาเดียวกันพร้อมกัน ต้องสำเร็จเพียงรายการเดียว"""
+        day = (datetime.now() + timedelta(days=3)).date().isoformat()
+        
+        def submit(i):
+            return requests.post(
+                f"{BASE_URL}/booking-requests",
+                json={
+                    "user_id": resident_login["user_id"],
+                    "location": "สนามเทนนิส",
+                    "date": day,
+                    "start_time": "09:00",
+                    "end_time": "10:00",
+                    "purpose": f"แข่ง {i}"
+                }
+            )
+        
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            responses = list(pool.map(submit, range(6)))
+        
+        created = [r for r in responses if r.status_code == 201]
+        assert len(created) == 1
+        assert all(r.status_code == 409 for r in responses if r.status_code != 201)
+        print("✓ TC-051 PASSED: Only one concurrent booking accepted")
+        
+        requests.delete(f"{BASE_URL}/booking-requests/{created[0].json()['booking']['booking_id']}", headers=admin_headers)
+
+# ================================
+# TEST CLASS 14: BATCH & VILLAGE BILLS
+# ================================
+class TestBatchBills:
+    """Test Batch Bill Issuance and Village-wide Bills"""
+    
+    def test_create_bill_batch(self, admin_login, resident_login, admin_headers):
+        """TC-052: ออกบิลให้หลายครัวเรือนในครั้งเดียว"""
+        next_month = (datetime.now() + timedelta(days=30)).date()
+        response = requests.post(
+            f"{BASE_URL}/bills/batch",
+            headers=admin_headers,
+            json={
+                "template": {
+                    "item_name": "ค่าส่วนกลาง (batch)",
+                    "amount": 1500.00,
+                    "due_date": next_month.isoformat(),
+                    "issued_by_user_id": admin_login["user_id"]
+                },
+                "recipients": [
+                    resident_login["user_id"],
+                    {"recipient_id": admin_login["user_id"], "amount": 2000.00}
+                ]
+            }
+        )
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert data["count"] == 2
+        assert data["total_amount"] == 3500.00
+        
+        resident_bills = requests.get(f"{BASE_URL}/bills", params={"user_id": resident_login["user_id"]}).json()
+        assert any(b["bill_id"] in data["bill_ids"] and b["amount"] == 1500.00 for b in resident_bills)
+        print("✓ TC-052 PASSED: Batch bills created")
+        
+        for bill_id in data["bill_ids"]:
+            requests.delete(f"{BASE_URL}/bills/{bill_id}", headers=admin_headers)
+    
+    def test_create_bill_batch_unknown_recipient(self, admin_login, admin_headers):
+        """TC-053: ออกบิลแบบกลุ่มให้ผู้รับที่ไม่มีอยู่"""
+        response = requests.post(
+            f"{BASE_URL}/bills/batch",
+            headers=admin_headers,
+            json={
+                "template": {
+                    "item_name": "ค่าน้ำ",
+                    "amount": 300.00,
+                    "due_date": datetime.now().date().isoformat(),
+                    "issued_by_user_id": admin_login["user_id"]
+                },
+                "recipients": [admin_login["user_id"], "no-such-user"]
+            }
+        )
+        
+        assert response.status_code == 400
+        assert response.json()["recipient_ids"] == ["no-such-user"]
+        print("✓ TC-053 PASSED: Unknown recipient rejected")
+    
+    def test_create_bill_batch_invalid_recipient(self, admin_login, admin_headers):
+        """TC-089: ผู้รับที่ไม่ใช่ string (list, object ไม่มี recipient_id) ได้ 400 ไม่ใช่ server error"""
+        template = {
+            "item_name": "ค่าน้ำ",
+            "amount": 300.00,
+            "due_date": datetime.now().date().isoformat(),
+            "issued_by_user_id": admin_login["user_id"]
+        }
+        for recipients in ([["a", "b"]], [{"recipient_id": ["a"]}], [{"amount": 100}], [123]):
+            response = requests.post(
+                f"{BASE_URL}/bills/batch",
+                headers=admin_headers,
+                json={"template": template, "recipients": recipients}
+            )
+            assert response.status_code == 400, recipients
+        print("✓ TC-089 PASSED: Invalid recipients rejected")
+    
+    def test_village_bill_paid_per_household(self, admin_login, resident_login, admin_headers):
+        """TC-054: บิล 'all' ติดตามสถานะการชำระแยกแต่ละครัวเรือน"""
+        next_month = (datetime.now() + timedelta(days=30)).date()
+        bill_id = requests.post(
+            f"{BASE_URL}/bills",
+            json={
+                "item_name": "ค่าขยะ",
+                "amount": 100.00,
+                "due_date": next_month.isoformat(),
+                "recipient_id": "all",
+                "issued_by_user_id": admin_login["user_id"]
+            }
+        ).json()["bill"]["bill_id"]
+        
+        payment = requests.post(
+            f"{BASE_URL}/payments",
+            json={
+                "bill_id": bill_id,
+                "user_id": resident_login["user_id"],
+                "amount": 100.00,
+                "payment_method": "bank_transfer"
+            }
+        ).json()["payment"]
+        requests.put(f"{BASE_URL}/payments/approve/{payment['payment_id']}", headers=admin_headers)
+        
+        def status_for(user_id):
+            bills = requests.get(f"{BASE_URL}/bills", params={"user_id": user_id}).json()
+            return next((b["status"] for b in bills if b["bill_id"] == bill_id), None)
+        
+        assert status_for(resident_login["user_id"]) == "paid"
+        assert status_for(admin_login["user_id"]) is None
+        print("✓ TC-054 PASSED: Village-wide bill paid per household")
+    
+    def test_village_bill_paid_by_all_residents(self, admin_login, admin_headers):
+        """TC-085: บิล 'all' เป็น paid เมื่อลูกบ้านที่อนุมัติแล้วชำระครบ บัญชีที่รออนุมัติไม่ถูกนับจนกว่าจะอนุมัติ"""
+        pending = requests.post(f"{BASE_URL}/users", json={
+            "name": "รออนุมัติ", "username": f"pending_{int(time.time() * 1000)}", "password": "Pend@123",
+            "role": "resident", "status": "pending"
+        }).json()["user"]
+        bill_id = requests.post(
+            f"{BASE_URL}/bills",
+            json={
+                "item_name": "ค่าไฟส่วนกลาง",
+                "amount": 50.00,
+                "due_date": (datetime.now() + timedelta(days=30)).date().isoformat(),
+                "recipient_id": "all",
+                "issued_by_user_id": admin_login["user_id"]
+            }
+        ).json()["bill"]["bill_id"]
+        
+        residents = [u for u in requests.get(f"{BASE_URL}/users").json()
+                     if u["role"] == "resident" and u["status"] == "approved"]
+        for resident in residents:
+            payment = requests.post(f"{BASE_URL}/payments", json={
+                "bill_id": bill_id, "user_id": resident["user_id"], "amount": 50.00, "payment_method": "cash"
+            }).json()["payment"]
+            requests.put(f"{BASE_URL}/payments/approve/{payment['payment_id']}", headers=admin_headers)
+        
+        bill = next(b for b in requests.get(f"{BASE_URL}/bills").json() if b["bill_id"] == bill_id)
+        assert bill["status"] == "paid"
+        
+        requests.put(f"{BASE_URL}/users/{pending['user_id']}", json={"status": "approved"}, headers=admin_headers)
+        bills = requests.get(f"{BASE_URL}/bills", params={"user_id": pending["user_id"]}).json()
+        assert next(b["status"] for b in bills if b["bill_id"] == bill_id) == "unpaid"
+        print(f"✓ TC-085 PASSED: Bill paid after {len(residents)} residents paid")
+
+# ================================
+# TEST CLASS 15: SCHEMA MIGRATIONS
+# ================================
+class TestSchemaMigrations:
+    """Test Schema Migrations and Query Plans"""
+    
+    def test_migrations_applied(self, admin_headers):
+        """TC-055: migration ทั้งหมดถูกรันและบันทึกเวลาที่ใช้"""
+        response = requests.get(f"{BASE_URL}/admin/schema", headers=admin_headers)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["pending"] == []
+        versions = [m["version"] for m in data["migrations"]]
+        assert versions == sorted(versions) and len(versions) > 0
+        assert all(m["duration_ms"] >= 0 for m in data["migrations"])
+        print(f"✓ TC-055 PASSED: {len(versions)} migrations applied")
+    
+    def test_list_queries_use_indexes(self, admin_headers):
+        """TC-056: EXPLAIN QUERY PLAN ของ list query ใช้ index โดยไม่ต้อง sort เพิ่ม"""
+        response = requests.get(f"{BASE_URL}/admin/schema", headers=admin_headers)
+        
+        assert response.status_code == 200
+        for name, plan in response.json()["query_plans"].items():
+            assert "USING INDEX" in plan[0] or "USING COVERING INDEX" in plan[0], f"{name}: {plan}"
+            assert not any("TEMP B-TREE" in step for step in plan), f"{name}: {plan}"
+        print("✓ TC-056 PASSED: List queries served from indexes")
+
+# ================================
+# TEST CLASS 16: CONDITIONAL REQUESTS
+# ================================
+class TestConditionalRequests:
+    """Test ETag / If-None-Match on List Endpoints"""
+    
+    def test_unchanged_list_returns_304(self):
+        """TC-057: ส่ง If-None-Match ด้วย ETag เดิมได้ 304 โดยไม่มี body"""
+        first = requests.get(f"{BASE_URL}/announcements")
+        etag = first.headers.get("ETag")
+        
+        assert first.status_code == 200
+        assert etag and etag.startswith("W/")
+        
+        second = requests.get(f"{BASE_URL}/announcements", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers.get("ETag") == etag
+        print("✓ TC-057 PASSED: Unchanged list answered with 304")
+    
+    def test_write_changes_etag(self, admin_login, admin_headers):
+        """TC-058: สร้างประกาศใหม่แล้ว ETag ของรายการเปลี่ยนและได้ 200 พร้อมข้อมูลใหม่"""
+        etag = requests.get(f"{BASE_URL}/announcements").headers["ETag"]
+        
+        response = requests.post(f"{BASE_URL}/announcements", json={
+            "title": "ประกาศทดสอบ ETag",
+            "content": "ETag ต้องเปลี่ยน",
+            "author_id": admin_login["user_id"],
+            "published_date": datetime.now().isoformat(),
+            "tag": "ทั่วไป"
+        })
+        assert response.status_code == 201
+        announcement_id = response.json()["announcement"]["announcement_id"]
+        
+        refreshed = requests.get(f"{BASE_URL}/announcements", headers={"If-None-Match": etag})
+        assert refreshed.status_code == 200
+        assert refreshed.headers["ETag"] != etag
+        assert any(a["announcement_id"] == announcement_id for a in refreshed.json())
+        print("✓ TC-058 PASSED: Write invalidated list ETag")
+        
+        requests.delete(f"{BASE_URL}/announcements/{announcement_id}", headers=admin_headers)
+
+# ================================
+# TEST CLASS 17: ENTITY CACHE
+# ================================
+class TestEntityCache:
+    """Test Read-through Entity Cache"""
+    
+    def test_repeated_get_hits_cache(self, resident_login, admin_headers):
+        """TC-059: อ่าน user เดิมซ้ำต้องนับเป็น cache hit"""
+        user_id = resident_login["user_id"]
+        requests.get(f"{BASE_URL}/users/{user_id}")
+        before = requests.get(f"{BASE_URL}/admin/cache", headers=admin_headers).json()["users"]
+        
+        for _ in range(3):
+            assert requests.get(f"{BASE_URL}/users/{user_id}").status_code == 200
+        
+        after = requests.get(f"{BASE_URL}/admin/cache", headers=admin_headers).json()["users"]
+        assert after["hits"] - before["hits"] >= 3
+        assert after["size"] <= after["max_size"]
+        print(f"✓ TC-059 PASSED: {after['hits']} cache hits")
+    
+    def test_update_invalidates_cache(self, test_user, admin_headers):
+        """TC-060: แก้ไข user แล้วอ่านซ้ำต้องได้ข้อมูลใหม่ ไม่ใช่ค่าใน cache"""
+        url = f"{BASE_URL}/users/{test_user['user_id']}"
+        requests.get(url)
+        
+        assert requests.put(url, json={"name": "Cached Name Updated"}, headers=admin_headers).status_code == 200
+        
+        response = requests.get(url)
+        assert response.status_code == 200
+        assert response.json()["name"] == "Cached Name Updated"
+        assert requests.get(f"{BASE_URL}/admin/cache", headers=admin_headers).json()["users"]["invalidations"] > 0
+        print("✓ TC-060 PASSED: Update invalidated cached user")
+
+# ================================
+# TEST CLASS 18: STREAMED LISTS
+# ================================
+class TestStreamedLists:
+    """Test Streamed JSON Array Responses"""
+    
+    def test_streamed_list_matches_pages(self):
+        """TC-061: รายการเต็มที่ส่งแบบ stream ต้องเป็น JSON array เดียวกับการไล่อ่านทีละหน้า"""
+        response = requests.get(f"{BASE_URL}/payments")
+        
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("application/json")
+        streamed = [p["payment_id"] for p in response.json()]
+        
+        paged, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = requests.get(f"{BASE_URL}/payments", params=params).json()
+            paged += [p["payment_id"] for p in page["items"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert streamed == paged
+        print(f"✓ TC-061 PASSED: Streamed {len(streamed)} payments")
+    
+    def test_streamed_list_supports_etag(self):
+        """TC-062: list แบบ stream ยังตอบ 304 เมื่อ ETag ตรงกัน"""
+        etag = requests.get(f"{BASE_URL}/payments").headers["ETag"]
+        
+        response = requests.get(f"{BASE_URL}/payments", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        print("✓ TC-062 PASSED: Streamed list answered with 304")
+    
+    def test_cached_list_is_streamed(self):
+        """TC-092: รายการที่ตอบจาก entity cache (users) ก็ส่งแบบ stream และตรงกับการไล่อ่านทีละหน้า"""
+        response = requests.get(f"{BASE_URL}/users")
+        
+        assert response.status_code == 200
+        assert "Content-Length" not in response.headers
+        streamed = [u["user_id"] for u in response.json()]
+        
+        paged, cursor = [], None
+        while True:
+            params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+            page = requests.get(f"{BASE_URL}/users", params=params).json()
+            paged += [u["user_id"] for u in page["items"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert streamed == paged
+        print(f"✓ TC-092 PASSED: Streamed {len(streamed)} cached users")
+
+# ================================
+# TEST CLASS 19: CSV EXPORTS
+# ================================
+class TestCsvExports:
+    """Test CSV Exports for Accounting"""
+    
+    def test_export_payments_csv(self, admin_headers):
+        """TC-063: export การชำระเงินเป็น CSV พร้อมชื่อผู้ชำระ และกรองตามช่วงวันที่"""
+        today = datetime.now().date().isoformat()
+        response = requests.get(f"{BASE_URL}/exports/payments.csv", params={"from": today, "to": today}, headers=admin_headers)
+        
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/csv")
+        assert "attachment" in response.headers["Content-Disposition"]
+        lines = response.content.decode("utf-8-sig").splitlines()
+        assert lines[0].startswith("payment_id,payment_date,bill_id,item_name,user_id,payer_name")
+        assert all(today in line for line in lines[1:])
+        
+        future = (datetime.now() + timedelta(days=365)).date().isoformat()
+        empty = requests.get(f"{BASE_URL}/exports/payments.csv", params={"from": future}, headers=admin_headers)
+        assert empty.content.decode("utf-8-sig").splitlines() == lines[:1]
+        print(f"✓ TC-063 PASSED: Exported {len(lines) - 1} payments")
+    
+    def test_export_invalid_date(self, admin_headers):
+        """TC-064: export ด้วยวันที่ผิดรูปแบบต้องได้ 400"""
+        response = requests.get(f"{BASE_URL}/exports/bills.csv", params={"from": "last-month"}, headers=admin_headers)
+        
+        assert response.status_code == 400
+        print("✓ TC-064 PASSED: Invalid export date rejected")
+
+# ================================
+# TEST CLASS 20: BULK USER IMPORT
+# ================================
+class TestUserImport:
+    """Test Bulk Resident Import"""
+    
+    def test_import_json_reports_row_errors(self, admin_headers):
+        """TC-065: นำเข้าผู้ใช้แบบ JSON แถวที่ถูกต้องถูกสร้าง แถวที่ผิดถูกรายงานรายแถว"""
+        prefix = f"import_{int(time.time() * 1000)}"
+        response = requests.post(f"{BASE_URL}/users/import", headers=admin_headers, json={"users": [
+            {"name": "บ้าน 1", "username": f"{prefix}_1", "password": "Pass@1", "address": "1/1"},
+            {"name": "บ้าน 2", "username": f"{prefix}_2", "password": "Pass@2"},
+            {"name": "", "username": f"{prefix}_3", "password": "Pass@3"},
+            {"name": "ซ้ำ", "username": "admin", "password": "Pass@4"}
+        ]})
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert data["created"] == 2
+        assert [error["row"] for error in data["errors"]] == [3, 4]
+        
+        login = requests.post(f"{BASE_URL}/login", json={"username": f"{prefix}_1", "password": "Pass@1"})
+        assert login.status_code == 200
+        print(f"✓ TC-065 PASSED: {data['message']}")
+        
+        for user_id in data["user_ids"]:
+            requests.delete(f"{BASE_URL}/users/{user_id}", headers=admin_headers)
+    
+    def test_import_csv_file(self, admin_headers):
+        """TC-066: นำเข้าผู้ใช้จากไฟล์ CSV"""
+        username = f"csvimport_{int(time.time() * 1000)}"
+        csv_content = f"name,username,password,phone\nบ้าน CSV,{username},Pass@123,0811111111\n"
+        response = requests.post(
+            f"{BASE_URL}/users/import",
+            headers=admin_headers,
+            files={"file": ("residents.csv", csv_content.encode("utf-8-sig"), "text/csv")}
+        )
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert data["created"] == 1 and data["errors"] == []
+        user = requests.get(f"{BASE_URL}/users/{data['user_ids'][0]}").json()
+        assert user["username"] == username and user["phone"] == "0811111111"
+        print("✓ TC-066 PASSED: Residents imported from CSV")
+        
+        requests.delete(f"{BASE_URL}/users/{data['user_ids'][0]}", headers=admin_headers)
+    
+    def test_import_rejects_non_text_fields(self, admin_headers):
+        """TC-088: ค่าที่ไม่ใช่ข้อความ (list, ตัวเลข) ถูกรายงานเป็น error รายแถว ไม่ทำให้ server error"""
+        username = f"typed_{int(time.time() * 1000)}"
+        response = requests.post(f"{BASE_URL}/users/import", headers=admin_headers, json={"users": [
+            {"name": "บ้าน list", "username": ["x"], "password": "Pass@1"},
+            {"name": "บ้านตัวเลข", "username": f"{username}_num", "password": 123456},
+            {"name": "บ้าน role", "username": f"{username}_role", "password": "Pass@3", "role": {"admin": True}},
+            {"name": "บ้านปกติ", "username": username, "password": "Pass@4"}
+        ]})
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert data["created"] == 1
+        assert [error["row"] for error in data["errors"]] == [1, 2, 3]
+        assert all(error["message"].startswith("Fields must be text") for error in data["errors"])
+        assert data["errors"][0]["username"] is None
+        print("✓ TC-088 PASSED: Non-text fields reported per row")
+        
+        for user_id in data["user_ids"]:
+            requests.delete(f"{BASE_URL}/users/{user_id}", headers=admin_headers)
+
+# ================================
+# TEST CLASS 21: PASSWORD HASHING
+# ================================
+class TestPasswordHashing:
+    """Test Password Hashing off the Request Threads"""
+    
+    def test_concurrent_logins(self):
+        """TC-067: login พร้อมกันหลายคนสำเร็จทั้งหมด"""
+        def login(_):
+            return requests.post(f"{BASE_URL}/login", json=TEST_DATA["resident"]).status_code
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(login, range(16)))
+        
+        assert statuses == [200] * 16
+        print("✓ TC-067 PASSED: 16 concurrent logins succeeded")
+    
+    def test_change_password(self, test_user):
+        """TC-068: เปลี่ยนรหัสผ่านต้องตรวจรหัสผ่านเดิม login ด้วยรหัสผ่านใหม่ได้ และผู้เปลี่ยนได้ token ใหม่แทน token เดิม"""
+        url = f"{BASE_URL}/users/{test_user['user_id']}"
+        token = requests.post(f"{BASE_URL}/login", json={"username": test_user["username"], "password": "Test@123"}).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        
+        wrong = requests.put(url, json={"password": "New@456", "current_password": "wrong"}, headers=headers)
+        assert wrong.status_code == 403
+        assert requests.get(url, headers=headers).status_code == 200
+        
+        changed = requests.put(url, json={"password": "New@456", "current_password": "Test@123"}, headers=headers)
+        assert changed.status_code == 200
+        assert requests.get(url, headers=headers).status_code == 401
+        assert requests.get(url, headers={"Authorization": f"Bearer {changed.json()['token']}"}).status_code == 200
+        
+        old_login = requests.post(f"{BASE_URL}/login", json={"username": test_user["username"], "password": "Test@123"})
+        new_login = requests.post(f"{BASE_URL}/login", json={"username": test_user["username"], "password": "New@456"})
+        assert old_login.status_code == 401
+        assert new_login.status_code == 200
+        print("✓ TC-068 PASSED: Password changed and verified")
+
+# ================================
+# TEST CLASS 22: ACCESS TOKENS
+# ================================
+class TestAccessTokens:
+    """Test Signed Access Tokens"""
+    
+    def test_login_issues_token(self):
+        """TC-069: login ได้ token ที่ใช้เรียก API ได้ และ token ที่ถูกแก้ไขถูกปฏิเสธ"""
+        data = requests.post(f"{BASE_URL}/login", json=TEST_DATA["resident"]).json()
+        assert data["token_type"] == "Bearer"
+        assert data["expires_in"] > 0
+        
+        valid = requests.get(f"{BASE_URL}/announcements", headers={"Authorization": f"Bearer {data['token']}"})
+        tampered = requests.get(f"{BASE_URL}/announcements", headers={"Authorization": f"Bearer {data['token']}x"})
+        assert valid.status_code == 200
+        assert tampered.status_code == 401
+        print("✓ TC-069 PASSED: Token issued and verified")
+    
+    def test_logout_revokes_token(self):
+        """TC-070: หลัง logout แล้ว token เดิมใช้ไม่ได้"""
+        token = requests.post(f"{BASE_URL}/login", json=TEST_DATA["resident"]).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        
+        assert requests.post(f"{BASE_URL}/logout", headers=headers).status_code == 200
+        assert requests.get(f"{BASE_URL}/announcements", headers=headers).status_code == 401
+        print("✓ TC-070 PASSED: Token revoked on logout")
+    
+    def test_admin_routes_require_admin(self, resident_login, admin_headers):
+        """TC-084: API ของผู้ดูแลต้องใช้ token ของ admin (ไม่มี token ได้ 401, token ของลูกบ้านได้ 403)"""
+        resident_headers = {"Authorization": f"Bearer {resident_login['token']}"}
+        
+        assert requests.get(f"{BASE_URL}/admin/cache").status_code == 401
+        assert requests.get(f"{BASE_URL}/admin/cache", headers=resident_headers).status_code == 403
+        assert requests.post(f"{BASE_URL}/users/import", json={"users": []}, headers=resident_headers).status_code == 403
+        assert requests.delete(f"{BASE_URL}/users/{resident_login['user_id']}", headers=resident_headers).status_code == 403
+        assert requests.get(f"{BASE_URL}/admin/cache", headers=admin_headers).status_code == 200
+        print("✓ TC-084 PASSED: Admin routes reject non-admin callers")
+    
+    def test_resident_cannot_change_own_role(self, test_user, resident_login):
+        """TC-093: ลูกบ้านตั้ง role/status ให้ตัวเองไม่ได้ทั้งตอนแก้และตอนสมัคร (403) แก้ข้อมูลผู้อื่นไม่ได้ แต่แก้โปรไฟล์ตัวเองได้"""
+        url = f"{BASE_URL}/users/{test_user['user_id']}"
+        token = requests.post(f"{BASE_URL}/login", json={"username": test_user["username"], "password": "Test@123"}).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        
+        assert requests.put(url, json={"role": "admin"}, headers=headers).status_code == 403
+        assert requests.put(url, json={"status": "approved", "name": "x"}, headers=headers).status_code == 403
+        assert requests.put(url, json={"role": "admin"}).status_code == 401
+        signup = {"name": "x", "username": f"{test_user['username']}_admin", "password": "Pass@1", "role": "admin"}
+        assert requests.post(f"{BASE_URL}/users", json=signup).status_code == 403
+        assert requests.post(f"{BASE_URL}/users", json={**signup, "role": "resident", "status": "approved"}, headers=headers).status_code == 403
+        assert requests.get(url).json()["role"] == "resident"
+        
+        other = f"{BASE_URL}/users/{resident_login['user_id']}"
+        assert requests.put(other, json={"name": "ถูกแก้"}, headers=headers).status_code == 403
+        
+        response = requests.put(url, json={"phone": "0899999999"}, headers=headers)
+        assert response.status_code == 200 and "token" not in response.json()
+        assert requests.get(url, headers=headers).status_code == 200
+        print("✓ TC-093 PASSED: Resident cannot promote itself")
+    
+    def test_resident_cannot_manage_records(self, resident_login, admin_login, admin_headers):
+        """TC-094: ลูกบ้านอนุมัติการชำระเงิน แก้/ลบบิลและประกาศ หรือยกเลิกการจองของผู้อื่นไม่ได้ (403) แต่ยกเลิกการจองของตัวเองได้"""
+        resident_headers = {"Authorization": f"Bearer {resident_login['token']}"}
+        bill_id = requests.post(f"{BASE_URL}/bills", json={
+            "item_name": "ค่าส่วนกลาง", "amount": 100.00,
+            "due_date": (datetime.now() + timedelta(days=30)).date().isoformat(),
+            "recipient_id": resident_login["user_id"], "issued_by_user_id": admin_login["user_id"]
+        }).json()["bill"]["bill_id"]
+        payment_id = requests.post(f"{BASE_URL}/payments", json={
+            "bill_id": bill_id, "user_id": resident_login["user_id"], "amount": 100.00, "payment_method": "transfer"
+        }).json()["payment"]["payment_id"]
+        announcement_id = requests.post(f"{BASE_URL}/announcements", json={
+            "title": "ทดสอบสิทธิ์", "content": "ลูกบ้านลบไม่ได้", "author_id": admin_login["user_id"]
+        }).json()["announcement"]["announcement_id"]
+        
+        def book(user_id, hour):
+            return requests.post(f"{BASE_URL}/booking-requests", json={
+                "user_id": user_id, "location": "ห้องประชุม",
+                "date": (datetime.now() + timedelta(days=20)).date().isoformat(),
+                "start_time": f"{hour:02d}:00", "end_time": f"{hour + 1:02d}:00", "purpose": "ทดสอบสิทธิ์"
+            }).json()["booking"]["booking_id"]
+        own_booking, other_booking = book(resident_login["user_id"], 8), book(admin_login["user_id"], 10)
+        
+        denied = [
+            requests.put(f"{BASE_URL}/payments/approve/{payment_id}", headers=resident_headers),
+            requests.put(f"{BASE_URL}/payments/reject/{payment_id}", headers=resident_headers),
+            requests.put(f"{BASE_URL}/bills/{bill_id}", json={"status": "paid"}, headers=resident_headers),
+            requests.delete(f"{BASE_URL}/bills/{bill_id}", headers=resident_headers),
+            requests.delete(f"{BASE_URL}/announcements/{announcement_id}", headers=resident_headers),
+            requests.put(f"{BASE_URL}/booking-requests/{own_booking}", json={"status": "approved"}, headers=resident_headers),
+            requests.delete(f"{BASE_URL}/booking-requests/{other_booking}", headers=resident_headers),
+        ]
+        assert [r.status_code for r in denied] == [403] * len(denied)
+        assert requests.put(f"{BASE_URL}/payments/approve/{payment_id}").status_code == 401
+        payment = next(p for p in requests.get(f"{BASE_URL}/payments").json() if p["payment_id"] == payment_id)
+        assert payment["status"] == "pending"
+        
+        assert requests.delete(f"{BASE_URL}/booking-requests/{own_booking}", headers=resident_headers).status_code == 200
+        print("✓ TC-094 PASSED: Resident blocked from admin record changes")
+        
+        requests.delete(f"{BASE_URL}/booking-requests/{other_booking}", headers=admin_headers)
+        requests.delete(f"{BASE_URL}/announcements/{announcement_id}", headers=admin_headers)
+        requests.delete(f"{BASE_URL}/bills/{bill_id}", headers=admin_headers)
+
+# ================================
+# TEST CLASS 23: IMAGE THUMBNAILS
+# ================================
+# GIF ขนาด 1x1 pixel
+TINY_GIF = b'GIF89a\x01\x00\x01\x00\x80\x00\x00\xff\xff\xff\x00\x00\x00!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+
+class TestImageThumbnails:
+    """Test Background Image Thumbnails"""
+    
+    def test_upload_returns_thumbnail(self, resident_login):
+        """TC-071: อัปโหลดรูปได้ thumbnail_path ที่เปิดได้ทันที (ส่งต้นฉบับระหว่างรอย่อ)"""
+        response = requests.post(
+            f"{BASE_URL}/upload",
+            files={'file': ('slip.gif', TINY_GIF, 'image/gif')},
+            data={'type': 'payment', 'user_id': resident_login["user_id"]}
+        )
+        
+        assert response.status_code == 200
+        thumbnail_path = response.json()["thumbnail_path"]
+        assert thumbnail_path.startswith("thumbs/objects/")
+        assert requests.get(f"{BASE_URL}/uploads/{thumbnail_path}").status_code == 200
+        print("✓ TC-071 PASSED: Thumbnail path served")
+    
+    def test_repair_records_thumbnails(self, resident_login):
+        """TC-072: แจ้งซ่อมที่มีรูปบันทึก thumbnail_paths คู่กับ image_paths"""
+        response = requests.post(f"{BASE_URL}/repair-requests", json={
+            "user_id": resident_login["user_id"],
+            "title": "ท่อน้ำรั่ว",
+            "category": "ประปา",
+            "image_paths": json.dumps(["repair/u1/a.png", "repair/u1/b.pdf"])
+        })
+        
+        assert response.status_code == 201
+        thumbnails = json.loads(response.json()["request"]["thumbnail_paths"])
+        assert thumbnails == ["thumbs/repair/u1/a.png.jpg", None]
+        print("✓ TC-072 PASSED: Thumbnail paths recorded")
+
+# ================================
+# TEST CLASS 24: CHUNKED UPLOADS
+# ================================
+class TestChunkedUploads:
+    """Test Resumable Chunked Uploads"""
+    
+    def start_upload(self, content, user_id):
+        response = requests.post(f"{BASE_URL}/upload/chunked", json={
+            "filename": "slip.pdf", "size": len(content), "type": "payment", "user_id": user_id
+        })
+        assert response.status_code == 201
+        return response.json()["upload_id"]
+    
+    def send_chunk(self, upload_id, offset, chunk):
+        return requests.put(
+            f"{BASE_URL}/upload/chunked/{upload_id}", data=chunk,
+            headers={"Upload-Offset": str(offset), "Content-Type": "application/octet-stream"}
+        )
+    
+    def test_chunked_upload(self, resident_login):
+        """TC-073: อัปโหลดไฟล์เป็น chunk แล้วประกอบเป็นไฟล์เดียวที่เปิดได้"""
+        content = bytes(range(256)) * 1024
+        upload_id = self.start_upload(content, resident_login["user_id"])
+        
+        for offset in range(0, len(content), 100000):
+            response = self.send_chunk(upload_id, offset, content[offset:offset + 100000])
+            assert response.status_code == 200
+        
+        complete = requests.post(f"{BASE_URL}/upload/chunked/{upload_id}/complete")
+        assert complete.status_code == 200
+        assert requests.get(f"{BASE_URL}/uploads/{complete.json()['path']}").content == content
+        print("✓ TC-073 PASSED: Chunked upload assembled")
+    
+    def test_resume_from_offset(self, resident_login):
+        """TC-074: chunk ที่ offset ไม่ตรงถูกปฏิเสธพร้อม offset ล่าสุดให้ส่งต่อได้"""
+        content = b"x" * 50000
+        upload_id = self.start_upload(content, resident_login["user_id"])
+        assert self.send_chunk(upload_id, 0, content[:20000]).status_code == 200
+        
+        # ส่ง chunk แรกซ้ำเหมือน client ที่ไม่ได้รับคำตอบ
+        retry = self.send_chunk(upload_id, 0, content[:20000])
+        assert retry.status_code == 409
+        offset = requests.get(f"{BASE_URL}/upload/chunked/{upload_id}").json()["offset"]
+        assert offset == retry.json()["offset"] == 20000
+        
+        assert requests.post(f"{BASE_URL}/upload/chunked/{upload_id}/complete").status_code == 409
+        assert self.send_chunk(upload_id, offset, content[offset:]).status_code == 200
+        assert requests.post(f"{BASE_URL}/upload/chunked/{upload_id}/complete").status_code == 200
+        print("✓ TC-074 PASSED: Upload resumed from last offset")
+
+# ================================
+# TEST CLASS 25: DEDUPLICATED UPLOADS
+# ================================
+class TestDeduplicatedUploads:
+    """Test Content-Addressed Upload Store"""
+    
+    def upload(self, content, user_id):
+        response = requests.post(
+            f"{BASE_URL}/upload",
+            files={'file': ('notice.pdf', content, 'application/pdf')},
+            data={'type': 'repair', 'user_id': user_id}
+        )
+        assert response.status_code == 200
+        return response.json()["path"]
+    
+    def test_identical_uploads_share_path(self, resident_login, admin_login):
+        """TC-075: ไฟล์เนื้อหาเดียวกันได้ path เดียวกัน ไฟล์ต่างกันได้คนละ path"""
+        content = f"%PDF notice {time.time()}".encode()
+        first = self.upload(content, resident_login["user_id"])
+        second = self.upload(content, admin_login["user_id"])
+        other = self.upload(content + b"!", resident_login["user_id"])
+        
+        assert first == second
+        assert other != first
+        print("✓ TC-075 PASSED: Identical uploads stored once")
+    
+    def test_immutable_cache_headers(self, resident_login):
+        """TC-076: ไฟล์ที่เก็บตามเนื้อหาส่งพร้อม Cache-Control แบบ immutable"""
+        path = self.upload(b"%PDF immutable", resident_login["user_id"])
+        response = requests.get(f"{BASE_URL}/uploads/{path}")
+        
+        assert response.status_code == 200
+        assert "immutable" in response.headers["Cache-Control"]
+        print("✓ TC-076 PASSED: Immutable cache headers sent")
+    
+    def test_thai_filename(self, resident_login):
+        """TC-082: ชื่อไฟล์ภาษาไทยอัปโหลดได้ทั้งแบบปกติและแบบ chunked โดยนามสกุลไม่หาย"""
+        content = f"%PDF สลิป {time.time()}".encode()
+        response = requests.post(
+            f"{BASE_URL}/upload",
+            files={'file': ('สลิปโอนเงิน.pdf', content, 'application/pdf')},
+            data={'type': 'payment', 'user_id': resident_login["user_id"]}
+        )
+        assert response.status_code == 200
+        assert response.json()["path"].endswith(".pdf")
+        
+        upload_id = requests.post(f"{BASE_URL}/upload/chunked", json={
+            "filename": "ใบเสร็จ.pdf", "size": len(content) + 1
+        }).json()["upload_id"]
+        requests.put(
+            f"{BASE_URL}/upload/chunked/{upload_id}", data=content + b"!",
+            headers={"Upload-Offset": "0", "Content-Type": "application/octet-stream"}
+        )
+        complete = requests.post(f"{BASE_URL}/upload/chunked/{upload_id}/complete")
+        
+        assert complete.status_code == 200
+        assert requests.get(f"{BASE_URL}/uploads/{complete.json()['path']}").content == content + b"!"
+        print("✓ TC-082 PASSED: Thai filenames keep their extension")
+    
+    def test_profile_documents_kept_by_owner(self, resident_login):
+        """TC-083: เอกสารโปรไฟล์เก็บในโฟลเดอร์ของเจ้าของ ไม่รวมใน objects/"""
+        user_id = resident_login["user_id"]
+        response = requests.post(
+            f"{BASE_URL}/upload-multiple",
+            files=[('files[]', ('บัตรประชาชน.pdf', b"%PDF id card", 'application/pdf'))],
+            data={'type': 'profile', 'user_id': user_id}
+        )
+        
+        assert response.status_code == 200
+        path = response.json()["paths"][0]
+        assert path.startswith(f"profile/{user_id}/") and path.endswith(".pdf")
+        assert requests.get(f"{BASE_URL}/uploads/{path}").content == b"%PDF id card"
+        print("✓ TC-083 PASSED: Profile documents stored under their owner")
+
+# ================================
+# TEST CLASS 26: UPLOAD SERVING
+# ================================
+class TestUploadServing:
+    """Test Range and Conditional Requests on Uploads"""
+    
+    def upload(self, resident_login):
+        content = bytes(range(256)) * 400
+        response = requests.post(
+            f"{BASE_URL}/upload",
+            files={'file': ('manual.pdf', content, 'application/pdf')},
+            data={'type': 'repair', 'user_id': resident_login["user_id"]}
+        )
+        return f"{BASE_URL}/uploads/{response.json()['path']}", content
+    
+    def test_range_request(self, resident_login):
+        """TC-077: ขอไฟล์บางช่วงด้วย Range ได้ 206 และข้อมูลตรงช่วง"""
+        url, content = self.upload(resident_login)
+        response = requests.get(url, headers={"Range": "bytes=1000-1999"})
+        
+        assert response.status_code == 206
+        assert response.headers["Content-Range"] == f"bytes 1000-1999/{len(content)}"
+        assert response.content == content[1000:2000]
+        print("✓ TC-077 PASSED: Range request served")
+    
+    def test_conditional_get(self, resident_login):
+        """TC-078: ส่ง If-None-Match ด้วย ETag เดิมได้ 304 โดยไม่มี body"""
+        url, _ = self.upload(resident_login)
+        etag = requests.get(url).headers["ETag"]
+        response = requests.get(url, headers={"If-None-Match": etag})
+        
+        assert response.status_code == 304
+        assert response.content == b""
+        print("✓ TC-078 PASSED: Not modified for matching ETag")
+    
+    def test_multiple_files_keep_order(self, resident_login):
+        """TC-079: อัปโหลดหลายไฟล์พร้อมกันได้ path ตามลำดับไฟล์ที่ส่ง"""
+        contents = [f"%PDF page {n} {time.time()}".encode() * 1000 for n in range(6)]
+        files = [('files[]', (f'page{n}.pdf', content, 'application/pdf')) for n, content in enumerate(contents)]
+        response = requests.post(
+            f"{BASE_URL}/upload-multiple", files=files,
+            data={'type': 'repair', 'user_id': resident_login["user_id"]}
+        )
+        
+        assert response.status_code == 200
+        paths = response.json()["paths"]
+        assert [requests.get(f"{BASE_URL}/uploads/{path}").content for path in paths] == contents
+        print("✓ TC-079 PASSED: Concurrent saves returned in order")
+
+# ================================
+# TEST CLASS 27: UPLOAD GARBAGE COLLECTION
+# ================================
+class TestUploadGarbageCollection:
+    """Test Removal of Orphaned Uploads"""
+    
+    def upload(self, resident_login, name):
+        response = requests.post(
+            f"{BASE_URL}/upload",
+            files={'file': (name, f"%PDF {name} {time.time()}".encode(), 'application/pdf')},
+            data={'type': 'repair', 'user_id': resident_login["user_id"]}
+        )
+        return response.json()["path"]
+    
+    def test_recent_uploads_kept(self, resident_login, admin_headers):
+        """TC-080: grace=0 ถูกจำกัดเป็นค่าขั้นต่ำ ไฟล์ที่เพิ่งอัปโหลด ไฟล์ที่แนบ และเอกสารโปรไฟล์ไม่ถูกลบ"""
+        attached = self.upload(resident_login, 'quote.pdf')
+        pending = self.upload(resident_login, 'in-progress.pdf')
+        profile = requests.post(
+            f"{BASE_URL}/upload",
+            files={'file': ('สำเนาทะเบียนบ้าน.pdf', b"%PDF house registration", 'application/pdf')},
+            data={'type': 'profile', 'user_id': resident_login["user_id"]}
+        ).json()["path"]
+        requests.post(f"{BASE_URL}/repair-requests", json={
+            "user_id": resident_login["user_id"],
+            "title": "ไฟทางดับ",
+            "category": "ไฟฟ้า",
+            "image_paths": json.dumps([attached])
+        })
+        response = requests.post(f"{BASE_URL}/admin/uploads/gc", params={"grace": 0}, headers=admin_headers)
+        
+        assert response.status_code == 200
+        assert response.json()["grace_period"] >= 3600
+        for path in (attached, pending, profile):
+            assert requests.get(f"{BASE_URL}/uploads/{path}").status_code == 200
+        print("✓ TC-080 PASSED: Recent, attached and profile uploads kept")
+    
+    def test_dry_run_keeps_files(self, resident_login, admin_headers):
+        """TC-081: dry_run รายงานผลโดยไม่ลบไฟล์ และลูกบ้านสั่ง GC ไม่ได้"""
+        orphan = self.upload(resident_login, 'draft.pdf')
+        resident_headers = {"Authorization": f"Bearer {resident_login['token']}"}
+        assert requests.post(f"{BASE_URL}/admin/uploads/gc", headers=resident_headers).status_code == 403
+        
+        response = requests.post(f"{BASE_URL}/admin/uploads/gc", params={"dry_run": 1}, headers=admin_headers)
+        
+        assert response.status_code == 200
+        assert response.json()["dry_run"] is True
+        assert requests.get(f"{BASE_URL}/uploads/{orphan}").status_code == 200
+        assert requests.get(f"{BASE_URL}/admin/uploads/gc", headers=admin_headers).json()["last_run"]["dry_run"] is True
+        print("✓ TC-081 PASSED: Dry run left files in place")
+
+# ================================
+# TEST CLASS 28: PASSWORD REHASH
+# ================================
+class TestPasswordRehash:
+    """Test Hash Upgrade on Login (รันในโปรเซสเดียวกับฐานข้อมูลชั่วคราว เพราะ API ไม่เปิดให้ตั้ง hash ตรง ๆ)"""
+    
+    def test_login_upgrades_legacy_hash(self, tmp_path, monkeypatch):
+        """TC-087: login ด้วย hash แบบ pbkdf2 เดิมสำเร็จ และ hash ที่เก็บถูกแปลงเป็น method ปัจจุบัน"""
+        monkeypatch.syspath_prepend(str(BACKEND_DIR))
+        backend = pytest.importorskip("app")
+        settings = {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'rehash.db'}",
+            "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+            "CHUNKED_UPLOAD_FOLDER": str(tmp_path / "uploads_partial"),
+            "UPLOAD_GC_INTERVAL": 0,
+            "PASSWORD_HASH_METHOD": "pbkdf2:sha256:2000",
+            "PASSWORD_HASH_WORKERS": 1,
+        }
+        for name, value in settings.items():
+            monkeypatch.setattr(backend.Config, name, value)
+        app, _ = backend.create_app()
+        backend.init_database(app)
+        hasher = app.extensions["password_hasher"]
+        legacy = backend.generate_password_hash(TEST_DATA["resident"]["password"], "pbkdf2:sha256:1000")
+        
+        def stored_hash():
+            with app.app_context():
+                return backend.User.query.filter_by(username="resident").one().password_hash
+        
+        try:
+            with app.app_context():
+                backend.User.query.filter_by(username="resident").update({"password_hash": legacy})
+                backend.db.session.commit()
+            assert hasher.needs_rehash(stored_hash())
+            
+            client = app.test_client()
+            assert client.post("/login", json=TEST_DATA["resident"]).status_code == 200
+            upgraded = stored_hash()
+            assert upgraded != legacy
+            assert not hasher.needs_rehash(upgraded)
+            assert client.post("/login", json=TEST_DATA["resident"]).status_code == 200
+            assert stored_hash() == upgraded
+        finally:
+            hasher.shutdown()
+        print("✓ TC-087 PASSED: Legacy hash upgraded on login")
+
+# ================================
+# TEST CLASS 29: SOCKET.IO MESSAGE QUEUE
+# ================================
+class TestSocketMessageQueue:
+    """Test Event Fan-out between SocketIO Instances (in-process ผ่าน local:// และ file://)"""
+    
+    @staticmethod
+    def _deliver(monkeypatch, url, count, pause_every=None):
+        # ส่ง event จาก instance หนึ่ง แล้วคืนลำดับข้อความที่อีก instance ได้รับจาก queue
+        monkeypatch.syspath_prepend(str(BACKEND_DIR))
+        backend = pytest.importorskip("app")
+        flask = pytest.importorskip("flask")
+        flask_socketio = pytest.importorskip("flask_socketio")
+        channel = f"test-{time.time_ns()}"
+        
+        receiver = backend.socketio_queue_options(url, channel)["client_manager"]
+        flask_socketio.SocketIO(flask.Flask("receiver"), async_mode="threading", client_manager=receiver)
+        sender = flask_socketio.SocketIO(
+            flask.Flask("sender"), async_mode="threading",
+            **backend.socketio_queue_options(url, channel)
+        )
+        received = []
+        monkeypatch.setattr(receiver, "_handle_emit", received.append)
+        receiver.initialize()
+        
+        for n in range(count):
+            sender.emit("bills_issued", {"n": n, "item_name": "ค่าส่วนกลาง"})
+            if pause_every and n % pause_every == pause_every - 1:
+                time.sleep(receiver.POLL_INTERVAL * 2)
+        deadline = time.time() + 5
+        while len(received) < count and time.time() < deadline:
+            time.sleep(0.05)
+        return receiver, [message["data"][0]["n"] for message in received]
+    
+    def test_local_queue_delivers_events(self, monkeypatch):
+        """TC-090: event ที่ส่งจาก instance หนึ่งผ่าน local:// ถึงอีก instance ครบและเรียงตามลำดับ"""
+        _, received = self._deliver(monkeypatch, "local://", 50)
+        assert received == list(range(50))
+        print("✓ TC-090 PASSED: local:// delivered 50 events in order")
+    
+    def test_file_queue_rotates_log(self, tmp_path, monkeypatch):
+        """TC-091: file:// หมุนไฟล์เมื่อเกิน MAX_BYTES และผู้รับยังได้ event ครบ"""
+        monkeypatch.syspath_prepend(str(BACKEND_DIR))
+        backend = pytest.importorskip("app")
+        monkeypatch.setattr(backend.FileQueueManager, "MAX_BYTES", 2000)
+        receiver, received = self._deliver(monkeypatch, f"file://{tmp_path / 'queue'}", 60, pause_every=4)
+        assert received == list(range(60))
+        assert Path(receiver.path).stat().st_size <= 2000 + 300
+        print("✓ TC-091 PASSED: file:// log rotated without losing events")
 
 # ================================
 # SUMMARY FUNCTION
@@ -1024,12 +2262,34 @@ def print_test_summary():
     print("  7. Payments (TC-030 to TC-034)               : 5 tests")
     print("  8. File Uploads (TC-035 to TC-038)           : 4 tests")
     print("  9. Integration Workflows (TC-039 to TC-042)  : 4 tests")
+    print(" 10. List Performance (TC-043 to TC-045)       : 3 tests")
+    print(" 11. Dashboard & Reports (TC-046 to TC-047)    : 2 tests")
+    print(" 12. Booking Availability (TC-048,049,086,095): 4 tests")
+    print(" 13. Concurrent Writes (TC-050 to TC-051)      : 2 tests")
+    print(" 14. Batch & Village Bills (TC-052-054,085,089): 5 tests")
+    print(" 15. Schema Migrations (TC-055 to TC-056)      : 2 tests")
+    print(" 16. Conditional Requests (TC-057 to TC-058)   : 2 tests")
+    print(" 17. Entity Cache (TC-059 to TC-060)           : 2 tests")
+    print(" 18. Streamed Lists (TC-061, 062, 092)         : 3 tests")
+    print(" 19. CSV Exports (TC-063 to TC-064)            : 2 tests")
+    print(" 20. Bulk User Import (TC-065, 066, 088)       : 3 tests")
+    print(" 21. Password Hashing (TC-067 to TC-068)       : 2 tests")
+    print(" 22. Access Tokens (TC-069,070,084,093,094)   : 5 tests")
+    print(" 23. Image Thumbnails (TC-071 to TC-072)       : 2 tests")
+    print(" 24. Chunked Uploads (TC-073 to TC-074)        : 2 tests")
+    print(" 25. Deduplicated Uploads (TC-075/076/082/083): 4 tests")
+    print(" 26. Upload Serving (TC-077 to TC-079)         : 3 tests")
+    print(" 27. Upload Garbage Collection (TC-080 to 081) : 2 tests")
+    print(" 28. Password Rehash (TC-087)                  : 1 test")
+    print(" 29. Socket.IO Message Queue (TC-090 to 091)   : 2 tests")
     print("\n" + "="*70)
-    print("TOTAL: 42 Test Cases")
+    print("TOTAL: 95 Test Cases")
     print("="*70)
     print("\nBackend APIs Covered:")
     print("  ✓ /login")
+    print("  ✓ /logout (POST)")
     print("  ✓ /users (GET, POST, PUT, DELETE)")
+    print("  ✓ /users/import (POST)")
     print("  ✓ /announcements (GET, POST, PUT, DELETE)")
     print("  ✓ /repair-requests (GET, POST, PUT)")
     print("  ✓ /booking-requests (GET, POST, PUT, DELETE)")
@@ -1039,6 +2299,16 @@ def print_test_summary():
     print("  ✓ /payments/reject/{id} (PUT)")
     print("  ✓ /upload (POST)")
     print("  ✓ /upload-multiple (POST)")
+    print("  ✓ /uploads/thumbs/{path} (GET)")
+    print("  ✓ /upload/chunked (POST, GET, PUT, DELETE)")
+    print("  ✓ /dashboard/stats (GET)")
+    print("  ✓ /reports/monthly (GET)")
+    print("  ✓ /booking-requests/availability (GET)")
+    print("  ✓ /bills/batch (POST)")
+    print("  ✓ /admin/schema (GET)")
+    print("  ✓ /admin/cache (GET)")
+    print("  ✓ /admin/uploads/gc (GET, POST)")
+    print("  ✓ /exports/bills.csv, /exports/payments.csv (GET)")
     print("="*70 + "\n")
 
 # ================================